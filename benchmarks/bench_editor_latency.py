@@ -0,0 +1,104 @@
+"""
+Typing and scrolling latency of CodeEditor (QPlainTextEdit) against the same
+highlighter on a QTextEdit, the widget CodeEditor used to be built on.
+
+Run from the project root:
+    python -m benchmarks.bench_editor_latency [--sizes 1000 10000 100000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QTextEdit
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtCore import Qt
+from PyQt6.QtTest import QTest
+
+from editor.syntax_highlighter import Sn2SyntaxHighlighter
+from editor.widgets import CodeEditor
+from editor.themes import THEMES, DEFAULT_THEME
+from benchmarks.corpus import generate_sn2
+
+
+def make_rich_text_editor():
+    editor = QTextEdit()
+    editor.highlighter = Sn2SyntaxHighlighter(editor.document())
+    return editor
+
+
+def prepare(factory, text):
+    editor = factory()
+    editor.resize(900, 700)
+    editor.highlighter.lazy_threshold = sys.maxsize
+    editor.highlighter.set_theme(THEMES[DEFAULT_THEME])
+    editor.setPlainText(text)
+    editor.show()
+    QApplication.processEvents()
+    return editor
+
+
+def typing_latency(editor, keystrokes=50):
+    """Median seconds from a key press in mid-document to the repainted viewport."""
+    cursor = editor.textCursor()
+    cursor.setPosition(editor.document().characterCount() // 2)
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    editor.setTextCursor(cursor)
+    editor.ensureCursorVisible()
+    samples = []
+    for _ in range(keystrokes):
+        start = time.perf_counter()
+        QTest.keyClick(editor, Qt.Key.Key_A)
+        editor.viewport().repaint()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def scroll_latency(editor, jumps=50):
+    """Median seconds to jump the scroll bar somewhere random and repaint."""
+    rng = random.Random(0)
+    bar = editor.verticalScrollBar()
+    samples = []
+    for _ in range(jumps):
+        start = time.perf_counter()
+        bar.setValue(rng.randint(0, bar.maximum()))
+        editor.viewport().repaint()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def to_plain_text(editor, repeat=5):
+    """Median seconds to copy the whole text out."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        editor.toPlainText()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    print(f"{'lines':>8} {'widget':<15} {'keystroke':>10} {'scroll':>10} {'toPlainText':>12}")
+    for lines in args.sizes:
+        text = generate_sn2(lines)
+        for label, factory in (("QTextEdit", make_rich_text_editor), ("CodeEditor", CodeEditor)):
+            editor = prepare(factory, text)
+            typing = typing_latency(editor)
+            scroll = scroll_latency(editor)
+            plain = to_plain_text(editor)
+            editor.close()
+            print(f"{lines:>8} {label:<15} {typing * 1000:>8.2f}ms {scroll * 1000:>8.2f}ms {plain * 1000:>10.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
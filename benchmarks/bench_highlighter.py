@@ -0,0 +1,133 @@
+"""
+Compares the single-pass Sn2SyntaxHighlighter with the old rule-per-regex loop.
+
+Run from the project root:
+    python -m benchmarks.bench_highlighter [--lines N]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QSyntaxHighlighter, QTextCharFormat, QTextDocument, QFont, QColor
+from PyQt6.QtCore import QRegularExpression
+
+from editor.syntax_highlighter import Sn2SyntaxHighlighter
+from editor.tokenizer import KEYWORDS, LITERALS
+from benchmarks.corpus import generate_sn2
+
+# Distinct colours so formats can be told apart when comparing output
+BENCH_THEME = {
+    "keyword": QColor("#000001"), "literal": QColor("#000002"), "string": QColor("#000003"),
+    "number": QColor("#000004"), "comment": QColor("#000005"),
+}
+
+
+class LegacySn2SyntaxHighlighter(QSyntaxHighlighter):
+    """The original highlighter: one globalMatch per rule, kept as the baseline."""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.highlighting_rules = []
+        self.keyword_format = QTextCharFormat()
+        self.keyword_format.setFontWeight(QFont.Weight.Bold)
+        self.highlighting_rules.extend([(QRegularExpression(f"\\b{keyword}\\b"), self.keyword_format) for keyword in KEYWORDS])
+        self.literal_format = QTextCharFormat()
+        self.highlighting_rules.extend([(QRegularExpression(f"\\b{literal}\\b"), self.literal_format) for literal in LITERALS])
+        self.string_format = QTextCharFormat()
+        self.highlighting_rules.append((QRegularExpression(r'"[^"\\]*(\\.[^"\\]*)*"'), self.string_format))
+        self.number_format = QTextCharFormat()
+        self.highlighting_rules.append((QRegularExpression(r'\b[0-9]+\.?[0-9]*\b'), self.number_format))
+        self.single_line_comment_format = QTextCharFormat()
+        self.highlighting_rules.append((QRegularExpression(r'//[^\n]*'), self.single_line_comment_format))
+        self.multi_line_comment_format = QTextCharFormat()
+        self.comment_start_expression = QRegularExpression(r"/\*")
+        self.comment_end_expression = QRegularExpression(r"\*/")
+
+    def set_theme(self, theme):
+        self.keyword_format.setForeground(theme["keyword"])
+        self.literal_format.setForeground(theme["literal"])
+        self.string_format.setForeground(theme["string"])
+        self.number_format.setForeground(theme["number"])
+        self.single_line_comment_format.setForeground(theme["comment"])
+        self.multi_line_comment_format.setForeground(theme["comment"])
+        self.rehighlight()
+
+    def highlightBlock(self, text):
+        for pattern, format in self.highlighting_rules:
+            match_iterator = pattern.globalMatch(text)
+            while match_iterator.hasNext():
+                match = match_iterator.next()
+                self.setFormat(match.capturedStart(), match.capturedLength(), format)
+
+        self.setCurrentBlockState(0)
+        start_index = 0
+        if self.previousBlockState() != 1:
+            start_index = self.comment_start_expression.match(text).capturedStart()
+
+        while start_index >= 0:
+            end_index = self.comment_end_expression.match(text, start_index).capturedStart()
+            if end_index == -1:
+                self.setCurrentBlockState(1)
+                comment_length = len(text) - start_index
+            else:
+                comment_length = end_index - start_index + 2
+            self.setFormat(start_index, comment_length, self.multi_line_comment_format)
+            start_index = self.comment_start_expression.match(text, start_index + comment_length).capturedStart()
+
+
+def rendered_formats(document):
+    """Returns, per block, the (colour, bold) of every character."""
+    result = []
+    block = document.begin()
+    while block.isValid():
+        chars = [None] * block.length()
+        for fmt_range in block.layout().formats():
+            style = (fmt_range.format.foreground().color().name(), fmt_range.format.fontWeight())
+            for i in range(fmt_range.start, fmt_range.start + fmt_range.length):
+                chars[i] = style
+        result.append(chars)
+        block = block.next()
+    return result
+
+
+def time_full_highlight(highlighter_class, text, repeat):
+    document = QTextDocument()
+    document.setPlainText(text)
+    highlighter = highlighter_class(document)
+    # Measure a full synchronous pass, not the lazy one large documents get
+    highlighter.lazy_threshold = sys.maxsize
+    highlighter.set_theme(BENCH_THEME)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        highlighter.rehighlight()
+        best = min(best, time.perf_counter() - start)
+    return best, document, highlighter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    text = generate_sn2(args.lines)
+
+    legacy_time, legacy_doc, _ = time_full_highlight(LegacySn2SyntaxHighlighter, text, args.repeat)
+    new_time, new_doc, _ = time_full_highlight(Sn2SyntaxHighlighter, text, args.repeat)
+
+    identical = rendered_formats(legacy_doc) == rendered_formats(new_doc)
+    print(f"lines:            {args.lines}")
+    print(f"rule loop:        {legacy_time * 1000:9.1f} ms  ({args.lines / legacy_time:,.0f} lines/s)")
+    print(f"single pass:      {new_time * 1000:9.1f} ms  ({args.lines / new_time:,.0f} lines/s)")
+    print(f"speedup:          {legacy_time / new_time:9.2f}x")
+    print(f"identical output: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Measures time-to-first-paint of a CodeEditor with lazy vs eager highlighting,
+and the length of the idle slices that complete the lazy pass.
+
+Run from the project root:
+    python -m benchmarks.bench_lazy_highlight [--sizes 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QEventLoop
+
+from editor.syntax_highlighter import LAZY_HIGHLIGHT_BLOCKS
+from editor.widgets import CodeEditor
+from editor.themes import THEMES, DEFAULT_THEME
+from benchmarks.corpus import generate_sn2
+
+
+def first_paint(text, lazy):
+    """Returns (seconds to first paint, editor)."""
+    editor = CodeEditor()
+    editor.highlighter.lazy_threshold = LAZY_HIGHLIGHT_BLOCKS if lazy else sys.maxsize
+    editor.resize(900, 700)
+    editor.set_theme(THEMES[DEFAULT_THEME])
+    editor.show()
+    start = time.perf_counter()
+    editor.setPlainText(text)
+    editor.viewport().repaint()
+    return time.perf_counter() - start, editor
+
+
+def drain_lazy_pass(app, editor):
+    """Runs the event loop until lazy highlighting completes; returns slice stats."""
+    highlighter = editor.highlighter
+    slices = []
+    start = time.perf_counter()
+    while highlighter.lazy:
+        app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents)
+        slices.append(highlighter.last_slice_ms)
+    return time.perf_counter() - start, slices
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    print(f"{'lines':>8} {'eager paint':>12} {'lazy paint':>11} {'background':>11} {'max slice':>10}")
+    for lines in args.sizes:
+        text = generate_sn2(lines)
+        eager, editor = first_paint(text, lazy=False)
+        editor.close()
+        lazy, editor = first_paint(text, lazy=True)
+        background, slices = drain_lazy_pass(app, editor)
+        editor.close()
+        max_slice = max(slices, default=0.0)
+        print(f"{lines:>8} {eager * 1000:>10.1f}ms {lazy * 1000:>9.1f}ms {background * 1000:>9.1f}ms {max_slice:>8.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
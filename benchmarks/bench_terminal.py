@@ -0,0 +1,78 @@
+"""
+Throughput of TerminalWidget for a script printing in a tight loop, in lines
+rendered per second, against the old insert-per-read approach.
+
+Run from the project root:
+    python -m benchmarks.bench_terminal [--lines N] [--chunk-bytes N]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QPlainTextEdit
+from PyQt6.QtGui import QTextCursor
+
+from editor.widgets import TerminalWidget, OUTPUT_FLUSH_MS
+
+
+class LegacyTerminal(QPlainTextEdit):
+    """The old output path: decode and insert every read, unbounded scrollback."""
+    def __init__(self):
+        super().__init__()
+        self.prompt_pos = 0
+
+    def feed_output(self, data):
+        self.insertPlainText(data.decode(errors='replace'))
+        self.moveCursor(QTextCursor.MoveOperation.End)
+        self.prompt_pos = self.textCursor().position()
+
+    def finish_output(self):
+        pass
+
+
+def output_chunks(lines, chunk_bytes):
+    """Splits the output of a print loop into reads the way a pipe would."""
+    data = "".join(f"iteration {i}: value = {i * 7 % 1000} ✓\n" for i in range(lines)).encode()
+    return [data[i:i + chunk_bytes] for i in range(0, len(data), chunk_bytes)]
+
+
+def run(terminal, chunks, app):
+    terminal.resize(900, 300)
+    terminal.show()
+    start = time.perf_counter()
+    next_frame = start
+    for chunk in chunks:
+        terminal.feed_output(chunk)
+        # Let the event loop run (timers, repaints) as often as it would between reads
+        now = time.perf_counter()
+        if now >= next_frame:
+            app.processEvents()
+            terminal.viewport().repaint()
+            next_frame = now + OUTPUT_FLUSH_MS / 1000
+    terminal.finish_output()
+    terminal.viewport().repaint()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--chunk-bytes", type=int, default=4096)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    chunks = output_chunks(args.lines, args.chunk_bytes)
+    print(f"{args.lines} lines in {len(chunks)} reads of {args.chunk_bytes} bytes")
+    for label, factory in (("insert per read", LegacyTerminal), ("TerminalWidget", TerminalWidget)):
+        terminal = factory()
+        elapsed = run(terminal, chunks, app)
+        print(f"{label:<16} {elapsed * 1000:>9.1f} ms  {args.lines / elapsed:>12,.0f} lines/s")
+        terminal.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
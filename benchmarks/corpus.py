@@ -0,0 +1,60 @@
+"""Synthetic Sn2 sources and folder trees for the benchmarks."""
+import random
+
+# Every line here highlights the same way under the old rule-per-regex
+# highlighter and the single-pass tokenizer (no numbers inside strings, which
+# the old loop coloured), so they double as a fixture corpus.
+TEMPLATES = [
+    "let {name} = {num}",
+    "let {name} = \"value of {name}\"",
+    "show({name})",
+    "func {name}(a, b) {{",
+    "    return a + b * {num}",
+    "}}",
+    "class {Name} {{",
+    "    func init(this) {{ this.{name} = null }}",
+    "}}",
+    "if {name} > {num} {{ show(true) }} else {{ show(false) }}",
+    "loop i in iter({name}) {{",
+    "    while next(i) {{ {name} = toInt(input()) }}",
+    "}}",
+    "try {{ {name}.run() }} catch e {{ show(e) }}",
+    "match {name} {{ case {num} {{ show(len({name})) }} }}",
+    "// {name} is a plain comment",
+    "/* a block comment about {name}",
+    "   that spans several lines */",
+    "import {name} as {Name}",
+    "let {name} = {num}.{num} + toFloat(\"{name}\")",
+    "",
+]
+
+
+def generate_sn2(lines, seed=0):
+    """Returns `lines` lines of deterministic, syntactically plausible Sn2."""
+    rng = random.Random(seed)
+    out = []
+    while len(out) < lines:
+        for template in TEMPLATES:
+            name = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+            out.append(template.format(name=name, Name=name.capitalize(), num=rng.randint(0, 9999)))
+            if len(out) == lines:
+                break
+    return "\n".join(out)
+
+
+DIRECTORY_NAMES = [
+    "src", "lib", "core", "util", "tests", "docs", "examples", "models", "views", "api",
+    "server", "client", "internal", "data", "build", "scripts", "vendor", "assets",
+]
+EXTENSIONS = [".sn2", ".sn2", ".txt", ".py", ".json", ".md"]
+
+
+def generate_paths(count, seed=0):
+    """Returns `count` distinct, deterministic relative file paths with "/" separators."""
+    rng = random.Random(seed)
+    paths = set()
+    while len(paths) < count:
+        directory = "/".join(rng.choice(DIRECTORY_NAMES) for _ in range(rng.randint(1, 6)))
+        name = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz_") for _ in range(rng.randint(4, 14)))
+        paths.add(f"{directory}/{name}{rng.choice(EXTENSIONS)}")
+    return sorted(paths)
@@ -0,0 +1,414 @@
+"""
+Runs the editor's hot-path benchmarks headless and writes the results as
+JSON, so runs can be diffed across versions. Given a baseline from an
+earlier run, exits non-zero if any result got worse by more than the
+tolerance.
+
+Run from the project root:
+    python -m benchmarks.suite [--output results.json] [--baseline old.json]
+                               [--tolerance 0.25] [--quick]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QTextCursor, QTextDocument
+from PyQt6.QtCore import Qt, QSettings, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt6.QtTest import QTest
+
+from editor.syntax_highlighter import Sn2SyntaxHighlighter, LAZY_HIGHLIGHT_BLOCKS
+from editor.widgets import CodeEditor, TerminalWidget
+from editor.themes import THEMES, DEFAULT_THEME
+from editor.path_index import PathIndex
+from editor.token_cache import TokenCache
+from editor.documents import Document
+from editor.diagnostics import Diagnostics, DiagnosticsWorker
+from benchmarks.corpus import generate_sn2, generate_paths, TEMPLATES
+from benchmarks.bench_highlighter import time_full_highlight
+from benchmarks.bench_terminal import output_chunks, run as run_terminal
+
+RESULTS_VERSION = 1
+
+
+def result(value, unit, better):
+    """One measurement; `better` is "lower" or "higher"."""
+    return {"value": value, "unit": unit, "better": better}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# --- Benchmarks ---
+
+def bench_highlighter(lines, keystrokes):
+    results = {}
+    seconds, _, _ = time_full_highlight(Sn2SyntaxHighlighter, generate_sn2(lines), repeat=3)
+    results["highlight.lines_per_s"] = result(lines / seconds, "lines/s", "higher")
+
+    # Highlighting work caused by one typed character in the middle of the document
+    document = QTextDocument()
+    document.setPlainText(generate_sn2(lines))
+    highlighter = Sn2SyntaxHighlighter(document)
+    highlighter.lazy_threshold = sys.maxsize
+    highlighter.set_theme(THEMES[DEFAULT_THEME])
+    cursor = QTextCursor(document.findBlockByNumber(lines // 2))
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    samples = []
+    for _ in range(keystrokes):
+        start = time.perf_counter()
+        cursor.insertText("a")
+        samples.append(time.perf_counter() - start)
+    results["highlight.keystroke_us"] = result(statistics.median(samples) * 1e6, "us", "lower")
+    return results
+
+
+def bench_token_cache(lines, directory, repeat=3):
+    """Full highlight of a document whose tokens are not yet cached, and of one whose are."""
+    cache = TokenCache(os.path.join(directory, "tokens"))
+    text = generate_sn2(lines)
+    samples = {"warm-up": [], "cold": [], "cached": []}
+    for i, label in [(0, "warm-up")] + [(i, label) for i in range(repeat) for label in ("cold", "cached")]:
+        document = QTextDocument()
+        highlighter = Sn2SyntaxHighlighter(document)
+        highlighter.lazy_threshold = sys.maxsize
+        highlighter.set_theme(THEMES[DEFAULT_THEME], rehighlight=False)
+        # A new first line gives each cold run a text the cache hasn't seen
+        source = f"// run {i}\n{text}" if label == "cold" else text
+        document.setPlainText(source)
+        start = time.perf_counter()
+        highlighter.use_token_cache(cache, source)
+        highlighter.rehighlight()
+        samples[label].append(time.perf_counter() - start)
+        highlighter.store_tokens()
+        cache.wait()
+    return {
+        f"token_cache.cold_{lines}_lines_ms": result(statistics.median(samples["cold"]) * 1000, "ms", "lower"),
+        f"token_cache.cached_{lines}_lines_ms": result(statistics.median(samples["cached"]) * 1000, "ms", "lower"),
+    }
+
+
+def bench_diagnostics(lines, keystrokes):
+    """
+    A first diagnosis, a diagnosis after a one-line edit, and what tracking
+    adds to a keystroke on the UI thread. The worker is driven directly.
+    """
+    # A full collection of earlier benchmarks' garbage would otherwise land in the timing
+    gc.collect()
+    worker = DiagnosticsWorker()
+    worker.diagnosed.connect(lambda key, edits, diagnostics: None)
+    texts = generate_sn2(lines).split("\n")
+    model = [texts, [None] * len(texts), 0]
+    start = time.perf_counter()
+    worker.diagnose(0, model)
+    full = time.perf_counter() - start
+    samples = []
+    for i in range(10):
+        line = lines // 2 + i
+        model[0][line] += " x"
+        model[1][line] = None
+        start = time.perf_counter()
+        worker.diagnose(0, model)
+        samples.append(time.perf_counter() - start)
+
+    document = Document()
+    document.text.setPlainText(generate_sn2(lines))
+    diagnostics = Diagnostics(worker)
+    cursor = QTextCursor(document.text.findBlockByNumber(lines // 2))
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    timings = {}
+    for label in ("untracked", "tracked"):
+        if label == "tracked":
+            diagnostics.track(document)
+        keystroke_samples = []
+        for _ in range(keystrokes):
+            start = time.perf_counter()
+            cursor.insertText("a")
+            keystroke_samples.append(time.perf_counter() - start)
+        timings[label] = statistics.median(keystroke_samples)
+    diagnostics.untrack(document)
+    return {
+        f"diagnostics.full_{lines}_lines_ms": result(full * 1000, "ms", "lower"),
+        f"diagnostics.edit_{lines}_lines_ms": result(statistics.median(samples) * 1000, "ms", "lower"),
+        "diagnostics.keystroke_us": result(max(0, timings["tracked"] - timings["untracked"]) * 1e6, "us", "lower"),
+    }
+
+
+def bench_completion(lines, keystrokes):
+    """Time for CodeEditor.keyPressEvent to handle a key and show the completer."""
+    editor = CodeEditor()
+    editor.resize(900, 700)
+    editor.set_theme(THEMES[DEFAULT_THEME])
+    editor.setPlainText(generate_sn2(lines))
+    editor.show()
+    editor.moveCursor(QTextCursor.MoveOperation.End)
+    QApplication.processEvents()
+
+    samples = []
+    word = "letshow"
+    for i in range(keystrokes):
+        if i % len(word) == 0:
+            QTest.keyClick(editor, Qt.Key.Key_Return)
+        start = time.perf_counter()
+        QTest.keyClicks(editor, word[i % len(word)])
+        samples.append(time.perf_counter() - start)
+    editor.completer.popup().hide()
+    editor.close()
+    return {
+        "completion.keystroke_p50_ms": result(percentile(samples, 0.5) * 1000, "ms", "lower"),
+        "completion.keystroke_p95_ms": result(percentile(samples, 0.95) * 1000, "ms", "lower"),
+    }
+
+
+def bench_terminal(lines):
+    app = QApplication.instance()
+    terminal = TerminalWidget()
+    seconds = run_terminal(terminal, output_chunks(lines, 4096), app)
+    terminal.close()
+    return {"terminal.lines_per_s": result(lines / seconds, "lines/s", "higher")}
+
+
+def bench_quick_open(count):
+    """Time for PathIndex.search to answer one quick-open query over `count` paths."""
+    root = os.path.abspath("project")
+    index = PathIndex(root)
+    index.add_all([os.path.join(root, *path.split("/")) for path in generate_paths(count)])
+    samples = []
+    for query in ("m", "sn", "main", "srcutil", "core/api", "models_views.sn2", "zzzz", "xq"):
+        # Each prefix of the query, as if typed
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:end])
+            samples.append(time.perf_counter() - start)
+    return {
+        "quick_open.search_p50_ms": result(percentile(samples, 0.5) * 1000, "ms", "lower"),
+        "quick_open.search_p95_ms": result(percentile(samples, 0.95) * 1000, "ms", "lower"),
+    }
+
+
+def make_window(directory):
+    from editor.main_window import MainWindow
+    # Don't reopen the tabs an earlier benchmark's window left open
+    QSettings("Sn2Lang", "Sn2Editor").remove("session_tabs")
+    # Journals and caches go in directory too, not in the user's data
+    window = MainWindow(storage_dir=os.path.join(directory, "storage"))
+    # Skip the deferred startup work: no explorer scan and no update check
+    window.startup_pending = False
+    window.resize(1200, 800)
+    window.show()
+    QApplication.processEvents()
+    return window
+
+
+def bench_open_tab(sizes, directory):
+    """Time for add_editor_tab to open a file and paint its first screen."""
+    results = {}
+    window = make_window(directory)
+    for lines in sizes:
+        path = os.path.join(directory, f"open_{lines}.sn2")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_sn2(lines))
+        start = time.perf_counter()
+        window.add_editor_tab(path, os.path.basename(path))
+        window.tab_widget.currentWidget().viewport().repaint()
+        results[f"open_tab.{lines}_lines_ms"] = result((time.perf_counter() - start) * 1000, "ms", "lower")
+        QApplication.processEvents()
+    window.close()
+    return results
+
+
+def bench_folding(lines, keystrokes):
+    """
+    What the structure index adds to a keystroke, a full re-highlight of a
+    document with and without its body folded away, and unfolding it again.
+    """
+    editor = CodeEditor()
+    editor.highlighter.lazy_threshold = sys.maxsize
+    # Whole runs of the corpus templates, so the class closes where it should
+    editor.setPlainText("class Big {\n" + generate_sn2(lines - lines % len(TEMPLATES)) + "\n}\n")
+    QApplication.processEvents()
+    document = editor.document()
+
+    cursor = QTextCursor(document.findBlockByNumber(lines // 2))
+    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+    # Alternate the two, so neither gains from running later (warmer caches) or earlier
+    samples = {"tracked": [], "untracked": []}
+    for _ in range(keystrokes):
+        for label in ("untracked", "tracked"):
+            if label == "untracked":
+                document.contentsChange.disconnect(editor.structure.handle_contents_change)
+            start = time.perf_counter()
+            cursor.insertText("a")
+            samples[label].append(time.perf_counter() - start)
+            if label == "untracked":
+                document.contentsChange.connect(editor.structure.handle_contents_change)
+    timings = {label: statistics.median(values) for label, values in samples.items()}
+    editor.structure.rebuild()
+
+    rehighlight = {}
+    for label in ("unfolded", "folded"):
+        if label == "folded":
+            editor.fold(0)
+        start = time.perf_counter()
+        editor.highlighter.rehighlight()
+        rehighlight[label] = time.perf_counter() - start
+    # Unfolding leaves most of the body to the idle pass, as on opening a file
+    editor.highlighter.lazy_threshold = LAZY_HIGHLIGHT_BLOCKS
+    start = time.perf_counter()
+    editor.unfold(0)
+    unfold = time.perf_counter() - start
+    return {
+        "structure.keystroke_us": result(max(0, timings["tracked"] - timings["untracked"]) * 1e6, "us", "lower"),
+        f"folding.rehighlight_unfolded_{lines}_lines_ms": result(rehighlight["unfolded"] * 1000, "ms", "lower"),
+        f"folding.rehighlight_folded_{lines}_lines_ms": result(rehighlight["folded"] * 1000, "ms", "lower"),
+        f"folding.unfold_{lines}_lines_ms": result(unfold * 1000, "ms", "lower"),
+    }
+
+
+def bench_brackets(lines, moves):
+    """
+    Time for a cursor move to find the matching bracket, with the partner
+    at the far end of the document. The target is under 1 ms per move at
+    any document size; a scan of the lines between would grow with them.
+    """
+    editor = CodeEditor()
+    editor.resize(900, 700)
+    editor.setPlainText("class Big {\n" + generate_sn2(lines - lines % len(TEMPLATES)) + "\n}\n")
+    editor.show()
+    QApplication.processEvents()
+    document = editor.document()
+    ends = [document.findBlockByNumber(0).length() - 2, document.lastBlock().previous().position()]
+
+    gc.collect()
+    samples = []
+    for i in range(moves):
+        cursor = editor.textCursor()
+        cursor.setPosition(ends[i % 2])
+        start = time.perf_counter()
+        editor.setTextCursor(cursor)
+        samples.append(time.perf_counter() - start)
+    editor.close()
+    return {
+        "brackets.cursor_move_p50_us": result(percentile(samples, 0.5) * 1e6, "us", "lower"),
+        "brackets.cursor_move_p95_us": result(percentile(samples, 0.95) * 1e6, "us", "lower"),
+    }
+
+
+def bench_apply_theme(tabs, lines, directory, switches=6):
+    """Time for apply_theme with `tabs` editors open, one of them visible."""
+    window = make_window(directory)
+    text = generate_sn2(lines)
+    for i in range(tabs):
+        window.add_editor_tab(None, f"tab {i}")
+        window.tab_widget.currentWidget().setPlainText(text)
+    QApplication.processEvents()
+
+    names = list(THEMES)
+    samples = []
+    for i in range(switches):
+        start = time.perf_counter()
+        window.apply_theme(names[i % 2])
+        window.tab_widget.currentWidget().viewport().repaint()
+        samples.append(time.perf_counter() - start)
+    window.apply_theme(DEFAULT_THEME)
+    for i in range(window.tab_widget.count()):
+        window.tab_widget.widget(i).document().setModified(False)
+    window.close()
+    return {f"apply_theme.{tabs}_tabs_ms": result(statistics.median(samples) * 1000, "ms", "lower")}
+
+
+# --- Reporting ---
+
+def compare(results, baseline, tolerance):
+    """Prints each result against the baseline; returns the names that regressed."""
+    regressions = []
+    for name, current in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name:<34} {current['value']:>14,.2f} {current['unit']:<8} (new)")
+            continue
+        # How many times worse than the baseline: above 1 is slower
+        if current["better"] == "lower":
+            factor = current["value"] / base["value"] if base["value"] else 1.0
+        else:
+            factor = base["value"] / current["value"] if current["value"] else float("inf")
+        change = f"{factor:.2f}x worse" if factor > 1 else f"{1 / factor:.2f}x better"
+        if factor > 1 + tolerance:
+            regressions.append(name)
+            change += "  REGRESSION"
+        print(f"  {name:<34} {current['value']:>14,.2f} {current['unit']:<8} {change}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for a fast sanity run")
+    parser.add_argument("--tabs", type=int, default=30, help="tabs open for the apply_theme benchmark")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    scale = 10 if args.quick else 1
+    with tempfile.TemporaryDirectory() as directory:
+        # Keep MainWindow's settings away from the user's own
+        QSettings.setPath(QSettings.Format.NativeFormat, QSettings.Scope.UserScope, directory)
+        QSettings.setPath(QSettings.Format.IniFormat, QSettings.Scope.UserScope, directory)
+
+        results = {}
+        results.update(bench_highlighter(20000 // scale, 50))
+        results.update(bench_token_cache(100000 // scale, directory))
+        results.update(bench_diagnostics(20000 // scale, 50))
+        results.update(bench_completion(10000 // scale, 70))
+        results.update(bench_terminal(200000 // scale))
+        results.update(bench_quick_open(100000 // scale))
+        results.update(bench_open_tab([1000, 10000] if args.quick else [1000, 10000, 100000], directory))
+        results.update(bench_apply_theme(args.tabs, 2000 // scale, directory))
+        results.update(bench_folding(20000 // scale, 50))
+        results.update(bench_brackets(50000 // scale, 100))
+
+    report = {
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "quick": args.quick,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "pyqt": PYQT_VERSION_STR,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("quick") != args.quick:
+            print("warning: baseline and this run differ in --quick; results are not comparable")
+        print(f"Compared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline.get("results", {}), args.tolerance)
+    else:
+        for name, current in sorted(results.items()):
+            print(f"  {name:<34} {current['value']:>14,.2f} {current['unit']}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from .project_index import find_sn2_files
+
+# How often a running script is checked for its timeout or a cancel, in seconds.
+POLL_INTERVAL = 0.1
+
+
+class BatchResult:
+    """The outcome of running one script."""
+    def __init__(self, path, output_path):
+        self.path = path
+        self.output_path = output_path
+        self.exit_code = None
+        self.duration = 0.0
+        self.timed_out = False
+        self.cancelled = False
+        self.started = False
+
+    @property
+    def output_bytes(self):
+        try:
+            return os.path.getsize(self.output_path)
+        except OSError:
+            return 0
+
+    @property
+    def passed(self):
+        return self.exit_code == 0
+
+    @property
+    def skipped(self):
+        """Not run to the end because the batch was cancelled (or stopped at a failure); not a failure itself."""
+        return self.cancelled
+
+    def describe(self):
+        if self.timed_out:
+            return "timed out"
+        if self.cancelled:
+            return "cancelled" if self.started else "not run"
+        return f"exit {self.exit_code}"
+
+
+class BatchRunner:
+    """
+    Runs every .sn2 file under a folder through the interpreter, `jobs` at a
+    time. Each script's output streams to its own log file in output_dir as
+    it is produced. It doesn't need a Qt event loop, so `main.py --run-all`
+    can use it headless; BatchRunWorker runs it for the GUI.
+    """
+    def __init__(self, interpreter_path, root, output_dir, jobs=None, timeout=None, fail_fast=False):
+        self.interpreter_path = interpreter_path
+        self.root = root
+        self.output_dir = output_dir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout # seconds per script, or None
+        self.fail_fast = fail_fast
+        self.cancelled = threading.Event()
+
+    def scripts(self):
+        return sorted(path for path, _ in find_sn2_files(self.root))
+
+    def output_path(self, script):
+        name = os.path.relpath(script, self.root).replace(os.sep, "__")
+        return os.path.join(self.output_dir, f"{name}.log")
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self, on_start=None, on_result=None):
+        """
+        Runs all scripts and returns their BatchResults in path order.
+        on_start(result) and on_result(result) are called from worker threads.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        results = [BatchResult(script, self.output_path(script)) for script in self.scripts()]
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            pending = {executor.submit(self.run_script, result, on_start) for result in results}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if on_result:
+                        on_result(result)
+                    if self.fail_fast and not result.passed and not result.skipped:
+                        self.cancel()
+        return results
+
+    def run_script(self, result, on_start):
+        if self.cancelled.is_set():
+            result.cancelled = True
+            return result
+        result.started = True
+        if on_start:
+            on_start(result)
+        # Unbuffered, so the log fills while the script runs
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        start = time.monotonic()
+        with open(result.output_path, 'wb') as output:
+            process = subprocess.Popen(
+                [sys.executable, self.interpreter_path, result.path],
+                stdin=subprocess.DEVNULL, stdout=output, stderr=subprocess.STDOUT, env=env
+            )
+            while True:
+                try:
+                    result.exit_code = process.wait(POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                if self.cancelled.is_set():
+                    result.cancelled = True
+                elif self.timeout and time.monotonic() - start > self.timeout:
+                    result.timed_out = True
+                else:
+                    continue
+                process.kill()
+                result.exit_code = process.wait()
+                break
+        result.duration = time.monotonic() - start
+        return result
+
+
+class BatchRunWorker(QObject):
+    """A worker that runs a BatchRunner in a separate thread."""
+    file_started = pyqtSignal(object) # BatchResult
+    file_finished = pyqtSignal(object) # BatchResult
+    finished = pyqtSignal() # Signal to emit when the worker is done
+
+    def __init__(self, runner):
+        super().__init__()
+        self.runner = runner
+
+    def cancel(self):
+        self.runner.cancel()
+
+    def run(self):
+        try:
+            self.runner.run(on_start=self.file_started.emit, on_result=self.file_finished.emit)
+        except Exception as e:
+            print(f"Run All failed: {e}")
+        finally:
+            self.finished.emit() # Always emit finished signal
+
+
+def run_all_headless(interpreter_path, root, output_dir, jobs=None, timeout=None, fail_fast=False):
+    """Runs a folder's scripts for CI, printing each result as it ends. Returns the exit status."""
+    # A folder that can't be listed would otherwise pass, with no scripts run
+    try:
+        with os.scandir(root):
+            pass
+    except OSError as e:
+        print(f"Cannot run the scripts in '{root}': {e.strerror}", file=sys.stderr)
+        return 2
+    runner = BatchRunner(interpreter_path, root, output_dir, jobs, timeout, fail_fast)
+
+    def report(result):
+        name = os.path.relpath(result.path, root)
+        if not result.started:
+            print(f"SKIPPED {name}", flush=True)
+            return
+        status = "SKIPPED" if result.skipped else "PASS" if result.passed else "FAIL"
+        print(f"{status} {name} ({result.describe()}, "
+              f"{result.duration:.2f} s, {result.output_bytes} bytes) -> {result.output_path}", flush=True)
+
+    results = runner.run(on_result=report)
+    failed = [result for result in results if not result.passed and not result.skipped]
+    skipped = [result for result in results if result.skipped]
+    note = f", {len(skipped)} skipped" if skipped else ""
+    print(f"{len(results) - len(failed) - len(skipped)}/{len(results)} scripts passed{note}; output in {output_dir}")
+    return 1 if failed else 0
@@ -0,0 +1,81 @@
+"""
+Finds the declarations in Sn2 source. This module only depends on the
+tokenizer, so worker processes can import it without loading Qt.
+"""
+import re
+
+from .tokenizer import tokenize_line, mask_code, STRING, COMMENT, BLOCK_COMMENT, STATE_NORMAL, STATE_IN_COMMENT
+
+# let/func/class declarations; group 1 is the keyword, group 2 the name
+DECLARATION_RE = re.compile(r'\b(let|func|class)\s+([A-Za-z_]\w*)')
+# import foo / import "lib/foo.sn2" / import foo as bar
+IMPORT_RE = re.compile(r'\bimport\s+(?:"([^"]*)"|([\w.]+))(?:\s+as\s+([A-Za-z_]\w*))?')
+
+
+def code_matches(pattern, text, state):
+    """Returns pattern's matches on a line that don't start inside a string or comment."""
+    matches = list(pattern.finditer(text))
+    if not matches:
+        return matches
+    if state != STATE_IN_COMMENT and '"' not in text and '/' not in text:
+        return matches
+    tokens, _ = tokenize_line(text, state)
+    masked = [(start, start + length) for start, length, kind in tokens if kind in (STRING, COMMENT, BLOCK_COMMENT)]
+    return [match for match in matches if not any(start <= match.start() < end for start, end in masked)]
+
+
+def declared_names(text, state):
+    """Returns the let/func/class names declared on a line."""
+    return tuple(match.group(2) for match in code_matches(DECLARATION_RE, text, state))
+
+
+def end_state(text, state):
+    """Cheaply works out whether a line ends inside a block comment."""
+    if "/*" not in text and "*/" not in text:
+        return state
+    return tokenize_line(text, state)[1]
+
+
+def nesting(code):
+    """How much a line (with its strings and comments blanked out) changes the bracket nesting."""
+    return (code.count("(") + code.count("[") + code.count("{")
+            - code.count(")") - code.count("]") - code.count("}"))
+
+
+def parse_declarations(text):
+    """
+    Returns [kind, name, line] for every top-level declaration in a source
+    file, where kind is "let", "func", "class" or "import" and line is
+    0-based. An import is named by its alias, or else by what it imports.
+    Declarations inside brackets (function locals, class members) are left out.
+    """
+    symbols = []
+    state = STATE_NORMAL
+    depth = 0
+    for line_number, line in enumerate(text.split("\n")):
+        if state == STATE_NORMAL and '"' not in line and '/' not in line:
+            code, next_state = line, state
+        else:
+            tokens, next_state = tokenize_line(line, state)
+            code = mask_code(line, tokens)
+        for match in DECLARATION_RE.finditer(code):
+            if depth + nesting(code[:match.start()]) <= 0:
+                symbols.append([match.group(1), match.group(2), line_number])
+        for match in code_matches(IMPORT_RE, line, state):
+            symbols.append(["import", match.group(3) or match.group(1) or match.group(2), line_number])
+        # A stray closing bracket doesn't make what follows any less top-level
+        depth = max(0, depth + nesting(code))
+        state = next_state
+    return symbols
+
+
+def parse_files(paths):
+    """Parses a batch of files; returns [(path, symbols)]. Unreadable files get no symbols."""
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                results.append((path, parse_declarations(f.read())))
+        except OSError:
+            results.append((path, []))
+    return results
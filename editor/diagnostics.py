@@ -0,0 +1,320 @@
+"""
+Live Sn2 diagnostics: unbalanced brackets, unterminated strings and block
+comments, and unknown keywords and functions. Each line is analysed on its
+own and the result kept, so an edit only costs re-analysing the lines it
+touched; a quick pass over the kept results then matches brackets across
+lines and checks names.
+"""
+import difflib
+import itertools
+import re
+import threading
+
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from .declarations import DECLARATION_RE, IMPORT_RE
+from .tokenizer import (
+    tokenize_line, mask_code, KEYWORDS, LITERALS, BUILTINS, STATE_NORMAL, STATE_IN_COMMENT
+)
+
+ERROR = "error"
+WARNING = "warning"
+
+# Pause in typing before a document is diagnosed again, in milliseconds.
+DIAGNOSTICS_DELAY_MS = 300
+# Documents with more lines than this aren't diagnosed.
+DIAGNOSTICS_MAX_BLOCKS = 200000
+# Diagnostics reported per document.
+MAX_DIAGNOSTICS = 1000
+
+OPENERS = {")": "(", "]": "[", "}": "{"}
+_BRACKET_RE = re.compile(r"[()\[\]{}]")
+# A word followed by another at the start of a statement, e.g. "lett x = 1"
+_STATEMENT_RE = re.compile(r'\s*([A-Za-z_]\w*)\s+(?=[A-Za-z_0-9"])')
+# A call of a plain name; method calls (after a ".") are not checked
+_CALL_RE = re.compile(r'(?<![\w.])([A-Za-z_]\w*)\s*\(')
+_PARAMS_RE = re.compile(r'\bfunc\b\s*(?:[A-Za-z_]\w*)?\s*\(([^)]*)\)')
+_BOUND_RE = re.compile(r'\b(?:loop\s+([A-Za-z_]\w*)\s+in\b|catch\s*\(?\s*([A-Za-z_]\w*))')
+_KNOWN_WORDS = frozenset(KEYWORDS + LITERALS + BUILTINS)
+
+
+def analyze_line(text, state):
+    """
+    Analyses one line, given the block state at the end of the previous one.
+    Returns (state, end state, problems, closers, openers, calls, declared
+    names, comment start): problems are (column, length, severity, message);
+    closers and openers are the (column, bracket) left unmatched within the
+    line; calls are (column, name) of calls to names that aren't built in;
+    comment start is the column of the "/*" of a comment still open at the end.
+    """
+    tokens, end = tokenize_line(text, state)
+    code = mask_code(text, tokens)
+
+    problems = []
+    quote = code.find('"')
+    if quote != -1:
+        problems.append((quote, len(text) - quote, ERROR, "Unterminated string"))
+        code = code[:quote]
+
+    match = _STATEMENT_RE.match(code)
+    if match and match.group(1) not in _KNOWN_WORDS:
+        word = match.group(1)
+        problems.append((match.start(1), len(word), ERROR, f"Unknown keyword '{word}'" + _suggestion(word, KEYWORDS)))
+
+    closers = []
+    openers = []
+    for match in _BRACKET_RE.finditer(code):
+        bracket, column = match.group(), match.start()
+        if bracket not in OPENERS:
+            openers.append((column, bracket))
+        elif openers and openers[-1][1] == OPENERS[bracket]:
+            openers.pop()
+        else:
+            depth = _find_opener(openers, OPENERS[bracket])
+            # Anything opened after its opener (or, if it has none here, on this line at all) is left unclosed
+            for opener_column, opener in openers[0 if depth is None else depth + 1:]:
+                problems.append((opener_column, 1, ERROR, f"Unclosed '{opener}'"))
+            if depth is None:
+                openers = []
+                closers.append((column, bracket))
+            else:
+                del openers[depth:]
+
+    calls = []
+    if "(" in code:
+        calls = [(match.start(1), match.group(1)) for match in _CALL_RE.finditer(code) if match.group(1) not in _KNOWN_WORDS]
+
+    declared = []
+    if "let" in code or "func" in code or "class" in code:
+        declared = [match.group(2) for match in DECLARATION_RE.finditer(code)]
+    if "func" in code:
+        for match in _PARAMS_RE.finditer(code):
+            declared.extend(name.strip() for name in match.group(1).split(",") if name.strip())
+    if "loop" in code or "catch" in code:
+        declared.extend(match.group(1) or match.group(2) for match in _BOUND_RE.finditer(code))
+    if "import" in code:
+        declared.extend(match.group(3) or match.group(2) for match in IMPORT_RE.finditer(text) if match.group(3) or match.group(2))
+
+    comment_start = None
+    if end == STATE_IN_COMMENT and tokens and (state != STATE_IN_COMMENT or tokens[-1][0] > 0):
+        # Opened on this line, not carried over from the one before
+        comment_start = tokens[-1][0]
+    # Most lines have nothing to report; sharing () keeps the kept results small
+    return (state, end, problems or (), closers or (), openers or (), calls or (), declared or (), comment_start)
+
+
+def _find_opener(openers, opener):
+    """Index of the innermost opener of the given kind, or None."""
+    for i in range(len(openers) - 1, -1, -1):
+        if openers[i][1] == opener:
+            return i
+    return None
+
+
+def _suggestion(word, candidates):
+    close = difflib.get_close_matches(word, candidates, n=1)
+    return f" (did you mean '{close[0]}'?)" if close else ""
+
+
+def collect(infos, known_name=None):
+    """
+    Returns the (line, column, length, severity, message) diagnostics of a
+    document from its lines' analyze_line results, sorted by position.
+    """
+    diagnostics = []
+    declared = set()
+    busy = [] # (line number, analysis) of lines with anything to report or match
+    for number, info in enumerate(infos):
+        if info[6]:
+            declared.update(info[6])
+        if info[2] or info[3] or info[4] or info[5]:
+            busy.append((number, info))
+
+    stack = [] # (line, column, bracket) still open
+    for number, (_, _, problems, closers, openers, calls, _, _) in busy:
+        for column, length, severity, message in problems:
+            diagnostics.append((number, column, length, severity, message))
+        for column, bracket in closers:
+            if stack and stack[-1][2] == OPENERS[bracket]:
+                stack.pop()
+                continue
+            depth = _find_opener(stack, OPENERS[bracket])
+            if depth is None:
+                diagnostics.append((number, column, 1, ERROR, f"Unmatched '{bracket}'"))
+            else:
+                for line, opener_column, opener in stack[depth + 1:]:
+                    diagnostics.append((line, opener_column, 1, ERROR, f"Unclosed '{opener}'"))
+                del stack[depth:]
+        stack.extend((number, column, bracket) for column, bracket in openers)
+        for column, name in calls:
+            if name not in declared and not (known_name and known_name(name)):
+                diagnostics.append((number, column, len(name), WARNING, f"Unknown function '{name}'" + _suggestion(name, BUILTINS)))
+    for line, column, opener in stack:
+        diagnostics.append((line, column, 1, ERROR, f"Unclosed '{opener}'"))
+
+    if infos and infos[-1][1] == STATE_IN_COMMENT:
+        # Report the "/*" that opened it
+        for number in range(len(infos) - 1, -1, -1):
+            if infos[number][7] is not None:
+                diagnostics.append((number, infos[number][7], 2, ERROR, "Unterminated comment"))
+                break
+
+    diagnostics.sort()
+    return diagnostics[:MAX_DIAGNOSTICS]
+
+
+class DiagnosticsWorker(QObject):
+    """
+    A worker that diagnoses documents in a separate thread. It keeps a copy
+    of each document's lines, updated from the edits it is sent, with each
+    line's analysis; a diagnosis re-analyses only lines that changed, or
+    whose starting block-comment state did.
+    """
+    diagnosed = pyqtSignal(int, int, list) # (document key, edits applied, diagnostics)
+    finished = pyqtSignal() # Signal to emit when the worker is done
+
+    def __init__(self, known_name=None):
+        super().__init__()
+        self.known_name = known_name # Callable telling whether a name is declared elsewhere, e.g. in the project
+        self.pending = [] # ("edit", key, (first, old count, texts)) | ("diagnose", key, None) | ("close", key, None)
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.models = {} # key -> [lines, analyses, edits applied]
+
+    # --- Requests, from the UI thread ---
+
+    def request(self, action, key, args=None):
+        with self.condition:
+            self.pending.append((action, key, args))
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+    # --- Worker thread ---
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending and not self.stopping:
+                        self.condition.wait()
+                    if self.stopping:
+                        return
+                    requests, self.pending = self.pending, []
+                diagnose = []
+                for action, key, args in requests:
+                    if action == "edit":
+                        model = self.models.setdefault(key, [[], [], 0])
+                        first, old_count, texts = args
+                        model[0][first:first + old_count] = texts
+                        model[1][first:first + old_count] = [None] * len(texts)
+                        model[2] += 1
+                    elif action == "close":
+                        self.models.pop(key, None)
+                    elif key not in diagnose:
+                        diagnose.append(key)
+                for key in diagnose:
+                    model = self.models.get(key)
+                    if model:
+                        self.diagnose(key, model)
+        except Exception as e:
+            print(f"Diagnostics failed: {e}")
+        finally:
+            self.finished.emit() # Always emit finished signal
+
+    def diagnose(self, key, model):
+        lines, infos, edits = model
+        state = STATE_NORMAL
+        for number, info in enumerate(infos):
+            if info is None or info[0] != state:
+                info = infos[number] = analyze_line(lines[number], state)
+            state = info[1]
+        self.diagnosed.emit(key, edits, collect(infos, self.known_name))
+
+
+class Diagnostics(QObject):
+    """
+    The UI-thread side of the diagnostics: sends each tracked document's
+    edits to a DiagnosticsWorker as they happen, asks for a diagnosis once
+    typing pauses, and hands results that are still current to the document.
+    """
+    changed = pyqtSignal(object) # Document whose diagnostics changed
+
+    def __init__(self, worker, delay_ms=DIAGNOSTICS_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.delay_ms = delay_ms
+        self.keys = itertools.count()
+        self.tracked = {} # Document -> state
+        self.by_key = {} # key -> Document
+        worker.diagnosed.connect(self.receive)
+
+    def track(self, document):
+        """Starts diagnosing a document, if it is Sn2: a .sn2 file or an untitled one."""
+        if document.path and not document.path.lower().endswith(".sn2"):
+            return
+        if document in self.tracked or document.text.blockCount() > DIAGNOSTICS_MAX_BLOCKS:
+            return
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(self.delay_ms)
+        state = {"key": next(self.keys), "blocks": 0, "edits": 0, "timer": timer}
+        timer.timeout.connect(lambda: self.worker.request("diagnose", state["key"]))
+        self.tracked[document] = state
+        self.by_key[state["key"]] = document
+        document.text.contentsChange.connect(
+            lambda position, removed, added: self.document_changed(document, position, removed, added)
+        )
+        self.send_edit(document, state, 0, 0, document.text.blockCount())
+        timer.start(0) # The first diagnosis needn't wait
+
+    def untrack(self, document):
+        state = self.tracked.pop(document, None)
+        if state:
+            state["timer"].stop()
+            del self.by_key[state["key"]]
+            self.worker.request("close", state["key"])
+            document.diagnostics = []
+
+    def documents(self):
+        return list(self.tracked)
+
+    def refresh(self):
+        """Diagnoses every document again, e.g. once the project's names are known."""
+        for state in self.tracked.values():
+            self.worker.request("diagnose", state["key"])
+
+    def document_changed(self, document, position, removed, added):
+        state = self.tracked.get(document)
+        if state is None or (not removed and not added):
+            return
+        text = document.text
+        first = text.findBlock(position).blockNumber()
+        end_block = text.findBlock(position + added)
+        last = end_block.blockNumber() if end_block.isValid() else text.blockCount() - 1
+        new_count = last - first + 1
+        old_count = new_count - (text.blockCount() - state["blocks"])
+        self.send_edit(document, state, first, old_count, new_count)
+        state["timer"].start()
+
+    def send_edit(self, document, state, first, old_count, new_count):
+        """Sends the texts of new_count blocks from block first, replacing old_count lines."""
+        text = document.text
+        cursor = QTextCursor(text)
+        cursor.setPosition(text.findBlockByNumber(first).position())
+        last = text.findBlockByNumber(first + new_count - 1)
+        cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+        self.worker.request("edit", state["key"], (first, old_count, cursor.selectedText().split("\u2029")))
+        state["blocks"] = text.blockCount()
+        state["edits"] += 1
+
+    def receive(self, key, edits, diagnostics):
+        document = self.by_key.get(key)
+        # Results from before the latest edit would point at the wrong places
+        if document is not None and self.tracked[document]["edits"] == edits:
+            document.diagnostics = diagnostics
+            self.changed.emit(document)
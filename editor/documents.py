@@ -0,0 +1,68 @@
+import os
+
+from PyQt6.QtWidgets import QPlainTextDocumentLayout
+from PyQt6.QtGui import QTextDocument
+from PyQt6.QtCore import QObject
+
+from .syntax_highlighter import Sn2SyntaxHighlighter
+from .symbol_index import DocumentSymbolIndex
+from .structure import StructureIndex
+
+
+def normalize_path(path):
+    """The registry key for a path: absolute, symlinks resolved, case-folded where the OS ignores case."""
+    return os.path.normcase(os.path.realpath(path))
+
+
+class Document(QObject):
+    """
+    An open file, or an untitled buffer: its text, highlighter, symbol and
+    structure indexes, and diagnostics. Every CodeEditor showing it (in any
+    tab or split pane) shares them, so the file is read and highlighted once
+    however many views it has.
+    """
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.path = path # None until saved
+        self.text = QTextDocument(self)
+        self.text.setDocumentLayout(QPlainTextDocumentLayout(self.text))
+        self.highlighter = Sn2SyntaxHighlighter(self.text)
+        self.symbols = DocumentSymbolIndex(self.text)
+        self.structure = StructureIndex(self.text)
+        self.views = [] # CodeEditors showing it
+        self.diagnostics = [] # (line, column, length, severity, message), set by Diagnostics
+
+    @property
+    def name(self):
+        return os.path.basename(self.path) if self.path else "Untitled"
+
+
+class DocumentRegistry:
+    """
+    The open documents that have a path, keyed by normalized path, so finding
+    whether a file is already open doesn't scan the tabs.
+    """
+    def __init__(self):
+        self.documents = {}
+
+    def get(self, path):
+        return self.documents.get(normalize_path(path))
+
+    def add(self, document):
+        self.documents[normalize_path(document.path)] = document
+
+    def remove(self, document):
+        if document.path and self.get(document.path) is document:
+            del self.documents[normalize_path(document.path)]
+
+    def rename(self, document, path):
+        """Re-registers a document under the path it was saved as."""
+        self.remove(document)
+        document.path = path
+        self.add(document)
+
+    def __iter__(self):
+        return iter(list(self.documents.values()))
+
+    def __len__(self):
+        return len(self.documents)
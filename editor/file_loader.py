@@ -0,0 +1,103 @@
+import codecs
+import mmap
+import os
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+# Files at least this large are opened in large-file mode: the first screen is
+# shown at once and the rest streams in from a background thread.
+LARGE_FILE_BYTES = 5 * 1024 * 1024
+# Files at least this large are also opened read-only without highlighting.
+HUGE_FILE_BYTES = 50 * 1024 * 1024
+# How much is read synchronously for the first screen.
+FIRST_SCREEN_BYTES = 64 * 1024
+# How much the worker hands to the UI thread at a time.
+CHUNK_BYTES = 256 * 1024
+# Chunks emitted but not yet inserted by the UI thread before the worker waits.
+MAX_PENDING_CHUNKS = 2
+
+
+def line_boundary(data, start, size):
+    """Returns the offset just past the last newline in data[start:start + size]."""
+    end = min(len(data), start + size)
+    if end == len(data):
+        return end
+    newline = data.rfind(b"\n", start, end)
+    return newline + 1 if newline != -1 else end
+
+
+def read_first_screen(path):
+    """
+    Reads the beginning of a file up to a line boundary.
+    Returns (text, byte offset where the rest of the file starts).
+    """
+    with open(path, 'rb') as f:
+        head = f.read(FIRST_SCREEN_BYTES)
+    end = len(head)
+    if end == FIRST_SCREEN_BYTES:
+        # There may be more: cut after the last newline, so no character or CRLF is split
+        newline = head.rfind(b"\n")
+        if newline != -1:
+            end = newline + 1
+        else:
+            # One long line: leave a partial character (and a lone CR) to the worker
+            while end > 0 and head[end - 1] & 0xC0 == 0x80:
+                end -= 1
+            if end > 0 and head[end - 1] >= 0xC0:
+                end -= 1
+            if end > 0 and head[end - 1] == ord("\r"):
+                end -= 1
+    return head[:end].decode('utf-8', errors='replace').replace('\r\n', '\n'), end
+
+
+class FileLoadWorker(QObject):
+    """A worker that streams the rest of a large file in a separate thread."""
+    chunk_loaded = pyqtSignal(str) # Decoded text, always ending on a line boundary
+    progress = pyqtSignal(int, int) # (bytes loaded, total bytes)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal() # Signal to emit when the worker is done
+
+    def __init__(self, path, offset):
+        super().__init__()
+        self.path = path
+        self.offset = offset
+        self.cancelled = False
+        self.credits = threading.Semaphore(MAX_PENDING_CHUNKS)
+
+    def cancel(self):
+        self.cancelled = True
+        self.credits.release()
+
+    def chunk_consumed(self):
+        """Called by the UI thread once a chunk is in the document."""
+        self.credits.release()
+
+    def run(self):
+        try:
+            size = os.path.getsize(self.path)
+            if self.offset >= size:
+                return
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            carry = ""
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                pos = self.offset
+                while pos < size and not self.cancelled:
+                    end = line_boundary(data, pos, CHUNK_BYTES)
+                    text = carry + decoder.decode(data[pos:end], final=end >= size)
+                    carry = ""
+                    if text.endswith("\r") and end < size:
+                        # A chunk without a newline may end between the CR and LF of a CRLF
+                        text, carry = text[:-1], "\r"
+                    text = text.replace('\r\n', '\n')
+                    pos = end
+                    # Don't run ahead of the UI thread by more than a few chunks.
+                    self.credits.acquire()
+                    if self.cancelled:
+                        break
+                    self.chunk_loaded.emit(text)
+                    self.progress.emit(pos, size)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit() # Always emit finished signal
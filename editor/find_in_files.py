@@ -0,0 +1,148 @@
+import mmap
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from .file_loader import line_boundary
+from .path_index import walk_files
+
+# Files at least this large are memory-mapped instead of read into memory.
+MMAP_MIN_BYTES = 1024 * 1024
+# A file with a NUL byte in its first few KB is treated as binary and skipped.
+BINARY_SNIFF_BYTES = 8192
+# Large files are decoded and searched a window at a time, so a cancel is
+# noticed quickly. Windows end on a line boundary; a match spanning two
+# windows is not found.
+SCAN_WINDOW_BYTES = 4 * 1024 * 1024
+# Matching lines reported per file, and in total, before the search gives up.
+MAX_FILE_MATCHES = 1000
+MAX_MATCHES = 20000
+# Characters of a matching line shown in the results.
+PREVIEW_CHARS = 200
+# Threads searching files at once. Reads overlap; matching itself holds the GIL.
+SEARCH_THREADS = min(8, (os.cpu_count() or 1) + 2)
+
+
+def compile_query(query, regex=False, case_sensitive=False):
+    """
+    Compiles the query into a pattern for decoded text, so case folding,
+    "." and character classes work on characters, not bytes. Raises
+    re.error for a bad regex.
+    """
+    source = query if regex else re.escape(query)
+    return re.compile(source, re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE)
+
+
+def search_text(text, pattern, cancelled):
+    """
+    Returns [(line, column, length, preview)] for each line of text with a
+    match; lines are 0-based and columns count code points. Only the first
+    match of a line is reported.
+    """
+    matches = []
+    line = 0
+    line_start = pos = 0
+    while pos <= len(text) and len(matches) < MAX_FILE_MATCHES and not cancelled.is_set():
+        match = pattern.search(text, pos)
+        if not match:
+            break
+        line += text.count("\n", line_start, match.start())
+        line_start = text.rfind("\n", 0, match.start()) + 1
+        line_end = text.find("\n", match.start())
+        if line_end == -1:
+            line_end = len(text)
+        preview = text[line_start:line_end].rstrip("\r")
+        column = match.start() - line_start
+        length = min(match.end(), line_end) - match.start()
+        matches.append((line, column, length, preview[:PREVIEW_CHARS].strip()))
+        # Go on from the next line
+        pos = line_end + 1
+    return matches
+
+
+def search_file(path, pattern, cancelled):
+    """Returns the matches in one file, or [] if it is binary or unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            if b"\0" in f.read(BINARY_SNIFF_BYTES):
+                return []
+            size = os.fstat(f.fileno()).st_size
+            if size < MMAP_MIN_BYTES:
+                f.seek(0)
+                return search_text(f.read().decode('utf-8', errors='replace'), pattern, cancelled)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                matches = []
+                lines = 0
+                start = 0
+                while start < size and len(matches) < MAX_FILE_MATCHES and not cancelled.is_set():
+                    end = line_boundary(data, start, SCAN_WINDOW_BYTES)
+                    window = data[start:end].decode('utf-8', errors='replace')
+                    for line, column, length, preview in search_text(window, pattern, cancelled):
+                        matches.append((lines + line, column, length, preview))
+                    lines += window.count("\n")
+                    start = end
+                return matches[:MAX_FILE_MATCHES]
+    except (OSError, ValueError):
+        return []
+
+
+class FindInFilesWorker(QObject):
+    """
+    A worker that searches every file under a folder in a separate thread,
+    spreading the files over a thread pool. Matches are emitted file by file
+    as they are found.
+    """
+    file_matched = pyqtSignal(str, list) # (path, [(line, column, length, preview), ...])
+    progress = pyqtSignal(int) # files searched so far
+    finished = pyqtSignal(bool) # True if it stopped at MAX_MATCHES
+
+    def __init__(self, root, pattern):
+        super().__init__()
+        self.root = root
+        self.pattern = pattern
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        truncated = False
+        try:
+            truncated = self.search()
+        except Exception as e:
+            print(f"Find in files failed: {e}")
+        finally:
+            self.finished.emit(truncated) # Always emit finished signal
+
+    def search(self):
+        files = (os.path.join(directory, name) for directory, names, _ in walk_files(self.root) for name in names)
+        searched = found = 0
+        with ThreadPoolExecutor(max_workers=SEARCH_THREADS) as pool:
+            # Keep a few files per thread in flight, so a cancel is quick
+            limit = 4 * SEARCH_THREADS
+            pending = {}
+            while not self.cancelled.is_set():
+                for path in files:
+                    pending[pool.submit(search_file, path, self.pattern, self.cancelled)] = path
+                    if len(pending) >= limit:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    matches = future.result()
+                    searched += 1
+                    if matches and not self.cancelled.is_set():
+                        self.file_matched.emit(path, matches)
+                        found += len(matches)
+                self.progress.emit(searched)
+                if found >= MAX_MATCHES:
+                    self.cancelled.set()
+                    return True
+            for future in pending:
+                future.cancel()
+        return False
@@ -0,0 +1,154 @@
+import cProfile
+import collections
+import functools
+import json
+import sys
+import threading
+import time
+
+from PyQt6.QtCore import QTimer
+
+# Samples kept per metric; percentiles are over this rolling window.
+WINDOW_SAMPLES = 2048
+# How often the sampling profiler looks at the UI thread's stack, in seconds.
+SAMPLE_INTERVAL = 0.001
+
+
+class Metric:
+    """Rolling timings of one hot path."""
+    def __init__(self, name):
+        self.name = name
+        self.samples = collections.deque(maxlen=WINDOW_SAMPLES)
+        self.count = 0 # Calls since the last reset, including rolled-off ones
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        """Returns count, total and p50/p95/p99/max of the window, in milliseconds."""
+        ordered = sorted(self.samples)
+        def pick(fraction):
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000 if ordered else 0.0
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "p50_ms": pick(0.50),
+            "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99),
+            "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        }
+
+
+class Instrumentation:
+    """
+    Opt-in timers for the editor's hot paths. Functions decorated with
+    timed() cost one attribute check per call while this is disabled.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.metrics = {} # name -> Metric
+
+    def timed(self, name):
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def record(self, name, seconds):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = Metric(name)
+        metric.add(seconds)
+
+    def reset(self):
+        self.metrics = {}
+
+    def summary(self):
+        return {name: metric.summary() for name, metric in sorted(self.metrics.items())}
+
+    def dump_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "metrics": self.summary()}, f, indent=2)
+
+
+instrumentation = Instrumentation()
+timed = instrumentation.timed
+
+
+# --- Trace capture ---
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread from a background thread and writes
+    folded stacks ("outer;inner count" per line), the input flame graph
+    tools take.
+    """
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.stacks = collections.Counter()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopping.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def capture_trace(path, seconds, done):
+    """
+    Profiles the calling (UI) thread for the next `seconds` and writes the
+    result to path: folded stacks from the sampling profiler if path ends in
+    .folded, otherwise cProfile stats for pstats/snakeviz. Calls
+    done(path, error) afterwards, with error None if the file was written.
+    """
+    if path.endswith(".folded"):
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+        def stop():
+            profiler.stop()
+            profiler.write(path)
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        def stop():
+            profiler.disable()
+            profiler.dump_stats(path)
+
+    def finish():
+        try:
+            stop()
+        except OSError as e:
+            done(path, str(e))
+        else:
+            done(path, None)
+    QTimer.singleShot(int(seconds * 1000), finish)
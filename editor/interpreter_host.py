@@ -0,0 +1,59 @@
+"""
+A pre-started Sn2 interpreter process, used by InterpreterPool.
+
+Run as `python interpreter_host.py <path to sn2_interpreter.py>`. The host
+pays for Python startup, imports the modules the interpreter imports and
+compiles it, then waits for one line on stdin naming the script to run.
+From there it behaves exactly like `python sn2_interpreter.py <script>`:
+the script's output goes to stdout and stdin stays connected for input().
+Each host runs a single script and exits.
+
+Deliberately free of Qt and editor imports, so it starts quickly.
+"""
+import ast
+import importlib
+import os
+import sys
+import types
+
+
+def preload(interpreter_path):
+    """Compiles the interpreter and imports the modules it imports at the top level."""
+    with open(interpreter_path, 'rb') as f:
+        source = f.read()
+    code = compile(source, interpreter_path, 'exec')
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass # The interpreter will report it when it runs
+    return code
+
+
+def main():
+    interpreter_path = os.path.abspath(sys.argv[1])
+    # Same module search path as running the interpreter as a script
+    sys.path[0] = os.path.dirname(interpreter_path)
+    code = preload(interpreter_path)
+
+    script = sys.stdin.readline().rstrip("\n")
+    if not script:
+        return # The pool shut us down
+
+    sys.argv = [interpreter_path, script]
+    main_module = types.ModuleType("__main__")
+    main_module.__file__ = interpreter_path
+    main_module.__builtins__ = __builtins__
+    sys.modules["__main__"] = main_module
+    exec(code, main_module.__dict__)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+
+from PyQt6.QtCore import QObject, QProcess, QTimer
+
+HOST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "interpreter_host.py")
+# Warm interpreters kept waiting, unless the "interpreter_pool_size" setting says otherwise.
+DEFAULT_POOL_SIZE = 1
+
+
+class InterpreterPool(QObject):
+    """
+    Keeps a few interpreter_host processes started and waiting, so a Run
+    doesn't pay for Python startup and the interpreter's imports. Each host
+    runs one script; it is replaced in the background when handed out.
+    """
+    def __init__(self, interpreter_path, size=DEFAULT_POOL_SIZE, parent=None):
+        super().__init__(parent)
+        self.interpreter_path = interpreter_path
+        self.size = size
+        self.idle = [] # started hosts waiting for a script
+
+    def start_process(self, script, parent):
+        """
+        Returns a QProcess, owned by parent, running the interpreter on script:
+        a warm host if one is waiting, otherwise a freshly spawned interpreter.
+        Output channels are merged; connect to the process's signals right away.
+        """
+        process = self.acquire(parent)
+        if process:
+            process.write(f"{script}\n".encode())
+        else:
+            process = QProcess(parent)
+            process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+            # Call the python interpreter directly for more reliable output capturing
+            process.start(sys.executable, [self.interpreter_path, script])
+        return process
+
+    def acquire(self, parent):
+        """Hands a waiting host over to parent, or returns None if none is running."""
+        process = None
+        while self.idle and process is None:
+            candidate = self.idle.pop(0)
+            candidate.finished.disconnect(self.host_exited)
+            if candidate.state() == QProcess.ProcessState.NotRunning:
+                candidate.deleteLater()
+            else:
+                candidate.setParent(parent)
+                process = candidate
+        # Replace it once the caller has started its run
+        QTimer.singleShot(0, self.fill)
+        return process
+
+    def fill(self):
+        if not os.path.isfile(self.interpreter_path):
+            return
+        while len(self.idle) < self.size:
+            process = QProcess(self)
+            process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+            process.finished.connect(self.host_exited)
+            process.start(sys.executable, [HOST_SCRIPT, self.interpreter_path])
+            self.idle.append(process)
+
+    def host_exited(self):
+        # A host died before being used (e.g. the interpreter failed to load).
+        # Drop it; it is replaced on the next Run rather than respawned in a loop.
+        for process in [p for p in self.idle if p.state() == QProcess.ProcessState.NotRunning]:
+            self.idle.remove(process)
+            process.deleteLater()
+
+    def set_size(self, size):
+        self.size = size
+        while len(self.idle) > size:
+            self.stop_host(self.idle.pop())
+        self.fill()
+
+    def stop_host(self, process):
+        process.finished.disconnect(self.host_exited)
+        process.closeWriteChannel() # An empty line: the host exits without running anything
+        if not process.waitForFinished(1000):
+            process.kill()
+            process.waitForFinished(1000)
+        process.deleteLater()
+
+    def shutdown(self):
+        while self.idle:
+            self.stop_host(self.idle.pop())
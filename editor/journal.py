@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from PyQt6.QtGui import QTextCursor, QTextDocument
+from PyQt6.QtCore import QObject, QLockFile, QStandardPaths, QTimer, pyqtSignal
+
+from .save_worker import atomic_write
+
+# Once a document's journal has this many bytes of edits, it is rewritten as
+# a snapshot of the text.
+JOURNAL_COMPACT_BYTES = 512 * 1024
+JOURNAL_SUFFIX = ".journal"
+
+
+def default_recovery_dir():
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericDataLocation)
+    return os.path.join(location, "Sn2Editor", "recovery")
+
+
+def header_line(path, text=None, file_state=None):
+    """
+    The first line of a journal: the document's path (None if untitled) and
+    what the edits apply to, either a snapshot of the text or the file as it
+    was on disk, identified by [mtime_ns, size].
+    """
+    return json.dumps({"path": path, "text": text, "file": file_state}) + "\n"
+
+
+def replay(journal_path):
+    """
+    Rebuilds a document from its journal. Returns (path, text, base text).
+    Raises OSError or ValueError if the journal can't be replayed, e.g.
+    because the file it starts from has changed since.
+    """
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        lines = f.read().split("\n")
+    header = json.loads(lines[0])
+    path = header["path"]
+    base = header["text"]
+    if base is None:
+        st = os.stat(path)
+        if [st.st_mtime_ns, st.st_size] != header["file"]:
+            raise ValueError(f"'{path}' has changed on disk since it was edited")
+        with open(path, 'r', encoding='utf-8') as f:
+            base = f.read()
+
+    # Positions are QTextDocument positions, so replay the edits on one
+    document = QTextDocument()
+    document.setPlainText(base)
+    cursor = QTextCursor(document)
+    end = document.characterCount() - 1
+    for line in lines[1:]:
+        try:
+            position, removed, added = json.loads(line)
+        except ValueError:
+            break # The last line may have been cut short by the crash
+        cursor.setPosition(min(position, end))
+        cursor.setPosition(min(position + removed, end), QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(added)
+        end = document.characterCount() - 1
+    return path, document.toPlainText(), base
+
+
+class JournalWriter(QObject):
+    """
+    A worker that writes journals in a separate thread, so typing never
+    waits for the disk. Requests are handled in order; appends to the same
+    journal that queue up are written together.
+    """
+    failed = pyqtSignal(str) # error message
+    finished = pyqtSignal() # Signal to emit when the worker is done
+
+    def __init__(self):
+        super().__init__()
+        # (journal path, "append" | "snapshot" | "delete", text); a snapshot's
+        # text is (document path, document text), serialized when written
+        self.pending = []
+        self.condition = threading.Condition()
+        self.stopping = False
+
+    def request(self, journal_path, action, text=""):
+        """Queues a write. Safe to call from any thread."""
+        with self.condition:
+            if self.pending and self.pending[-1][:2] == (journal_path, "append") and action == "append":
+                self.pending[-1] = (journal_path, action, self.pending[-1][2] + text)
+            else:
+                self.pending.append((journal_path, action, text))
+            self.condition.notify()
+
+    def stop(self):
+        """Asks the worker to finish once everything queued has been written."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending and not self.stopping:
+                        self.condition.wait()
+                    if not self.pending:
+                        return
+                    requests, self.pending = self.pending, []
+                for journal_path, action, text in requests:
+                    try:
+                        self.write(journal_path, action, text)
+                    except OSError as e:
+                        self.failed.emit(str(e))
+        finally:
+            self.finished.emit() # Always emit finished signal
+
+    def write(self, journal_path, action, text):
+        if action == "append":
+            with open(journal_path, 'a', encoding='utf-8') as f:
+                f.write(text)
+        elif action == "snapshot":
+            atomic_write(journal_path, header_line(*text))
+        elif os.path.exists(journal_path):
+            os.remove(journal_path)
+
+
+class RecoveryJournal(QObject):
+    """
+    Journals the edits of every open document, so unsaved work survives a
+    crash. Each running editor keeps its journals in a session directory of
+    its own, locked while it runs; a directory whose lock is free on the
+    next launch was left by a crash.
+    """
+    def __init__(self, writer, directory=None, parent=None):
+        super().__init__(parent)
+        self.writer = writer
+        self.directory = directory or default_recovery_dir()
+        self.session_dir = os.path.join(self.directory, uuid.uuid4().hex)
+        os.makedirs(self.session_dir, exist_ok=True)
+        self.lock = QLockFile(os.path.join(self.session_dir, "lock"))
+        self.lock.tryLock(0)
+        self.journals = {} # Document -> journal state
+
+    # --- Recording ---
+
+    def track(self, document):
+        """
+        Starts journaling a document whose text is as loaded from its file
+        (or empty, if it has no path). Nothing is written until it's edited.
+        """
+        file_state = None
+        if document.path:
+            try:
+                st = os.stat(document.path)
+                file_state = [st.st_mtime_ns, st.st_size]
+            except OSError:
+                pass
+        state = {
+            "path": os.path.join(self.session_dir, uuid.uuid4().hex + JOURNAL_SUFFIX),
+            "header": header_line(document.path, None if file_state else "", file_state),
+            "bytes": 0,
+            "compacting": False,
+        }
+        self.journals[document] = state
+        document.text.contentsChange.connect(
+            lambda position, removed, added: self.record(document, position, removed, added)
+        )
+
+    def record(self, document, position, removed, added):
+        state = self.journals.get(document)
+        if state is None or (not removed and not added):
+            return
+        text = ""
+        if added:
+            cursor = QTextCursor(document.text)
+            end = document.text.characterCount() - 1
+            cursor.setPosition(min(position, end))
+            cursor.setPosition(min(position + added, end), QTextCursor.MoveMode.KeepAnchor)
+            text = cursor.selectedText().replace("\u2029", "\n") # Paragraph separators
+        line = json.dumps([position, removed, text]) + "\n"
+        if state["header"]:
+            # The first edit creates the journal
+            line = state["header"] + line
+            state["header"] = None
+        self.writer.request(state["path"], "append", line)
+        state["bytes"] += len(line)
+        if state["bytes"] >= JOURNAL_COMPACT_BYTES and not state["compacting"]:
+            # Off this keystroke: copying the text out can take a few milliseconds
+            state["compacting"] = True
+            QTimer.singleShot(0, lambda: self.snapshot(document))
+
+    def snapshot(self, document, text=None):
+        """
+        Replaces the document's journal with a snapshot of its text (which
+        the caller may pass if it has it at hand, e.g. when saving).
+        """
+        state = self.journals.get(document)
+        if state is None:
+            return
+        if text is None:
+            text = document.text.toPlainText()
+        self.writer.request(state["path"], "snapshot", (document.path, text))
+        state["header"] = None
+        state["bytes"] = 0
+        state["compacting"] = False
+
+    def discard(self, document):
+        """Stops journaling a document, deleting its journal."""
+        state = self.journals.pop(document, None)
+        if state and state["header"] is None:
+            self.writer.request(state["path"], "delete")
+
+    def close(self):
+        """On a clean exit: deletes the session's journals. Call once the writer has stopped."""
+        self.journals.clear()
+        self.lock.unlock()
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+
+    # --- Recovery ---
+
+    def crashed_sessions(self):
+        """Returns [(session directory, [journal paths])] left behind by editors that didn't exit cleanly."""
+        sessions = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return sessions
+        for name in names:
+            session_dir = os.path.join(self.directory, name)
+            if session_dir == self.session_dir or not os.path.isdir(session_dir):
+                continue
+            lock = QLockFile(os.path.join(session_dir, "lock"))
+            if not lock.tryLock(0):
+                continue # Another editor is running with it
+            lock.unlock()
+            journals = sorted(
+                os.path.join(session_dir, f) for f in os.listdir(session_dir) if f.endswith(JOURNAL_SUFFIX)
+            )
+            sessions.append((session_dir, journals))
+        return sessions
+
+    def remove_session(self, session_dir):
+        shutil.rmtree(session_dir, ignore_errors=True)
@@ -1,45 +1,141 @@
 import sys
 import os
+import re
+import shutil
+import tempfile
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QFileDialog,
     QMessageBox, QTabWidget, QToolBar, QDockWidget, QTreeView, QSizePolicy, QMenu, QToolButton,
-    QLabel
+    QLabel, QSplitter
 )
 from PyQt6.QtGui import (
-    QFont, QIcon, QAction, QPalette, QFileSystemModel, QActionGroup, QDesktopServices
+    QFont, QIcon, QAction, QFileSystemModel, QActionGroup, QDesktopServices, QTextCursor
 )
 from PyQt6.QtCore import (
-    Qt, QDir, QSettings, QProcess, QUrl, QThread
+    Qt, QDir, QSettings, QUrl, QThread, QTimer, QFileSystemWatcher
 )
 
-from .themes import THEMES, DEFAULT_THEME
-from .widgets import CodeEditor, TerminalWidget
-from .update_worker import UpdateWorker
+from .themes import THEMES, DEFAULT_THEME, app_palette
+from .widgets import (
+    CodeEditor, TerminalWidget, RunPane, RunAllPanel, QuickOpenDialog, FindInFilesPanel, ProblemsPanel,
+    OutlinePanel, TabPlaceholder
+)
+from .documents import Document, DocumentRegistry, normalize_path
+from .update_worker import UpdateWorker, is_newer, update_check_due, DEFAULT_DOWNLOAD_URL
+from .save_worker import SaveWorker
+from .journal import JournalWriter, RecoveryJournal, replay
+from .diagnostics import Diagnostics, DiagnosticsWorker, DIAGNOSTICS_DELAY_MS
+from .interpreter_pool import InterpreterPool, DEFAULT_POOL_SIZE
+from .run_manager import RunManager, QUEUED, RUNNING
+from .batch_runner import BatchRunner, BatchRunWorker
+from .project_index import ProjectIndex, ProjectIndexWorker, FileParseWorker
+from .path_index import PathIndexWorker
+from .find_in_files import FindInFilesWorker, compile_query
+from .instrumentation import instrumentation, timed, capture_trace
+from .file_loader import FileLoadWorker, read_first_screen, LARGE_FILE_BYTES, HUGE_FILE_BYTES
+from .token_cache import TokenCache, TOKEN_CACHE_BYTES
+
+# How often the performance overlay refreshes, in milliseconds.
+PERF_OVERLAY_MS = 500
+# How often the elapsed time of running scripts is updated, in milliseconds.
+RUN_STATUS_MS = 1000
+# Directories watched for quick open; OS watch limits make watching huge trees fail.
+WATCHED_DIRECTORIES_LIMIT = 4096
 
 # Add project root to sys.path to allow finding the sn2_interpreter
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    """
+    The editor window. Only what the first frame needs is built in __init__;
+    the explorer model, the terminal, the theme menu and the update check
+    are set up by finish_startup once the window has been shown.
+    """
+    def __init__(self, startup_profile=None, storage_dir=None):
         super().__init__()
+        self.startup_profile = startup_profile # StartupProfile when started with --startup-profile
+        # Where recovery journals, the token cache and the project index are
+        # kept; None for the user's data and cache folders
+        self.storage_dir = storage_dir
+        self.startup_pending = True
         self.settings = QSettings("Sn2Lang", "Sn2Editor")
         self.current_folder_path = None
         self.interpreter_path = os.path.join(project_root, "bin", "sn2_interpreter.py")
+        self.file_loaders = {} # Document -> (QThread, FileLoadWorker) while a large file streams in
+        self.documents = DocumentRegistry()
+        self.placeholders = {} # normalized path -> TabPlaceholder of a restored tab not shown yet
+        self.project_index = ProjectIndex()
+        self.project_indexer = None # (QThread, ProjectIndexWorker) while the open folder is being indexed
+        self.path_index = None # PathIndex of the open folder, for quick open
+        self.path_indexer = None # (QThread, PathIndexWorker) while it is being built
+        self.path_watcher = None # QFileSystemWatcher keeping path_index up to date
+        self.quick_open_dialog = None
+        self.outline_dock = None # Created the first time the outline is shown; follows the current tab
+        self.interpreter_pool = InterpreterPool(
+            self.interpreter_path, self.settings.value("interpreter_pool_size", DEFAULT_POOL_SIZE, type=int), self
+        )
+        # Runs in parallel, up to max_parallel_runs (default: one per core)
+        self.run_manager = RunManager(
+            self.interpreter_pool, self.settings.value("max_parallel_runs", os.cpu_count() or 1, type=int), self
+        )
+        self.run_manager.run_changed.connect(self.update_run_pane)
+        self.batch_run = None # (QThread, BatchRunWorker) while Run All is going
+        self.run_all_output_dir = None # Logs of the last Run All, removed by the next one and on exit
+        self.find_search = None # (QThread, FindInFilesWorker) while a find in files search runs
+        # Tokens of large files, so reopening an unchanged one skips the tokenizer
+        self.token_cache = TokenCache(self.storage_path("tokens"), max_bytes=self.settings.value("token_cache_bytes", TOKEN_CACHE_BYTES, type=int))
         self.init_ui()
+        self.start_save_worker()
+        self.start_file_parser()
+        self.start_journal_writer()
+        self.start_diagnostics_worker()
+        self.mark_startup("build window")
         self.restore_settings()
+        self.mark_startup("restore settings")
+
+    def mark_startup(self, phase):
+        if self.startup_profile:
+            self.startup_profile.mark(phase)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.startup_pending:
+            self.startup_pending = False
+            # A zero timer runs after the paint events the show just queued
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Builds what the first frame didn't need."""
+        self.mark_startup("first paint")
+        self.create_terminal_dock()
+        self.mark_startup("terminal")
+        if self.current_folder_path is None:
+            self.set_folder_view(self.settings.value("last_folder", QDir.homePath()))
+        self.mark_startup("explorer")
+        self.tab_activated(self.tab_widget.currentIndex()) # The restored session's current tab
+        self.mark_startup("current tab")
+        self.recover_unsaved_work()
+        self.mark_startup("recovery")
         self.check_for_updates()
+        self.mark_startup("update check")
+        self.interpreter_pool.fill()
+        self.mark_startup("interpreter pool")
+        if self.startup_profile:
+            self.startup_profile.report()
 
     def init_ui(self):
         self.setWindowTitle("Sn2 Code Editor")
         self.setWindowIcon(QIcon(os.path.join(project_root, "bin", "sn2.ico")))
         self.resize(1200, 800)
 
-        # --- Central Widget: Tabbed Editor ---
-        self.tab_widget = QTabWidget()
-        self.tab_widget.setTabsClosable(True)
-        self.tab_widget.tabCloseRequested.connect(self.close_tab)
-        self.setCentralWidget(self.tab_widget)
+        # --- Central Widget: Tabbed Editor Panes ---
+        # Split Editor adds panes side by side; tab_widget is the active one
+        self.editor_splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.panes = []
+        self.tab_widget = self.create_pane()
+        self.setCentralWidget(self.editor_splitter)
+        QApplication.instance().focusChanged.connect(self.focus_changed)
 
         # --- Welcome Page ---
         self.show_welcome_page()
@@ -50,6 +146,15 @@ class MainWindow(QMainWindow):
         self.create_docks()
         self.create_toolbar()
 
+        # --- Performance Overlay ---
+        # Hidden until enabled from View > Performance
+        self.perf_label = QLabel()
+        self.perf_label.hide()
+        self.statusBar().addPermanentWidget(self.perf_label)
+        self.perf_timer = QTimer(self)
+        self.perf_timer.setInterval(PERF_OVERLAY_MS)
+        self.perf_timer.timeout.connect(self.update_perf_overlay)
+
     def show_welcome_page(self):
         self.welcome_widget = QWidget()
         main_layout = QVBoxLayout(self.welcome_widget)
@@ -88,8 +193,8 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(open_folder_btn)
         main_layout.addWidget(doc_link)
 
-        self.tab_widget.addTab(self.welcome_widget, "Welcome")
-        self.tab_widget.setTabsClosable(False) # Can't close welcome tab
+        self.panes[0].addTab(self.welcome_widget, "Welcome")
+        self.panes[0].setTabsClosable(False) # Can't close welcome tab
 
     def create_actions(self):
         self.new_action = QAction(QIcon.fromTheme("document-new"), "&New", self)
@@ -104,8 +209,48 @@ class MainWindow(QMainWindow):
         self.save_as_action.triggered.connect(self.save_file_as)
         self.run_action = QAction(QIcon.fromTheme("system-run"), "&Run Sn2 Code", self)
         self.run_action.triggered.connect(self.run_code)
+        self.run_all_action = QAction(QIcon.fromTheme("media-seek-forward"), "Run &All Sn2 Files in Folder", self)
+        self.run_all_action.triggered.connect(self.run_all)
         self.about_action = QAction(QIcon.fromTheme("help-about"), "&About", self)
         self.about_action.triggered.connect(self.show_about_dialog)
+        self.goto_definition_action = QAction("Go to &Definition", self)
+        self.goto_definition_action.setShortcut("F12")
+        self.goto_definition_action.triggered.connect(self.go_to_definition)
+        self.addAction(self.goto_definition_action)
+        self.quick_open_action = QAction("&Quick Open...", self)
+        self.quick_open_action.setShortcut("Ctrl+P")
+        self.quick_open_action.triggered.connect(self.quick_open)
+        self.addAction(self.quick_open_action)
+        self.find_in_files_action = QAction("Find in &Files...", self)
+        self.find_in_files_action.setShortcut("Ctrl+Shift+F")
+        self.find_in_files_action.triggered.connect(self.show_find_in_files)
+        self.addAction(self.find_in_files_action)
+        self.split_editor_action = QAction("&Split Editor", self)
+        self.split_editor_action.setShortcut("Ctrl+\\")
+        self.split_editor_action.triggered.connect(self.split_editor)
+        self.addAction(self.split_editor_action)
+        self.problems_action = QAction("&Problems", self)
+        self.problems_action.setShortcut("Ctrl+Shift+M")
+        self.problems_action.triggered.connect(self.show_problems)
+        self.addAction(self.problems_action)
+        self.outline_action = QAction("&Outline", self)
+        self.outline_action.setShortcut("Ctrl+Shift+O")
+        self.outline_action.triggered.connect(self.show_outline)
+        self.addAction(self.outline_action)
+        self.fold_action = QAction("&Fold", self)
+        self.fold_action.setShortcut("Ctrl+Shift+[")
+        self.fold_action.triggered.connect(lambda: self.with_current_editor(CodeEditor.fold_at_cursor))
+        self.addAction(self.fold_action)
+        self.unfold_action = QAction("&Unfold", self)
+        self.unfold_action.setShortcut("Ctrl+Shift+]")
+        self.unfold_action.triggered.connect(lambda: self.with_current_editor(CodeEditor.unfold_at_cursor))
+        self.addAction(self.unfold_action)
+        self.perf_overlay_action = QAction("Performance &Overlay", self, checkable=True)
+        self.perf_overlay_action.toggled.connect(self.toggle_perf_overlay)
+        self.save_perf_stats_action = QAction("Save Performance &Stats...", self)
+        self.save_perf_stats_action.triggered.connect(self.save_perf_stats)
+        self.capture_profile_action = QAction("&Capture Profile...", self)
+        self.capture_profile_action.triggered.connect(self.capture_profile)
 
 
     def create_toolbar(self):
@@ -139,18 +284,29 @@ class MainWindow(QMainWindow):
         toolbar.addWidget(view_button)
 
         # --- Populate the View Menu ---
-        theme_menu = view_menu.addMenu("Themes")
+        # Theme entries are created the first time the menu opens
+        self.theme_menu = view_menu.addMenu("Themes")
+        self.theme_menu.aboutToShow.connect(self.populate_theme_menu)
         self.theme_group = QActionGroup(self)
         self.theme_group.setExclusive(True)
-        for theme_name in THEMES:
-            action = QAction(theme_name, self, checkable=True)
-            action.triggered.connect(lambda checked, name=theme_name: self.apply_theme(name))
-            theme_menu.addAction(action)
-            self.theme_group.addAction(action)
 
         view_menu.addSeparator()
         view_menu.addAction(self.explorer_dock.toggleViewAction())
-        view_menu.addAction(self.terminal_dock.toggleViewAction())
+        # The terminal's toggle goes before this separator once the dock exists
+        self.view_menu = view_menu
+        self.view_menu_docks_end = view_menu.addSeparator()
+        view_menu.addAction(self.quick_open_action)
+        view_menu.addAction(self.find_in_files_action)
+        view_menu.addAction(self.problems_action)
+        view_menu.addAction(self.outline_action)
+        view_menu.addAction(self.goto_definition_action)
+        view_menu.addAction(self.split_editor_action)
+        view_menu.addAction(self.fold_action)
+        view_menu.addAction(self.unfold_action)
+        perf_menu = view_menu.addMenu("Performance")
+        perf_menu.addAction(self.perf_overlay_action)
+        perf_menu.addAction(self.save_perf_stats_action)
+        perf_menu.addAction(self.capture_profile_action)
 
         view_menu.addSeparator()
         view_menu.addAction(self.about_action)
@@ -161,49 +317,222 @@ class MainWindow(QMainWindow):
         toolbar.addWidget(spacer)
 
         toolbar.addAction(self.run_action)
+        toolbar.addAction(self.run_all_action)
 
     def create_docks(self):
         # --- File Explorer Dock ---
+        # The model is created when a folder is first shown (see create_file_system_model)
         self.explorer_dock = QDockWidget("File Explorer", self)
+        self.file_system_model = None
+        self.tree_view = QTreeView()
+        self.tree_view.doubleClicked.connect(self.explorer_file_opened)
+
+        self.explorer_dock.setWidget(self.tree_view)
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.explorer_dock)
+
+        # --- Terminal Dock ---
+        # Created after the first paint by create_terminal_dock. Holds the
+        # editor's own messages plus one RunPane tab per run.
+        self.terminal_dock = None
+        self.terminal = None
+        self.run_tabs = None
+        self.run_status_timer = QTimer(self)
+        self.run_status_timer.setInterval(RUN_STATUS_MS)
+        self.run_status_timer.timeout.connect(self.update_running_panes)
+
+        # --- Run All Dock ---
+        # Created the first time Run All is used
+        self.run_all_dock = None
+
+        # --- Find in Files Dock ---
+        # Created the first time Find in Files is used
+        self.find_dock = None
+
+        # --- Problems Dock ---
+        # Created the first time it is shown
+        self.problems_dock = None
+
+        # --- Splitter ---
+        self.setCorner(Qt.Corner.BottomLeftCorner, Qt.DockWidgetArea.LeftDockWidgetArea)
+
+    def create_file_system_model(self):
         self.file_system_model = QFileSystemModel()
         self.file_system_model.setFilter(QDir.Filter.NoDotAndDotDot | QDir.Filter.AllDirs | QDir.Filter.Files)
         self.file_system_model.setNameFilters(["*.sn2", "*.txt"])
         self.file_system_model.setNameFilterDisables(False)
-
-        self.tree_view = QTreeView()
         self.tree_view.setModel(self.file_system_model)
-        self.tree_view.doubleClicked.connect(self.explorer_file_opened)
-        
+
         # Hide unnecessary columns
         for i in range(1, self.file_system_model.columnCount()):
             self.tree_view.hideColumn(i)
 
-        self.explorer_dock.setWidget(self.tree_view)
-        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.explorer_dock)
-
-        # --- Terminal Dock ---
+    def create_terminal_dock(self):
+        if self.terminal_dock:
+            return
         self.terminal_dock = QDockWidget("Terminal", self)
         self.terminal = TerminalWidget()
-        self.terminal_dock.setWidget(self.terminal)
+        self.terminal.set_theme(THEMES[self.settings.value("theme", DEFAULT_THEME)])
+        self.run_tabs = QTabWidget()
+        self.run_tabs.setTabsClosable(True)
+        self.run_tabs.tabCloseRequested.connect(self.close_run_tab)
+        self.run_tabs.addTab(self.terminal, "Terminal")
+        # The editor's own terminal can't be closed
+        self.run_tabs.tabBar().setTabButton(0, self.run_tabs.tabBar().ButtonPosition.RightSide, None)
+        self.terminal_dock.setWidget(self.run_tabs)
         self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.terminal_dock)
-
-        # --- Splitter ---
-        self.setCorner(Qt.Corner.BottomLeftCorner, Qt.DockWidgetArea.LeftDockWidgetArea)
+        self.view_menu.insertAction(self.view_menu_docks_end, self.terminal_dock.toggleViewAction())
 
     def restore_settings(self):
         theme_name = self.settings.value("theme", DEFAULT_THEME, type=str)
         self.apply_theme(theme_name)
 
-        last_folder = self.settings.value("last_folder", QDir.homePath())
-        self.set_folder_view(last_folder)
-        
+        # The last folder is opened by finish_startup
         geometry = self.settings.value("geometry")
         if geometry:
             self.restoreGeometry(geometry)
         state = self.settings.value("windowState")
         if state:
             self.restoreState(state)
-
+        self.restore_session()
+
+    def restore_session(self):
+        """
+        Reopens the tabs of the last session as placeholders. Each file is read
+        when its tab is first shown, so a big session costs almost nothing here.
+        """
+        count = self.settings.beginReadArray("session_tabs")
+        tabs = []
+        for i in range(count):
+            self.settings.setArrayIndex(i)
+            tabs.append((
+                self.settings.value("path", "", type=str),
+                self.settings.value("cursor", 0, type=int),
+                self.settings.value("scroll", 0, type=int),
+            ))
+        self.settings.endArray()
+        current = self.settings.value("session_current_tab", 0, type=int)
+
+        for i, (path, cursor_position, scroll_position) in enumerate(tabs):
+            if not os.path.isfile(path) or normalize_path(path) in self.placeholders:
+                continue
+            placeholder = TabPlaceholder(path, cursor_position, scroll_position)
+            self.placeholders[normalize_path(path)] = placeholder
+            index = self.add_tab(placeholder, path, os.path.basename(path))
+            if i == current:
+                self.tab_widget.setCurrentIndex(index)
+
+    def save_session(self):
+        """
+        Remembers the open files, with their cursor and scroll positions. A
+        file shown in several panes is saved once, with its first view's state.
+        """
+        current = 0
+        self.settings.beginWriteArray("session_tabs")
+        saved = 0
+        saved_documents = set()
+        for pane in self.panes:
+            for i in range(pane.count()):
+                widget = pane.widget(i)
+                if isinstance(widget, TabPlaceholder):
+                    path, state = widget.path, (widget.cursor_position, widget.scroll_position)
+                elif isinstance(widget, CodeEditor) and widget.doc.path and widget.doc not in saved_documents:
+                    path, state = widget.doc.path, widget.view_state()
+                    saved_documents.add(widget.doc)
+                else:
+                    continue # Welcome page, untitled files, further views
+                if widget is self.tab_widget.currentWidget():
+                    current = saved
+                self.settings.setArrayIndex(saved)
+                self.settings.setValue("path", path)
+                self.settings.setValue("cursor", state[0])
+                self.settings.setValue("scroll", state[1])
+                saved += 1
+        self.settings.endArray()
+        self.settings.setValue("session_current_tab", current)
+
+    def tab_activated(self, index, pane=None):
+        pane = pane or self.tab_widget
+        widget = pane.widget(index)
+        # Restored tabs load once the window is up
+        if isinstance(widget, TabPlaceholder) and not self.startup_pending:
+            self.add_editor_tab(widget.path, pane.tabText(index), widget)
+        self.update_outline()
+
+    # --- Editor Panes ---
+
+    def create_pane(self):
+        pane = QTabWidget()
+        pane.setTabsClosable(True)
+        pane.tabCloseRequested.connect(lambda index: self.close_tab(index, pane))
+        pane.currentChanged.connect(lambda index: self.tab_activated(index, pane))
+        pane.tabBarClicked.connect(lambda index: self.set_active_pane(pane))
+        self.editor_splitter.addWidget(pane)
+        self.panes.append(pane)
+        return pane
+
+    def pane_of(self, widget):
+        return next((pane for pane in self.panes if pane.indexOf(widget) != -1), None)
+
+    def set_active_pane(self, pane):
+        """Makes pane the one tab_widget refers to, where files open and actions apply."""
+        self.tab_widget = pane
+        self.update_outline()
+
+    def focus_changed(self, old, new):
+        # The pane holding the focused editor becomes the active one
+        if isinstance(new, CodeEditor):
+            pane = self.pane_of(new)
+            if pane:
+                self.set_active_pane(pane)
+
+    def show_view(self, widget):
+        """Makes a tab current and its pane the active one."""
+        pane = self.pane_of(widget)
+        self.set_active_pane(pane)
+        pane.setCurrentWidget(widget)
+
+    def editors(self):
+        """Yields every CodeEditor, in every pane."""
+        for pane in self.panes:
+            for i in range(pane.count()):
+                widget = pane.widget(i)
+                if isinstance(widget, CodeEditor):
+                    yield widget
+
+    def create_view(self, document):
+        editor = CodeEditor(document)
+        editor.project_index = self.project_index
+        # Apply the current theme to the new editor instance
+        editor.set_theme(THEMES[self.settings.value("theme", DEFAULT_THEME)])
+        editor.set_diagnostics(document.diagnostics)
+        return editor
+
+    def split_editor(self):
+        """Shows the current document in the pane to the right, adding a pane if needed."""
+        editor = self.tab_widget.currentWidget()
+        if not isinstance(editor, CodeEditor):
+            return
+        position = self.panes.index(self.tab_widget) + 1
+        pane = self.panes[position] if position < len(self.panes) else self.create_pane()
+        view = next((v for v in editor.doc.views if pane.indexOf(v) != -1), None)
+        if view is None:
+            view = self.create_view(editor.doc)
+            view.setReadOnly(editor.isReadOnly())
+            view.restore_view_state(*editor.view_state())
+            index = pane.addTab(view, self.tab_widget.tabText(self.tab_widget.currentIndex()))
+            pane.setTabToolTip(index, editor.doc.path or "Unsaved")
+        self.show_view(view)
+        view.setFocus()
+
+    def update_view_tabs(self, document):
+        """Retitles every tab showing document, e.g. after Save As."""
+        for view in document.views:
+            pane = self.pane_of(view)
+            index = pane.indexOf(view)
+            pane.setTabText(index, document.name)
+            pane.setTabToolTip(index, document.path)
+
+    @timed("apply_theme")
     def apply_theme(self, name):
         if name not in THEMES:
             name = DEFAULT_THEME
@@ -212,31 +541,17 @@ class MainWindow(QMainWindow):
         app = QApplication.instance()
 
         # Set application-wide palette
-        palette = QPalette()
-        text_color = theme.get("app_text", theme["text"])
-        palette.setColor(QPalette.ColorRole.Window, theme["app_window"])
-        palette.setColor(QPalette.ColorRole.WindowText, text_color)
-        palette.setColor(QPalette.ColorRole.Base, theme["app_base"])
-        palette.setColor(QPalette.ColorRole.AlternateBase, theme["app_window"])
-        palette.setColor(QPalette.ColorRole.ToolTipBase, text_color)
-        palette.setColor(QPalette.ColorRole.ToolTipText, theme["app_window"])
-        palette.setColor(QPalette.ColorRole.Text, text_color)
-        palette.setColor(QPalette.ColorRole.Button, theme["app_window"])
-        palette.setColor(QPalette.ColorRole.ButtonText, text_color)
-        palette.setColor(QPalette.ColorRole.BrightText, Qt.GlobalColor.red)
-        palette.setColor(QPalette.ColorRole.Link, theme["app_highlight"])
-        palette.setColor(QPalette.ColorRole.Highlight, theme["app_highlight"])
-        palette.setColor(QPalette.ColorRole.HighlightedText, theme.get("app_highlighted_text", Qt.GlobalColor.white))
-        app.setPalette(palette) # type: ignore
-
-        # Update editor widgets
-        for i in range(self.tab_widget.count()):
-            widget = self.tab_widget.widget(i)
-            if isinstance(widget, CodeEditor):
-                widget.set_theme(theme)
+        app.setPalette(app_palette(name)) # type: ignore
+
+        # Update editor widgets; documents not on screen re-highlight when next shown
+        for editor in self.editors():
+            editor.set_theme(theme)
 
         # Update terminal theme
-        self.terminal.set_theme(theme)
+        if self.terminal:
+            self.terminal.set_theme(theme)
+            for i in range(1, self.run_tabs.count()):
+                self.run_tabs.widget(i).terminal.set_theme(theme)
 
         self.settings.setValue("theme", name)
         self.update_theme_menu_selection(name)
@@ -244,9 +559,211 @@ class MainWindow(QMainWindow):
     def set_folder_view(self, path):
         if os.path.isdir(path):
             self.current_folder_path = path
+            if self.file_system_model is None:
+                self.create_file_system_model()
             self.file_system_model.setRootPath(path)
             self.tree_view.setRootIndex(self.file_system_model.index(path))
             self.settings.setValue("last_folder", path)
+            self.start_project_indexer(path)
+            self.start_path_indexer(path)
+
+    def start_project_indexer(self, path):
+        """Indexes the declarations of every .sn2 file under path in the background."""
+        self.stop_project_indexer()
+        self.project_index.clear()
+
+        thread = QThread(self)
+        worker = ProjectIndexWorker(path, self.storage_path("project_index.sqlite"))
+        worker.moveToThread(thread)
+        self.project_indexer = (thread, worker)
+
+        def files_indexed(results):
+            if self.project_indexer and self.project_indexer[1] is worker:
+                for file_path, symbols in results:
+                    self.project_index.set_file(file_path, symbols)
+
+        def indexing_finished():
+            if self.project_indexer and self.project_indexer[1] is worker:
+                self.project_indexer = None
+                self.statusBar().showMessage(f"Indexed {len(self.project_index.files)} Sn2 files", 2000)
+                self.diagnostics.refresh() # Calls to the project's names are known now
+
+        thread.started.connect(worker.run)
+        worker.files_indexed.connect(files_indexed)
+        worker.files_removed.connect(lambda paths: [self.project_index.remove_file(p) for p in paths])
+        worker.progress.connect(
+            lambda done, total: self.statusBar().showMessage(f"Indexing Sn2 files... {done}/{total}")
+        )
+        worker.finished.connect(indexing_finished)
+
+        # Clean up the thread when it's finished
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(thread.deleteLater)
+        worker.finished.connect(worker.deleteLater)
+
+        thread.start()
+
+    def stop_project_indexer(self):
+        if self.project_indexer:
+            thread, worker = self.project_indexer
+            self.project_indexer = None
+            worker.cancel()
+            thread.quit()
+            thread.wait()
+
+    def start_path_indexer(self, path):
+        """Lists every file under path in the background, for quick open."""
+        self.stop_path_indexer()
+        self.path_index = None
+        if self.path_watcher is None:
+            self.path_watcher = QFileSystemWatcher(self)
+            self.path_watcher.directoryChanged.connect(self.folder_contents_changed)
+        elif self.path_watcher.directories():
+            self.path_watcher.removePaths(self.path_watcher.directories())
+        if self.quick_open_dialog:
+            self.quick_open_dialog.set_index(None)
+
+        thread = QThread(self)
+        worker = PathIndexWorker(path)
+        worker.moveToThread(thread)
+        self.path_indexer = (thread, worker)
+
+        def indexed(index):
+            if self.path_indexer and self.path_indexer[1] is worker:
+                self.path_index = index
+                self.watch_directories(list(index.directories))
+                if self.quick_open_dialog:
+                    self.quick_open_dialog.set_index(index)
+
+        def indexing_finished():
+            if self.path_indexer and self.path_indexer[1] is worker:
+                self.path_indexer = None
+
+        thread.started.connect(worker.run)
+        worker.indexed.connect(indexed)
+        worker.finished.connect(indexing_finished)
+
+        # Clean up the thread when it's finished
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(thread.deleteLater)
+        worker.finished.connect(worker.deleteLater)
+
+        thread.start()
+
+    def stop_path_indexer(self):
+        if self.path_indexer:
+            thread, worker = self.path_indexer
+            self.path_indexer = None
+            worker.cancel()
+            thread.quit()
+            thread.wait()
+
+    def watch_directories(self, directories):
+        # Past the limit, changes in further directories show up on the next Open Folder
+        room = WATCHED_DIRECTORIES_LIMIT - len(self.path_watcher.directories())
+        if directories and room > 0:
+            self.path_watcher.addPaths(directories[:room])
+
+    def folder_contents_changed(self, directory):
+        if self.path_index is None:
+            return
+        self.watch_directories(self.path_index.refresh_directory(directory))
+        if self.quick_open_dialog and self.quick_open_dialog.isVisible():
+            self.quick_open_dialog.update_results()
+
+    def quick_open(self):
+        if not self.current_folder_path:
+            self.statusBar().showMessage("Open a folder to use Quick Open", 2000)
+            return
+        if self.quick_open_dialog is None:
+            self.quick_open_dialog = QuickOpenDialog(self)
+            self.quick_open_dialog.file_chosen.connect(
+                lambda relative: self.open_file(os.path.join(self.path_index.root, relative))
+            )
+            self.quick_open_dialog.index = self.path_index
+        self.quick_open_dialog.popup()
+
+    def go_to_definition(self):
+        editor = self.tab_widget.currentWidget()
+        if not isinstance(editor, CodeEditor):
+            return
+        name = editor.text_under_cursor()
+        definitions = self.project_index.find_definitions(name)
+        if not definitions:
+            self.statusBar().showMessage(f"No definition found for '{name}'", 2000)
+            return
+        # Prefer a definition in the current file
+        path, line, kind = next((d for d in definitions if d[0] == editor.doc.path), definitions[0])
+        self.open_file(path)
+        target = self.tab_widget.currentWidget()
+        if isinstance(target, CodeEditor):
+            target.go_to_line(line)
+
+    def populate_theme_menu(self):
+        if self.theme_group.actions():
+            return
+        for theme_name in THEMES:
+            action = QAction(theme_name, self, checkable=True)
+            action.triggered.connect(lambda checked, name=theme_name: self.apply_theme(name))
+            self.theme_menu.addAction(action)
+            self.theme_group.addAction(action)
+        self.update_theme_menu_selection(self.settings.value("theme", DEFAULT_THEME))
+
+    def toggle_perf_overlay(self, enabled):
+        """Turns the hot-path timers and their status-bar readout on or off."""
+        instrumentation.enabled = enabled
+        self.perf_label.setVisible(enabled)
+        if enabled:
+            instrumentation.reset()
+            self.update_perf_overlay()
+            self.perf_timer.start()
+        else:
+            self.perf_timer.stop()
+
+    def update_perf_overlay(self):
+        summary = instrumentation.summary()
+        if not summary:
+            self.perf_label.setText("p50/p95/p99: no samples yet")
+            return
+        self.perf_label.setText("  ".join(
+            f"{name} {s['p50_ms']:.1f}/{s['p95_ms']:.1f}/{s['p99_ms']:.1f}" for name, s in summary.items()
+        ) + " ms")
+        self.perf_label.setToolTip("\n".join(
+            f"{name}: {s['count']} calls, p50 {s['p50_ms']:.2f} ms, p95 {s['p95_ms']:.2f} ms, "
+            f"p99 {s['p99_ms']:.2f} ms, max {s['max_ms']:.2f} ms" for name, s in summary.items()
+        ))
+
+    def save_perf_stats(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save Performance Stats", self.current_folder_path or QDir.homePath(), "JSON Files (*.json)"
+        )
+        if path:
+            try:
+                instrumentation.dump_json(path)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Could not save performance stats:\n{e}")
+
+    def capture_profile(self):
+        """Profiles the UI thread for the next few seconds, with cProfile or by sampling."""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Capture Profile", self.current_folder_path or QDir.homePath(),
+            "cProfile Stats (*.prof);;Folded Stacks (*.folded)"
+        )
+        if not path:
+            return
+        seconds = self.settings.value("profile_capture_seconds", 10, type=int)
+        self.capture_profile_action.setEnabled(False)
+        self.statusBar().showMessage(f"Profiling for {seconds} s...")
+
+        def captured(path, error):
+            self.capture_profile_action.setEnabled(True)
+            self.statusBar().clearMessage()
+            if error:
+                QMessageBox.critical(self, "Error", f"Could not save profile:\n{error}")
+            else:
+                self.statusBar().showMessage(f"Profile saved to {path}", 5000)
+
+        capture_trace(path, seconds, captured)
 
     def update_theme_menu_selection(self, theme_name):
         for action in self.theme_group.actions():
@@ -259,13 +776,23 @@ class MainWindow(QMainWindow):
             self.open_file(path)
 
     def check_for_updates(self):
-        """Starts the update check in a background thread."""
+        """
+        Starts the update check in a background thread, if one is due. Within
+        the check interval the result of the last check is used instead.
+        """
+        cache = self.update_check_cache()
+        if not update_check_due(cache):
+            if is_newer(cache.get("latest_version", "")):
+                self.show_update_dialog(cache["latest_version"], cache.get("download_url") or DEFAULT_DOWNLOAD_URL)
+            return
+
         self.update_thread = QThread()
-        self.update_worker = UpdateWorker()
+        self.update_worker = UpdateWorker(cache)
         self.update_worker.moveToThread(self.update_thread)
 
         self.update_thread.started.connect(self.update_worker.run)
         self.update_worker.update_found.connect(self.show_update_dialog)
+        self.update_worker.checked.connect(self.save_update_check_cache)
 
         # Clean up the thread when it's finished
         self.update_worker.finished.connect(self.update_thread.quit)
@@ -274,6 +801,149 @@ class MainWindow(QMainWindow):
 
         self.update_thread.start()
 
+    def update_check_cache(self):
+        """The last update check's result and validators, from the settings."""
+        self.settings.beginGroup("update_check")
+        cache = {
+            "last_checked": self.settings.value("last_checked", 0, type=float),
+            "last_attempt": self.settings.value("last_attempt", 0, type=float),
+            "latest_version": self.settings.value("latest_version", "", type=str),
+            "download_url": self.settings.value("download_url", "", type=str),
+            "etag": self.settings.value("etag", "", type=str),
+            "last_modified": self.settings.value("last_modified", "", type=str),
+        }
+        self.settings.endGroup()
+        return cache
+
+    def save_update_check_cache(self, cache):
+        self.settings.beginGroup("update_check")
+        for key, value in cache.items():
+            self.settings.setValue(key, value)
+        self.settings.endGroup()
+
+    def start_save_worker(self):
+        """Starts the thread that writes files to disk off the UI thread."""
+        self.save_thread = QThread(self)
+        self.save_worker = SaveWorker()
+        self.save_worker.moveToThread(self.save_thread)
+
+        self.save_thread.started.connect(self.save_worker.run)
+        self.save_worker.saved.connect(self.handle_file_saved)
+        self.save_worker.failed.connect(self.handle_save_failed)
+        self.save_worker.finished.connect(self.save_thread.quit)
+
+        self.save_thread.start()
+
+    def storage_path(self, name):
+        """The path of name in storage_dir, or None (the default location) if there is none."""
+        return os.path.join(self.storage_dir, name) if self.storage_dir else None
+
+    def start_journal_writer(self):
+        """Starts the thread that writes the crash-recovery journals of edited documents."""
+        self.journal_thread = QThread(self)
+        self.journal_writer = JournalWriter()
+        self.journal_writer.moveToThread(self.journal_thread)
+        self.journal = RecoveryJournal(self.journal_writer, self.storage_path("recovery"), self)
+
+        self.journal_thread.started.connect(self.journal_writer.run)
+        self.journal_writer.failed.connect(lambda error: print(f"Writing the recovery journal failed: {error}"))
+        self.journal_writer.finished.connect(self.journal_thread.quit)
+
+        self.journal_thread.start()
+
+    def start_file_parser(self):
+        """Starts the thread that parses saved files again for the project index."""
+        self.file_parser_thread = QThread(self)
+        self.file_parser = FileParseWorker()
+        self.file_parser.moveToThread(self.file_parser_thread)
+
+        self.file_parser_thread.started.connect(self.file_parser.run)
+        self.file_parser.files_indexed.connect(self.update_parsed_files)
+        self.file_parser.finished.connect(self.file_parser_thread.quit)
+
+        self.file_parser_thread.start()
+
+    def start_diagnostics_worker(self):
+        """Starts the thread that diagnoses open documents as they are edited."""
+        self.diagnostics_thread = QThread(self)
+        # Calls to names defined elsewhere in the project aren't unknown
+        self.diagnostics_worker = DiagnosticsWorker(known_name=lambda name: name in self.project_index.definitions)
+        self.diagnostics_worker.moveToThread(self.diagnostics_thread)
+        self.diagnostics = Diagnostics(
+            self.diagnostics_worker,
+            self.settings.value("diagnostics_delay_ms", DIAGNOSTICS_DELAY_MS, type=int),
+            parent=self
+        )
+        self.diagnostics.changed.connect(self.show_diagnostics)
+
+        self.diagnostics_thread.started.connect(self.diagnostics_worker.run)
+        self.diagnostics_worker.finished.connect(self.diagnostics_thread.quit)
+
+        self.diagnostics_thread.start()
+
+    def track_document(self, document):
+        """Starts journaling and diagnosing a document whose text is as loaded."""
+        self.journal.track(document)
+        self.diagnostics.track(document)
+
+    def show_diagnostics(self, document):
+        for view in document.views:
+            view.set_diagnostics(document.diagnostics)
+        if self.problems_dock:
+            self.problems_panel.set_problems(document, document.diagnostics)
+
+    def recover_unsaved_work(self):
+        """Offers to replay the journals left behind by an editor that didn't exit cleanly."""
+        sessions = self.journal.crashed_sessions()
+        journals = [journal_path for _, journal_paths in sessions for journal_path in journal_paths]
+        if journals:
+            reply = QMessageBox.question(
+                self, 'Recover Unsaved Changes?',
+                f"The editor did not shut down cleanly. Recover unsaved changes to {len(journals)} document(s)?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                errors = []
+                for journal_path in journals:
+                    try:
+                        path, text, base = replay(journal_path)
+                    except (OSError, ValueError, KeyError) as e:
+                        errors.append(str(e))
+                        continue
+                    if text != base:
+                        self.open_recovered(path, text)
+                if errors:
+                    QMessageBox.critical(self, "Error", "Could not recover:\n" + "\n".join(errors))
+        for session_dir, _ in sessions:
+            self.journal.remove_session(session_dir)
+
+    def open_recovered(self, path, text):
+        """Opens path (None if it was untitled) with its recovered text, as an unsaved change."""
+        if path and os.path.exists(path):
+            self.open_file(path)
+        document = self.documents.get(path) if path else None
+        if document is None:
+            editor = self.create_view(Document(path))
+            self.tab_widget.setCurrentIndex(self.add_tab(editor, path, editor.doc.name))
+            if path:
+                self.documents.add(editor.doc)
+            editor.setPlainText(text)
+            editor.document().setModified(True)
+            self.track_document(editor.doc)
+            self.journal.snapshot(editor.doc, text)
+            return
+
+        # Already open: replace its text in one undoable edit
+        loader = self.file_loaders.pop(document, None)
+        if loader:
+            loader[1].cancel()
+            for view in document.views:
+                view.setReadOnly(False)
+        cursor = QTextCursor(document.text)
+        cursor.select(QTextCursor.SelectionType.Document)
+        cursor.insertText(text)
+        self.diagnostics.track(document)
+
     def show_update_dialog(self, new_version, download_url):
         """Shows a dialog notifying the user about a new version."""
         msg_box = QMessageBox(self)
@@ -308,11 +978,15 @@ class MainWindow(QMainWindow):
                 self, "Open File", self.current_folder_path or QDir.homePath(), "Sn2 Files (*.sn2);;Text Files (*.txt);;All Files (*)"
             )
         if path:
-            # Check if file is already open
-            for i in range(self.tab_widget.count()):
-                if self.tab_widget.tabToolTip(i) == path:
-                    self.tab_widget.setCurrentIndex(i)
-                    return
+            # Already open? Show it, in the active pane if it has a view there
+            document = self.documents.get(path)
+            if document:
+                self.show_view(next((v for v in document.views if self.tab_widget.indexOf(v) != -1), document.views[0]))
+                return
+            placeholder = self.placeholders.get(normalize_path(path))
+            if placeholder:
+                self.show_view(placeholder)
+                return
             self.add_editor_tab(path, os.path.basename(path))
 
     def open_folder(self):
@@ -320,123 +994,517 @@ class MainWindow(QMainWindow):
         if path:
             self.set_folder_view(path)
 
-    def save_file(self):
-        current_widget = self.tab_widget.currentWidget()
-        if not isinstance(current_widget, CodeEditor):
+    def save_file(self, editor=None):
+        """Saves the document of editor, or of the current tab."""
+        editor = editor or self.tab_widget.currentWidget()
+        if not isinstance(editor, CodeEditor):
             return
 
-        path = self.tab_widget.tabToolTip(self.tab_widget.currentIndex())
-        if path and path != "Unsaved":
-            self._write_to_file(path, current_widget.toPlainText())
+        if editor.doc in self.file_loaders:
+            self.statusBar().showMessage("The file is still loading.", 2000)
+            return
+
+        if editor.doc.path:
+            content = editor.toPlainText()
+            self._write_to_file(editor.doc.path, content)
+            editor.highlighter.store_tokens(content)
+            self.journal.snapshot(editor.doc, content)
         else:
-            self.save_file_as()
+            self.save_file_as(editor)
 
-    def save_file_as(self):
-        current_widget = self.tab_widget.currentWidget()
-        if not isinstance(current_widget, CodeEditor):
+    def save_file_as(self, editor=None):
+        editor = editor or self.tab_widget.currentWidget()
+        if not isinstance(editor, CodeEditor):
             return
 
         path, _ = QFileDialog.getSaveFileName(
             self, "Save File As", self.current_folder_path or QDir.homePath(), "Sn2 Files (*.sn2);;Text Files (*.txt)"
         )
         if path:
-            self._write_to_file(path, current_widget.toPlainText())
-            self.tab_widget.setTabText(self.tab_widget.currentIndex(), os.path.basename(path))
-            self.tab_widget.setTabToolTip(self.tab_widget.currentIndex(), path)
-
+            content = editor.toPlainText()
+            self._write_to_file(path, content)
+            editor.highlighter.store_tokens(content)
+            self.documents.rename(editor.doc, path)
+            self.journal.snapshot(editor.doc, content)
+            self.update_view_tabs(editor.doc)
+            # The new name decides whether it is diagnosed as Sn2
+            self.diagnostics.untrack(editor.doc)
+            self.show_diagnostics(editor.doc)
+            self.diagnostics.track(editor.doc)
+
+    @timed("_write_to_file")
     def _write_to_file(self, path, content):
-        try:
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            self.statusBar().showMessage(f"Saved to {path}", 2000)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Could not save file:\n{e}")
-
-    def add_editor_tab(self, path, name):
+        # The save thread writes atomically and coalesces repeated saves of a path.
+        self.save_worker.save(path, content)
+        self.statusBar().showMessage(f"Saving {path}...")
+
+    def handle_file_saved(self, path):
+        self.statusBar().showMessage(f"Saved to {path}", 2000)
+        if path.endswith(".sn2") and path in self.project_index.files:
+            self.file_parser.request(path)
+
+    def update_parsed_files(self, results):
+        for path, symbols in results:
+            # Unless the folder has been closed or changed since
+            if path in self.project_index.files:
+                self.project_index.set_file(path, symbols)
+
+    def handle_save_failed(self, path, error):
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Error", f"Could not save file:\n{error}")
+
+    def add_tab(self, widget, path, name):
+        """Adds a tab for path (None if unsaved), replacing the welcome page if it's showing."""
         # If this is the first file opened, remove the welcome tab
         if self.tab_widget.count() == 1 and self.tab_widget.widget(0) == self.welcome_widget:
             self.tab_widget.removeTab(0)
             self.tab_widget.setTabsClosable(True)
+        index = self.tab_widget.addTab(widget, name)
+        self.tab_widget.setTabToolTip(index, path if path else "Unsaved")
+        return index
 
-        editor = CodeEditor()
-        # Apply the current theme to the new editor instance
-        current_theme_name = self.settings.value("theme", DEFAULT_THEME)
-        self.terminal.set_theme(THEMES[current_theme_name])
-        editor.set_theme(THEMES[current_theme_name])
+    @timed("add_editor_tab")
+    def add_editor_tab(self, path, name, placeholder=None):
+        """
+        Opens path (None for a new file) in a new editor tab, or, given the
+        TabPlaceholder of a restored tab, in place of it.
+        """
+        editor = self.create_view(Document(path))
 
         if path:
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    editor.setPlainText(f.read())
+                size = os.path.getsize(path)
+                if size >= self.settings.value("large_file_threshold", LARGE_FILE_BYTES, type=int):
+                    self.load_large_file(editor, path, size, name)
+                else:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        text = f.read()
+                    editor.setPlainText(text)
+                    editor.highlighter.use_token_cache(self.token_cache, text)
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Could not open file:\n{e}")
+                if placeholder:
+                    pane = self.pane_of(placeholder)
+                    self.close_tab(pane.indexOf(placeholder), pane)
                 return
+            self.documents.add(editor.doc)
+        # Large files are journaled and diagnosed once they have finished loading
+        if editor.doc not in self.file_loaders:
+            self.track_document(editor.doc)
+
+        if placeholder:
+            del self.placeholders[normalize_path(placeholder.path)]
+            pane = self.pane_of(placeholder)
+            index = pane.indexOf(placeholder)
+            # Swap the editor in without another tab_activated
+            pane.blockSignals(True)
+            pane.removeTab(index)
+            pane.insertTab(index, editor, name)
+            pane.setTabToolTip(index, path)
+            pane.setCurrentIndex(index)
+            pane.blockSignals(False)
+            editor.restore_view_state(placeholder.cursor_position, placeholder.scroll_position)
+            placeholder.deleteLater()
+        else:
+            index = self.add_tab(editor, path, name)
+            self.tab_widget.setCurrentIndex(index)
+
+    def load_large_file(self, editor, path, size, name):
+        """
+        Shows the first screen of a large file at once and streams the rest in
+        from a background thread. The editor stays read-only until loading is
+        done, and for huge files it stays read-only without highlighting.
+        """
+        huge = size >= self.settings.value("huge_file_threshold", HUGE_FILE_BYTES, type=int)
+        if huge:
+            editor.highlighter.setDocument(None)
+        text, offset = read_first_screen(path)
+        editor.setPlainText(text)
+        editor.setReadOnly(True)
+        editor.document().setUndoRedoEnabled(False)
+
+        thread = QThread(self) # Parented so it outlives its entry in file_loaders
+        worker = FileLoadWorker(path, offset)
+        worker.moveToThread(thread)
+        document = editor.doc
+        self.file_loaders[document] = (thread, worker)
+
+        def insert_chunk(chunk):
+            if self.file_loaders.get(document) is None or not document.views:
+                return # The tab was closed while loading; chunks already queued are dropped
+            # Any view will do; the one that opened the file may have been closed since
+            document.views[0].append_text(chunk)
+            # The views are read-only while loading, so this is still the text on disk
+            document.text.setModified(False)
+            worker.chunk_consumed()
+
+        def finish_loading():
+            if self.file_loaders.pop(document, None) is None:
+                return # The tab was closed while loading
+            document.text.setUndoRedoEnabled(not huge)
+            document.text.setModified(False)
+            for view in document.views:
+                view.setReadOnly(huge)
+            if not huge:
+                self.track_document(document)
+            note = " (read-only, highlighting off)" if huge else ""
+            self.statusBar().showMessage(f"Loaded {name}{note}", 3000)
+
+        thread.started.connect(worker.run)
+        worker.chunk_loaded.connect(insert_chunk)
+        worker.progress.connect(
+            lambda loaded, total: self.statusBar().showMessage(f"Loading {name}... {loaded * 100 // total}%")
+        )
+        worker.failed.connect(lambda error: QMessageBox.critical(self, "Error", f"Could not finish loading file:\n{error}"))
+        worker.finished.connect(finish_loading)
 
-        index = self.tab_widget.addTab(editor, name)
-        self.tab_widget.setTabToolTip(index, path if path else "Unsaved")
-        self.tab_widget.setCurrentIndex(index)
-
-    def close_tab(self, index):
-        editor = self.tab_widget.widget(index)
-        if editor.document().isModified():
-            reply = QMessageBox.question(
-                self, 'Save Changes?',
-                f"'{self.tab_widget.tabText(index)}' has been modified. Save changes?",
-                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel
-            )
-            if reply == QMessageBox.StandardButton.Yes:
-                self.save_file()
-            elif reply == QMessageBox.StandardButton.Cancel:
-                return
-
-        self.tab_widget.removeTab(index)
+        # Clean up the thread when it's finished
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(thread.deleteLater)
+        worker.finished.connect(worker.deleteLater)
+
+        thread.start()
+
+    def has_unsaved_changes(self, document):
+        """
+        Whether closing document would lose edits. A file still loading is
+        read-only, though highlighting it without undo can set its modified flag.
+        """
+        return document.text.isModified() and document not in self.file_loaders
+
+    def close_tab(self, index, pane=None):
+        pane = pane or self.tab_widget
+        widget = pane.widget(index)
+        if isinstance(widget, CodeEditor):
+            document = widget.doc
+            # Only closing the last view closes the document
+            last_view = len(document.views) == 1
+            if last_view and self.has_unsaved_changes(document):
+                reply = QMessageBox.question(
+                    self, 'Save Changes?',
+                    f"'{pane.tabText(index)}' has been modified. Save changes?",
+                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel
+                )
+                if reply == QMessageBox.StandardButton.Yes:
+                    self.save_file(widget)
+                elif reply == QMessageBox.StandardButton.Cancel:
+                    return
 
-        # If no tabs are left, show the welcome page
-        if self.tab_widget.count() == 0:
-            self.show_welcome_page()
+            if last_view:
+                loader = self.file_loaders.pop(document, None)
+                if loader:
+                    loader[1].cancel()
+                self.documents.remove(document)
+                self.journal.discard(document)
+                self.diagnostics.untrack(document)
+                if self.problems_dock:
+                    self.problems_panel.remove_document(document)
+            document.views.remove(widget)
+        elif isinstance(widget, TabPlaceholder):
+            del self.placeholders[normalize_path(widget.path)]
+
+        pane.removeTab(index)
+        # Leave the widget tree now, so focus can't land on it before it's deleted
+        widget.setParent(None)
+        widget.deleteLater()
+
+        # An emptied pane goes away; if it was the only one, show the welcome page
+        if pane.count() == 0:
+            if len(self.panes) > 1:
+                self.panes.remove(pane)
+                pane.setParent(None)
+                pane.deleteLater()
+                if self.tab_widget is pane:
+                    self.set_active_pane(self.panes[0])
+            else:
+                self.show_welcome_page()
 
     def run_code(self):
+        self.create_terminal_dock()
         # If the terminal is hidden, show it before running code.
         if not self.terminal_dock.isVisible():
             self.terminal_dock.show()
 
         current_widget = self.tab_widget.currentWidget()
         if not isinstance(current_widget, CodeEditor):
-            self.terminal.append(">>> No Sn2 file is active to run.")
+            self.show_terminal_message(">>> No Sn2 file is active to run.")
             return
 
-        path = self.tab_widget.tabToolTip(self.tab_widget.currentIndex())
-        if not path or path == "Unsaved":
-            self.terminal.append(">>> Please save the file before running.")
+        path = current_widget.doc.path
+        if not path:
+            self.show_terminal_message(">>> Please save the file before running.")
             return
 
         if not path.endswith(".sn2"):
-            self.terminal.append(f">>> Cannot run '{os.path.basename(path)}'. Only .sn2 files are executable.")
+            self.show_terminal_message(f">>> Cannot run '{os.path.basename(path)}'. Only .sn2 files are executable.")
+            return
+
+        # Each run gets its own pane; the run manager starts it when a slot is free
+        pane = RunPane()
+        pane.terminal.set_theme(THEMES[self.settings.value("theme", DEFAULT_THEME)])
+        index = self.run_tabs.addTab(pane, os.path.basename(path))
+        self.run_tabs.setTabToolTip(index, path)
+        self.run_tabs.setCurrentIndex(index)
+        pane.run = self.run_manager.submit(path, pane.terminal)
+        pane.kill_requested.connect(lambda: self.run_manager.kill(pane.run))
+        self.update_run_pane(pane.run)
+
+    def create_run_all_dock(self):
+        if self.run_all_dock:
+            return
+        self.run_all_dock = QDockWidget("Run All", self)
+        self.run_all_panel = RunAllPanel()
+        self.run_all_panel.fail_fast_box.setChecked(self.settings.value("run_all_fail_fast", False, type=bool))
+        self.run_all_panel.timeout_box.setValue(self.settings.value("run_all_timeout", 60, type=int))
+        self.run_all_panel.run_requested.connect(self.start_run_all)
+        self.run_all_panel.stop_requested.connect(self.stop_run_all)
+        self.run_all_panel.output_requested.connect(self.open_file)
+        self.run_all_dock.setWidget(self.run_all_panel)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.run_all_dock)
+        self.tabifyDockWidget(self.terminal_dock, self.run_all_dock)
+        self.view_menu.insertAction(self.view_menu_docks_end, self.run_all_dock.toggleViewAction())
+
+    def run_all(self):
+        self.create_terminal_dock()
+        self.create_run_all_dock()
+        self.run_all_dock.show()
+        self.run_all_dock.raise_()
+        self.start_run_all()
+
+    def start_run_all(self):
+        """Runs every .sn2 file under the open folder on a pool of interpreter processes."""
+        if self.batch_run:
+            return
+        if not self.current_folder_path:
+            self.run_all_panel.summary_label.setText("Open a folder to run its scripts.")
             return
 
-        self.terminal.clear()
-        self.terminal.append(f">>> Running {path}...\n")
+        panel = self.run_all_panel
+        timeout = panel.timeout_box.value()
+        fail_fast = panel.fail_fast_box.isChecked()
+        self.settings.setValue("run_all_timeout", timeout)
+        self.settings.setValue("run_all_fail_fast", fail_fast)
+        self.remove_run_all_output()
+        self.run_all_output_dir = tempfile.mkdtemp(prefix="sn2-run-all-")
+        runner = BatchRunner(
+            self.interpreter_path, self.current_folder_path, self.run_all_output_dir,
+            jobs=self.run_manager.max_parallel, timeout=timeout or None, fail_fast=fail_fast
+        )
+
+        thread = QThread(self)
+        worker = BatchRunWorker(runner)
+        worker.moveToThread(thread)
+        self.batch_run = (thread, worker)
+        panel.start(self.current_folder_path)
+
+        def batch_finished():
+            self.batch_run = None
+            panel.finish()
+
+        thread.started.connect(worker.run)
+        worker.file_started.connect(panel.file_started)
+        worker.file_finished.connect(panel.file_finished)
+        worker.finished.connect(batch_finished)
+
+        # Clean up the thread when it's finished
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(thread.deleteLater)
+        worker.finished.connect(worker.deleteLater)
+
+        thread.start()
+
+    def remove_run_all_output(self):
+        if self.run_all_output_dir:
+            shutil.rmtree(self.run_all_output_dir, ignore_errors=True)
+            self.run_all_output_dir = None
+
+    def stop_run_all(self, wait=False):
+        if self.batch_run:
+            thread, worker = self.batch_run
+            worker.cancel()
+            if wait:
+                thread.quit()
+                thread.wait()
+
+    def create_find_dock(self):
+        if self.find_dock:
+            return
+        self.find_dock = QDockWidget("Find in Files", self)
+        self.find_panel = FindInFilesPanel()
+        self.find_panel.search_requested.connect(self.start_find_in_files)
+        self.find_panel.stop_requested.connect(self.stop_find_in_files)
+        self.find_panel.match_activated.connect(self.open_match)
+        self.find_dock.setWidget(self.find_panel)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.find_dock)
+        self.tabifyDockWidget(self.terminal_dock, self.find_dock)
+        self.view_menu.insertAction(self.view_menu_docks_end, self.find_dock.toggleViewAction())
+
+    def show_find_in_files(self):
+        self.create_terminal_dock()
+        self.create_find_dock()
+        self.find_dock.show()
+        self.find_dock.raise_()
+        # Start from the editor's selection, if any
+        editor = self.tab_widget.currentWidget()
+        if isinstance(editor, CodeEditor):
+            selected = editor.textCursor().selectedText()
+            if selected and "\u2029" not in selected:
+                self.find_panel.query_edit.setText(selected)
+        self.find_panel.query_edit.selectAll()
+        self.find_panel.query_edit.setFocus()
+
+    def start_find_in_files(self):
+        """Searches the open folder for the panel's query, replacing any search still running."""
+        self.stop_find_in_files()
+        panel = self.find_panel
+        query = panel.query_edit.text()
+        if not query:
+            panel.clear()
+            return
+        if not self.current_folder_path:
+            panel.clear("Open a folder to search in")
+            return
+        try:
+            pattern = compile_query(query, panel.regex_box.isChecked(), panel.case_box.isChecked())
+        except re.error as e:
+            panel.clear(f"Invalid regex: {e}")
+            return
 
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-        self.process.readyReadStandardOutput.connect(self.handle_process_output)
-        self.process.finished.connect(self.handle_process_finished)
+        panel.start(self.current_folder_path)
+        thread = QThread(self)
+        worker = FindInFilesWorker(self.current_folder_path, pattern)
+        worker.moveToThread(thread)
+        self.find_search = (thread, worker)
 
-        self.terminal.set_process(self.process) # Give the terminal a reference to the process
+        # Signals already queued by a cancelled search are dropped
+        def file_matched(path, matches):
+            if self.find_search and self.find_search[1] is worker:
+                panel.add_matches(path, matches)
 
-        # Call the python interpreter directly for more reliable output capturing
-        # by QProcess, bypassing the .bat script.
-        python_executable = sys.executable
-        self.process.start(python_executable, [self.interpreter_path, path])
+        def progress(searched):
+            if self.find_search and self.find_search[1] is worker:
+                panel.set_progress(searched)
 
-    def handle_process_output(self):
-        data = self.process.readAllStandardOutput().data().decode()
-        self.terminal.append_output(data)
+        def search_finished(truncated):
+            if self.find_search and self.find_search[1] is worker:
+                self.find_search = None
+                panel.finish(truncated)
 
-    def handle_process_finished(self):
-        self.terminal.append("\n>>> Process finished.")
-        self.terminal.set_process(None) # Clear the process reference
-        self.process = None
+        thread.started.connect(worker.run)
+        worker.file_matched.connect(file_matched)
+        worker.progress.connect(progress)
+        worker.finished.connect(search_finished)
+
+        # Clean up the thread when it's finished
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(thread.deleteLater)
+        worker.finished.connect(worker.deleteLater)
+
+        thread.start()
+
+    def stop_find_in_files(self):
+        if self.find_search:
+            thread, worker = self.find_search
+            self.find_search = None
+            # The search checks for a cancel between lines and files, so this is quick
+            worker.cancel()
+            thread.quit()
+            thread.wait()
+            self.find_panel.finish(cancelled=True)
+
+    def create_problems_dock(self):
+        if self.problems_dock:
+            return
+        self.problems_dock = QDockWidget("Problems", self)
+        self.problems_panel = ProblemsPanel()
+        self.problems_panel.problem_activated.connect(self.open_location)
+        for document in self.diagnostics.documents():
+            self.problems_panel.set_problems(document, document.diagnostics)
+        self.problems_dock.setWidget(self.problems_panel)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.problems_dock)
+        self.tabifyDockWidget(self.terminal_dock, self.problems_dock)
+        self.view_menu.insertAction(self.view_menu_docks_end, self.problems_dock.toggleViewAction())
+
+    def show_problems(self):
+        self.create_terminal_dock()
+        self.create_problems_dock()
+        self.problems_dock.show()
+        self.problems_dock.raise_()
+
+    def create_outline_dock(self):
+        if self.outline_dock:
+            return
+        self.outline_dock = QDockWidget("Outline", self)
+        self.outline_panel = OutlinePanel()
+        self.outline_panel.symbol_activated.connect(self.open_location)
+        self.outline_dock.setWidget(self.outline_panel)
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.outline_dock)
+        self.tabifyDockWidget(self.explorer_dock, self.outline_dock)
+        self.view_menu.insertAction(self.view_menu_docks_end, self.outline_dock.toggleViewAction())
+        self.update_outline()
+
+    def show_outline(self):
+        self.create_outline_dock()
+        self.outline_dock.show()
+        self.outline_dock.raise_()
+
+    def update_outline(self):
+        """Points the outline at the current document."""
+        if self.outline_dock:
+            editor = self.tab_widget.currentWidget()
+            self.outline_panel.set_document(editor.doc if isinstance(editor, CodeEditor) else None)
+
+    def with_current_editor(self, method):
+        editor = self.tab_widget.currentWidget()
+        if isinstance(editor, CodeEditor):
+            method(editor)
+
+    def open_location(self, document, line, column, length):
+        """Shows a place in an open document, in the current view of it if there is one."""
+        if not document.views:
+            return
+        current = self.tab_widget.currentWidget()
+        view = current if current in document.views else document.views[0]
+        self.show_view(view)
+        view.go_to_line(line, column, length)
+        view.setFocus()
+
+    def open_match(self, path, line, column, length):
+        self.open_file(path)
+        editor = self.tab_widget.currentWidget()
+        if isinstance(editor, CodeEditor) and editor.doc is self.documents.get(path):
+            editor.go_to_line(line, column, length)
+
+    def show_terminal_message(self, text):
+        self.run_tabs.setCurrentIndex(0)
+        self.terminal.appendPlainText(text)
+
+    def run_pane(self, run):
+        for i in range(1, self.run_tabs.count()):
+            if self.run_tabs.widget(i).run is run:
+                return self.run_tabs.widget(i)
+        return None
+
+    def update_run_pane(self, run):
+        pane = self.run_pane(run)
+        if pane:
+            pane.set_status(run.describe(), run.status in (QUEUED, RUNNING))
+        if self.run_manager.running:
+            self.run_status_timer.start()
+        else:
+            self.run_status_timer.stop()
+
+    def update_running_panes(self):
+        for run in self.run_manager.running:
+            self.update_run_pane(run)
+
+    def close_run_tab(self, index):
+        pane = self.run_tabs.widget(index)
+        if pane.run:
+            # Wait, so the run doesn't write to the pane after it is gone
+            self.run_manager.kill(pane.run, wait=True)
+        self.run_tabs.removeTab(index)
+        pane.deleteLater()
 
     def closeEvent(self, event):
         # Save settings on close
@@ -445,23 +1513,53 @@ class MainWindow(QMainWindow):
         self.settings.setValue("theme", self.settings.value("theme", DEFAULT_THEME))
         
         # Check for unsaved changes before closing all tabs
-        for i in range(self.tab_widget.count()):
-            if isinstance(self.tab_widget.widget(i), CodeEditor) and self.tab_widget.widget(i).document().isModified():
-                self.tab_widget.setCurrentIndex(i)
-                reply = QMessageBox.question(
-                    self, 'Save Changes?',
-                    f"You have unsaved changes. Save before exiting?",
-                    QMessageBox.StandardButton.SaveAll | QMessageBox.StandardButton.Discard | QMessageBox.StandardButton.Cancel
-                )
-                if reply == QMessageBox.StandardButton.SaveAll:
-                    for j in range(self.tab_widget.count()):
-                        self.tab_widget.setCurrentIndex(j)
-                        self.save_file()
-                    break
-                elif reply == QMessageBox.StandardButton.Cancel:
-                    event.ignore()
-                    return
-                elif reply == QMessageBox.StandardButton.Discard:
-                    break # Exit the loop and allow closing
+        modified = []
+        for editor in self.editors():
+            if self.has_unsaved_changes(editor.doc) and editor.doc not in modified:
+                modified.append(editor.doc)
+        if modified:
+            self.show_view(modified[0].views[0])
+            reply = QMessageBox.question(
+                self, 'Save Changes?',
+                f"You have unsaved changes. Save before exiting?",
+                QMessageBox.StandardButton.SaveAll | QMessageBox.StandardButton.Discard | QMessageBox.StandardButton.Cancel
+            )
+            if reply == QMessageBox.StandardButton.SaveAll:
+                for document in modified:
+                    self.save_file(document.views[0])
+            elif reply == QMessageBox.StandardButton.Cancel:
+                event.ignore()
+                return
+        self.save_session()
+
+        # Let queued saves reach the disk before the save thread goes away
+        self.save_worker.stop()
+        self.save_thread.quit()
+        self.save_thread.wait()
+        # Everything is saved or discarded, so the recovery journals can go
+        self.journal_writer.stop()
+        self.journal_thread.quit()
+        self.journal_thread.wait()
+        self.journal.close()
+        self.diagnostics_worker.stop()
+        self.diagnostics_thread.quit()
+        self.diagnostics_thread.wait()
+        self.file_parser.stop()
+        self.file_parser_thread.quit()
+        self.file_parser_thread.wait()
+
+        self.stop_project_indexer()
+        self.stop_path_indexer()
+        self.run_manager.stop_all()
+        self.stop_run_all(wait=True)
+        self.remove_run_all_output()
+        self.stop_find_in_files()
+        self.interpreter_pool.shutdown()
+
+        # Stop any files still streaming in before their threads are destroyed
+        for thread, worker in self.file_loaders.values():
+            worker.cancel()
+            thread.quit()
+            thread.wait()
 
         super().closeEvent(event)
\ No newline at end of file
@@ -0,0 +1,274 @@
+import collections
+import heapq
+import itertools
+import os
+import re
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+# Matches checked per query before scoring, per pass (file names, full paths).
+# Paths are numbered shortest first, so these are the shortest matches.
+CANDIDATE_LIMIT = 300
+# Masks also record a character appearing twice and three times ("zz", "zzz"),
+# which rules out most paths for queries that repeat it.
+MAX_REPEAT = 3
+# Candidates are regex-checked in chunks of this many ids (a multiple of 8).
+CHUNK_SIZE = 2048
+
+_BYTE_BITS = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
+_NONZERO_BYTE = re.compile(b"[^\x00]")
+
+
+def walk_files(root):
+    """Yields (directory, file names, subdirectory names) under root, skipping hidden entries."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+        except OSError:
+            continue
+        stack.extend(os.path.join(directory, name) for name in subdirs)
+        yield directory, files, subdirs
+
+
+def subsequence_pattern(query):
+    """A regex finding query's characters in order, each at its earliest position."""
+    first, rest = query[0], query[1:]
+    return re.compile(re.escape(first) + "".join(f"[^{re.escape(c)}]*{re.escape(c)}" for c in rest))
+
+
+def set_bits(mask, count):
+    """Yields lists of the indexes of the bits set in mask, CHUNK_SIZE bits at a time, lowest first."""
+    data = mask.to_bytes((count + 7) // 8, 'little')
+    step = CHUNK_SIZE // 8
+    for offset in range(0, len(data), step):
+        chunk = data[offset:offset + step]
+        yield [(offset + match.start()) * 8 + bit
+               for match in _NONZERO_BYTE.finditer(chunk)
+               for bit in _BYTE_BITS[chunk[match.start()]]]
+
+
+def mask_keys(text):
+    """The mask keys for text: each character, repeated once per extra occurrence."""
+    counts = collections.Counter(text)
+    keys = list(counts)
+    for repeat in range(2, MAX_REPEAT + 1):
+        keys.extend(c * repeat for c, count in counts.items() if count >= repeat)
+    return keys
+
+
+class PathIndex:
+    """
+    Every file under a folder, for the quick-open fuzzy finder. Each
+    character has a bitmask of the paths (and file names) containing it, so
+    a query's candidates come from a few big-integer ANDs; only those are
+    checked with a regex and scored.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.paths = [] # relative paths with "/" separators, by id; None once removed
+        self.lower = []
+        self.names = [] # lower-case file names, by id
+        self.path_masks = {} # character -> bitmask of ids whose path contains it
+        self.name_masks = {} # character -> bitmask of ids whose file name contains it
+        self.directories = {} # directory -> {file name: id}
+
+    def build(self, cancelled=None):
+        """
+        Walks the folder. Slow for big trees; meant for a worker thread, which
+        can pass a cancelled() callable to stop the walk early.
+        """
+        found = []
+        for directory, files, _ in walk_files(self.root):
+            if cancelled and cancelled():
+                break
+            self.directories[directory] = {}
+            found.extend(os.path.join(directory, name) for name in files)
+        self.add_all(found)
+        return self
+
+    def add_all(self, found):
+        """Indexes absolute file paths in bulk, numbering them shortest first."""
+        found = sorted(found, key=len)
+        start = len(self.paths)
+        prefix = os.path.join(self.root, "")
+        path_bits = {}
+        name_bits = {}
+        size = (start + len(found) + 7) // 8
+        for i, path in enumerate(found, start):
+            directory, name = os.path.split(path)
+            self.directories.setdefault(directory, {})[name] = i
+            relative = self.relative(path, prefix)
+            lower = relative.lower()
+            self.paths.append(relative)
+            self.lower.append(lower)
+            self.names.append(name.lower())
+            byte, bit = i >> 3, 1 << (i & 7)
+            for bits, text in ((path_bits, lower), (name_bits, name.lower())):
+                for key in mask_keys(text):
+                    array = bits.get(key)
+                    if array is None:
+                        array = bits[key] = bytearray(size)
+                    array[byte] |= bit
+        for masks, bits in ((self.path_masks, path_bits), (self.name_masks, name_bits)):
+            for key, array in bits.items():
+                masks[key] = masks.get(key, 0) | int.from_bytes(array, 'little')
+
+    def relative(self, path, prefix):
+        # Paths come from walking root, so they start with it
+        return path[len(prefix):].replace(os.sep, "/")
+
+    def __len__(self):
+        return sum(len(files) for files in self.directories.values())
+
+    # --- Updates from the file system watcher ---
+
+    def add(self, path):
+        directory, name = os.path.split(path)
+        files = self.directories.setdefault(directory, {})
+        if name in files:
+            return
+        i = len(self.paths)
+        files[name] = i
+        relative = self.relative(path, os.path.join(self.root, ""))
+        self.paths.append(relative)
+        self.lower.append(relative.lower())
+        self.names.append(name.lower())
+        for masks, text in ((self.path_masks, self.lower[i]), (self.name_masks, self.names[i])):
+            for key in mask_keys(text):
+                masks[key] = masks.get(key, 0) | 1 << i
+
+    def remove(self, path):
+        directory, name = os.path.split(path)
+        i = self.directories.get(directory, {}).pop(name, None)
+        if i is None:
+            return
+        for masks, text in ((self.path_masks, self.lower[i]), (self.name_masks, self.names[i])):
+            for key in mask_keys(text):
+                masks[key] &= ~(1 << i)
+        self.paths[i] = None
+
+    def refresh_directory(self, directory):
+        """
+        Re-reads one directory after the watcher reported a change. Returns
+        the directories that appeared under it, which are indexed too.
+        """
+        known = self.directories.get(directory, {})
+        gone = False
+        files = set()
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        files.add(entry.name)
+        except OSError:
+            gone = True # Drop everything under it
+        for name in set(known) - files:
+            self.remove(os.path.join(directory, name))
+        if gone:
+            self.directories.pop(directory, None)
+        for name in files - set(known):
+            self.add(os.path.join(directory, name))
+
+        # Subdirectories that went away, or came
+        present = set(subdirs)
+        for known_dir in [d for d in self.directories if d.startswith(os.path.join(directory, ""))]:
+            child = os.path.join(directory, os.path.relpath(known_dir, directory).split(os.sep)[0])
+            if child not in present:
+                for name in list(self.directories[known_dir]):
+                    self.remove(os.path.join(known_dir, name))
+                del self.directories[known_dir]
+        new_dirs = []
+        found = []
+        for subdir in subdirs:
+            if subdir not in self.directories:
+                for sub, names, _ in walk_files(subdir):
+                    self.directories[sub] = {}
+                    new_dirs.append(sub)
+                    found.extend(os.path.join(sub, name) for name in names)
+        self.add_all(found)
+        return new_dirs
+
+    # --- Matching ---
+
+    def candidates(self, masks, texts, query, pattern):
+        """Returns up to CANDIDATE_LIMIT ids, shortest first, whose text has query as a subsequence."""
+        mask = -1
+        for c, count in collections.Counter(query).items():
+            mask &= masks.get(c * min(count, MAX_REPEAT), 0)
+            if not mask:
+                return []
+        search = pattern.search
+        found = []
+        for ids in set_bits(mask, len(self.paths)):
+            found.extend(i for i in ids if search(texts[i]))
+            if len(found) >= CANDIDATE_LIMIT:
+                break
+        return found[:CANDIDATE_LIMIT]
+
+    def search(self, query, limit=50):
+        """Returns up to limit relative paths matching query, best first."""
+        query = query.lower().replace("\\", "/").replace(" ", "")
+        if not query:
+            return list(itertools.islice((path for path in self.paths if path is not None), limit))
+        pattern = subsequence_pattern(query)
+        ids = set(self.candidates(self.name_masks, self.names, query, pattern))
+        ids.update(self.candidates(self.path_masks, self.lower, query, pattern))
+        best = heapq.nlargest(limit, ids, key=lambda i: self.score(query, pattern, i))
+        return [self.paths[i] for i in best]
+
+    def score(self, query, pattern, i):
+        path, name = self.lower[i], self.names[i]
+        score = -len(path) / 100 # Shorter paths break ties
+        if query in name:
+            score += 150 if name.startswith(query) else 100
+        else:
+            match = pattern.search(name)
+            if match:
+                # Tighter matches score higher
+                score += 60 - (match.end() - match.start() - len(query))
+            elif query in path:
+                score += 40
+            else:
+                match = pattern.search(path)
+                score += 20 - (match.end() - match.start() - len(query)) / 10
+        return score
+
+
+class PathIndexWorker(QObject):
+    """A worker that builds a PathIndex in a separate thread."""
+    indexed = pyqtSignal(object) # PathIndex
+    finished = pyqtSignal() # Signal to emit when the worker is done
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = root
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            index = PathIndex(self.root).build(lambda: self.cancelled)
+            if not self.cancelled:
+                self.indexed.emit(index)
+        except Exception as e:
+            print(f"Indexing paths failed: {e}")
+        finally:
+            self.finished.emit() # Always emit finished signal
@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+
+from PyQt6.QtCore import QObject, QStandardPaths, pyqtSignal
+
+from .declarations import parse_files
+from .symbol_index import PrefixIndex
+
+# Bump when parse_declarations changes, so cached results are thrown away.
+INDEX_VERSION = 2
+# Files handed to a worker process at a time.
+PARSE_BATCH_FILES = 64
+# Fewer changed files than this are parsed in the indexer thread itself.
+POOL_MIN_FILES = 200
+# Results are sent to the UI thread in batches of this many files.
+EMIT_BATCH_FILES = 500
+
+
+def default_cache_path():
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation)
+    return os.path.join(location, "Sn2Editor", "project_index.sqlite")
+
+
+def find_sn2_files(root):
+    """Yields (path, os.stat_result) for every .sn2 file under root, skipping hidden directories."""
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".sn2") and entry.is_file():
+                        yield entry.path, entry.stat()
+        except OSError:
+            continue
+
+
+class ProjectIndex:
+    """
+    Declarations of every .sn2 file in the open folder, for go-to-definition
+    and cross-file completion. Lives in the UI thread; filled by ProjectIndexWorker.
+    """
+    def __init__(self):
+        self.files = {} # path -> [[kind, name, line], ...]
+        self.definitions = {} # name -> [(path, line, kind), ...]
+        self.names = PrefixIndex()
+
+    def clear(self):
+        self.__init__()
+
+    def set_file(self, path, symbols):
+        self.remove_file(path)
+        self.files[path] = symbols
+        for kind, name, line in symbols:
+            if kind != "import":
+                self.definitions.setdefault(name, []).append((path, line, kind))
+                self.names.add(name)
+
+    def remove_file(self, path):
+        for kind, name, line in self.files.pop(path, ()):
+            if kind == "import":
+                continue
+            locations = [loc for loc in self.definitions.get(name, ()) if loc[0] != path]
+            if locations:
+                self.definitions[name] = locations
+            else:
+                self.definitions.pop(name, None)
+            self.names.remove(name)
+
+    def find_definitions(self, name):
+        """Returns [(path, line, kind)] for every file-level declaration of name."""
+        return list(self.definitions.get(name, ()))
+
+    def completions(self, prefix, limit=50):
+        return self.names.with_prefix(prefix, limit)
+
+
+class ProjectIndexWorker(QObject):
+    """
+    A worker that indexes a folder in a separate thread. Files whose path,
+    mtime and size match the on-disk cache are not parsed again; the rest are
+    parsed on a process pool.
+    """
+    files_indexed = pyqtSignal(list) # [(path, symbols), ...]
+    files_removed = pyqtSignal(list) # [path, ...] that are gone since the last run
+    progress = pyqtSignal(int, int) # (files done, files found)
+    finished = pyqtSignal() # Signal to emit when the worker is done
+
+    def __init__(self, root, cache_path=None):
+        super().__init__()
+        self.root = root
+        self.cache_path = cache_path or default_cache_path()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        # sqlite3 and the process pool are imported here to keep them off the startup path
+        import sqlite3
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            db = sqlite3.connect(self.cache_path)
+            try:
+                self.index(db)
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"Project indexing failed: {e}")
+        finally:
+            self.finished.emit() # Always emit finished signal
+
+    def index(self, db):
+        if db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            db.execute("DROP TABLE IF EXISTS files")
+            db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, symbols TEXT)")
+
+        prefix = os.path.join(self.root, "")
+        cached = {
+            path: (mtime_ns, size, symbols)
+            for path, mtime_ns, size, symbols in db.execute(
+                "SELECT path, mtime_ns, size, symbols FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+            )
+        }
+
+        # Unchanged files come straight from the cache
+        fresh = []
+        stale = {}
+        for path, st in find_sn2_files(self.root):
+            if self.cancelled:
+                return
+            entry = cached.pop(path, None)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                fresh.append((path, json.loads(entry[2])))
+            else:
+                stale[path] = st
+        total = len(fresh) + len(stale)
+        for start in range(0, len(fresh), EMIT_BATCH_FILES):
+            self.files_indexed.emit(fresh[start:start + EMIT_BATCH_FILES])
+        self.progress.emit(len(fresh), total)
+
+        if cached:
+            db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in cached])
+            db.commit()
+            self.files_removed.emit(list(cached))
+
+        done = len(fresh)
+        for results in self.parse(list(stale)):
+            if self.cancelled:
+                return
+            db.executemany(
+                "INSERT OR REPLACE INTO files (path, mtime_ns, size, symbols) VALUES (?, ?, ?, ?)",
+                [(path, stale[path].st_mtime_ns, stale[path].st_size, json.dumps(symbols)) for path, symbols in results]
+            )
+            db.commit()
+            self.files_indexed.emit(results)
+            done += len(results)
+            self.progress.emit(done, total)
+
+    def parse(self, paths):
+        """Yields lists of (path, symbols), using a process pool when there is enough work."""
+        batches = [paths[i:i + PARSE_BATCH_FILES] for i in range(0, len(paths), PARSE_BATCH_FILES)]
+        if len(paths) < POOL_MIN_FILES:
+            for batch in batches:
+                yield parse_files(batch)
+            return
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+        # spawn, not fork: forking a process that runs Qt threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context) as pool:
+            # Keep a couple of batches per worker in flight, so cancelling is quick
+            limit = 2 * (os.cpu_count() or 1)
+            pending = set()
+            while (batches or pending) and not self.cancelled:
+                while batches and len(pending) < limit:
+                    pending.add(pool.submit(parse_files, batches.pop()))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            for future in pending:
+                future.cancel()
+
+
+class FileParseWorker(QObject):
+    """
+    A worker that parses single files again in a separate thread, e.g. once
+    they have been saved, so the project index stays current without the UI
+    thread reading them. A file queued twice is parsed once.
+    """
+    files_indexed = pyqtSignal(list) # [(path, symbols), ...]
+    finished = pyqtSignal() # Signal to emit when the worker is done
+
+    def __init__(self):
+        super().__init__()
+        self.pending = [] # paths
+        self.condition = threading.Condition()
+        self.stopping = False
+
+    def request(self, path):
+        """Queues a file. Safe to call from any thread."""
+        with self.condition:
+            if path not in self.pending:
+                self.pending.append(path)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending and not self.stopping:
+                        self.condition.wait()
+                    if self.stopping:
+                        return
+                    paths, self.pending = self.pending, []
+                self.files_indexed.emit(parse_files(paths))
+        finally:
+            self.finished.emit() # Always emit finished signal
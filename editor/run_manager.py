@@ -0,0 +1,135 @@
+import collections
+import os
+import time
+
+from PyQt6.QtCore import QObject, QProcess, pyqtSignal
+
+from .instrumentation import timed
+
+QUEUED, RUNNING, FINISHED, KILLED, FAILED = "queued", "running", "finished", "killed", "failed"
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+
+class Run:
+    """One execution of a script, writing to its own terminal."""
+    def __init__(self, path, terminal):
+        self.path = path
+        self.terminal = terminal
+        self.process = None
+        self.status = QUEUED
+        self.exit_code = None
+        self.error = None
+        self.started_at = None
+        self.ended_at = None
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.ended_at or time.monotonic()) - self.started_at
+
+    def describe(self):
+        if self.status == QUEUED:
+            return "Queued"
+        if self.status == RUNNING:
+            return f"Running {format_duration(self.elapsed())}"
+        if self.status == KILLED:
+            return f"Killed after {format_duration(self.elapsed())}"
+        if self.status == FAILED:
+            return f"Failed to start: {self.error}"
+        return f"Exited with code {self.exit_code} after {format_duration(self.elapsed())}"
+
+
+class RunManager(QObject):
+    """
+    Runs scripts on the interpreter pool, several at a time. Runs beyond
+    max_parallel wait in a queue and start, in order, as others end.
+    """
+    run_changed = pyqtSignal(object) # Run whose status changed
+
+    def __init__(self, pool, max_parallel=None, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.max_parallel = max_parallel or os.cpu_count() or 1
+        self.queue = collections.deque()
+        self.running = []
+
+    def submit(self, path, terminal):
+        run = Run(path, terminal)
+        self.queue.append(run)
+        self.run_changed.emit(run)
+        self.schedule()
+        return run
+
+    def schedule(self):
+        while self.queue and len(self.running) < self.max_parallel:
+            self.start(self.queue.popleft())
+
+    def start(self, run):
+        run.terminal.appendPlainText(f">>> Running {run.path}...\n")
+        run.process = self.pool.start_process(run.path, self)
+        run.process.readyReadStandardOutput.connect(lambda: self.handle_process_output(run))
+        run.process.finished.connect(lambda exit_code, exit_status: self.handle_process_finished(run, exit_code))
+        run.process.errorOccurred.connect(lambda error: self.handle_process_error(run, error))
+        run.terminal.set_process(run.process) # Give the terminal a reference to the process
+        run.status = RUNNING
+        run.started_at = time.monotonic()
+        self.running.append(run)
+        self.run_changed.emit(run)
+
+    @timed("handle_process_output")
+    def handle_process_output(self, run):
+        run.terminal.feed_output(run.process.readAllStandardOutput().data())
+
+    def handle_process_finished(self, run, exit_code):
+        if run.status == RUNNING:
+            run.status = FINISHED
+        run.exit_code = exit_code
+        run.terminal.finish_output()
+        run.terminal.appendPlainText("\n>>> Process finished.")
+        self.end(run)
+
+    def handle_process_error(self, run, error):
+        # A process that never started emits no finished signal
+        if error == QProcess.ProcessError.FailedToStart:
+            run.status = FAILED
+            run.error = run.process.errorString()
+            run.terminal.appendPlainText(f">>> Could not start the interpreter: {run.error}")
+            self.end(run)
+
+    def end(self, run):
+        run.ended_at = time.monotonic()
+        run.terminal.set_process(None) # Clear the process reference
+        run.process.deleteLater()
+        run.process = None
+        self.running.remove(run)
+        self.run_changed.emit(run)
+        self.schedule()
+
+    def kill(self, run, wait=False):
+        """Stops a run, or takes it off the queue. With wait, returns once the process is gone."""
+        if run.status == QUEUED:
+            self.queue.remove(run)
+            run.status = KILLED
+            self.run_changed.emit(run)
+        elif run.status == RUNNING:
+            run.status = KILLED
+            process = run.process
+            process.kill()
+            if wait:
+                process.waitForFinished(1000)
+
+    def set_max_parallel(self, max_parallel):
+        self.max_parallel = max(1, max_parallel)
+        self.schedule()
+
+    def stop_all(self):
+        """Kills every run and waits for the processes to go, e.g. before exiting."""
+        for run in list(self.queue):
+            self.kill(run)
+        for run in list(self.running):
+            self.kill(run, wait=True)
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+# Characters written per call while streaming a document to disk.
+WRITE_CHUNK_CHARS = 256 * 1024
+
+
+def _read_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# Read once, at import: reading it means setting it, which isn't safe while
+# other threads are creating files.
+_UMASK = _read_umask()
+
+
+def atomic_write(path, content):
+    """
+    Writes content to a temporary file next to path, fsyncs it and renames it
+    over path, so a crash mid-write never leaves a truncated file behind.
+    A symlink is followed, so its target is replaced rather than the link.
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for start in range(0, len(content), WRITE_CHUNK_CHARS):
+                f.write(content[start:start + WRITE_CHUNK_CHARS])
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        else:
+            # mkstemp creates the file 0600; a new file gets the usual permissions
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SaveWorker(QObject):
+    """
+    A worker that writes files in a separate thread. Saves are queued per
+    path: a save requested while an earlier one for the same path is still
+    waiting replaces it, so rapid saves are written once.
+    """
+    saved = pyqtSignal(str) # path
+    failed = pyqtSignal(str, str) # (path, error message)
+    finished = pyqtSignal() # Signal to emit when the worker is done
+
+    def __init__(self):
+        super().__init__()
+        self.pending = {} # path -> content, in request order
+        self.condition = threading.Condition()
+        self.stopping = False
+
+    def save(self, path, content):
+        """Queues content to be written to path. Safe to call from any thread."""
+        with self.condition:
+            self.pending.pop(path, None)
+            self.pending[path] = content
+            self.condition.notify()
+
+    def stop(self):
+        """Asks the worker to finish once everything queued has been written."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending and not self.stopping:
+                        self.condition.wait()
+                    if not self.pending:
+                        return
+                    path = next(iter(self.pending))
+                    content = self.pending.pop(path)
+                try:
+                    atomic_write(path, content)
+                except Exception as e:
+                    self.failed.emit(path, str(e))
+                else:
+                    self.saved.emit(path)
+        finally:
+            self.finished.emit() # Always emit finished signal
@@ -0,0 +1,25 @@
+import sys
+import time
+
+
+class StartupProfile:
+    """
+    Times the phases of startup for `main.py --startup-profile`. Each call
+    to mark() ends the phase that began at the previous one.
+    """
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+        self.phases = [] # (name, seconds)
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, stream=None):
+        stream = stream or sys.stderr
+        print("Startup profile:", file=stream)
+        for phase, seconds in self.phases:
+            print(f"  {phase:<20} {seconds * 1000:8.1f} ms", file=stream)
+        print(f"  {'total':<20} {(self.last - self.start) * 1000:8.1f} ms", file=stream)
@@ -0,0 +1,524 @@
+"""
+The block structure of Sn2 documents: how each line changes the bracket
+nesting, and the func/class/match headers that open regions. Lines are kept
+in chunks with a summary each, so where a region ends, or which region a
+line is in, is found by skipping whole chunks instead of scanning lines.
+"""
+import re
+
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from .symbol_index import SYNC_RESCAN_BLOCKS
+from .tokenizer import tokenize_line, mask_code, STATE_NORMAL
+
+# Lines per chunk. Edits re-summarize one chunk; lookups step over whole chunks.
+CHUNK_LINES = 128
+
+_BRACKET_RE = re.compile(r"[()\[\]{}]")
+# All brackets as round ones, for working out nesting
+_NESTING = str.maketrans("[{]}", "(())")
+OPENERS = "([{"
+CLOSERS = ")]}"
+# func/class/match headers; group 1 is the keyword, group 2 the name (or what is matched)
+_HEADER_RE = re.compile(r'\b(func|class|match)\b\s*([A-Za-z_][\w.]*)?')
+
+
+def line_code(text, state):
+    """
+    Returns (the line with its strings and comments blanked out, end state),
+    given the block state at the end of the previous line.
+    """
+    if state == STATE_NORMAL and '"' not in text and '/' not in text:
+        return text, STATE_NORMAL
+    tokens, end = tokenize_line(text, state)
+    code = mask_code(text, tokens)
+    quote = code.find('"')
+    if quote != -1:
+        code = code[:quote] # An unterminated string runs to the end of the line
+    return code, end
+
+
+def analyze_line(text, state):
+    """
+    Returns (end state, delta, low, headers) for a line, given the block
+    state at the end of the previous one. delta is how much the line changes
+    the bracket nesting and low the lowest nesting reached in it, both
+    relative to its start; headers are the (column, keyword, name) of its
+    func, class and match keywords, at the name (or at the keyword, if the
+    function is anonymous).
+    """
+    code, end = line_code(text, state)
+    nesting = "".join(_BRACKET_RE.findall(code)).translate(_NESTING)
+    while "()" in nesting:
+        nesting = nesting.replace("()", "")
+    # What is left is the closers the line didn't open, then the openers it leaves open
+    low = -nesting.count(")")
+    delta = len(nesting) + 2 * low
+
+    headers = ()
+    if "func" in code or "class" in code or "match" in code:
+        headers = tuple(
+            (match.start(2) if match.group(2) else match.start(), match.group(1), match.group(2))
+            for match in _HEADER_RE.finditer(code)
+        )
+    return (end, delta, low, headers)
+
+
+def opens_region(line):
+    """Whether a line's analysis leaves a bracket open at its end."""
+    return line[1] > line[2]
+
+
+# A run of chunks as (lines, delta, low); the empty run changes nothing
+_EMPTY = (0, 0, 0)
+
+
+def _combine(first, second):
+    """The (lines, delta, low) of two runs of chunks, one after the other."""
+    return (first[0] + second[0], first[1] + second[1], min(first[2], first[1] + second[2]))
+
+
+class Chunk:
+    """A run of consecutive lines' analyses, with their combined delta and low."""
+    __slots__ = ("lines", "delta", "low", "headers")
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.summarize()
+
+    def summarize(self):
+        depth = low = headers = 0
+        for line in self.lines:
+            if depth + line[2] < low:
+                low = depth + line[2]
+            depth += line[1]
+            if line[3]:
+                headers += 1
+        self.delta = depth
+        self.low = low
+        self.headers = headers # lines with headers
+
+
+class StructureIndex(QObject):
+    """
+    Tracks the bracket nesting of a QTextDocument line by line. Like the
+    symbol index, only the blocks touched by an edit are analysed again.
+    """
+    changed = pyqtSignal()
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.document = document
+        self.chunks = []
+        self.line_count = 0
+        # A segment tree over the chunks' (lines, delta, low): node i covers
+        # nodes 2i and 2i + 1, and the chunks are the leaves from tree_size on.
+        # Finding a line, or where the nesting falls to a depth, takes log(chunks) steps.
+        self.tree = [_EMPTY, _EMPTY]
+        self.tree_size = 1
+        # (chunk index, its first line, nesting at its start) of the last
+        # chunk located; lookups near it start there
+        self.hint = (0, 0, 0)
+        self.rebuild_pending = False
+        # Deferred rebuilds, as in DocumentSymbolIndex
+        self.rebuild_timer = QTimer(self)
+        self.rebuild_timer.setSingleShot(True)
+        self.rebuild_timer.timeout.connect(self.rebuild)
+        self.rebuild()
+        document.contentsChange.connect(self.handle_contents_change)
+
+    # --- Keeping up with edits ---
+
+    def handle_contents_change(self, position, removed, added):
+        if self.rebuild_pending:
+            return # The rebuild will see this change too
+        document = self.document
+        first = document.findBlock(position).blockNumber()
+        end_block = document.findBlock(position + added)
+        last = end_block.blockNumber() if end_block.isValid() else document.blockCount() - 1
+        new_count = last - first + 1
+        if new_count > SYNC_RESCAN_BLOCKS and new_count > document.blockCount() // 2:
+            # Most of a big document replaced (setPlainText): index it once the event loop is free
+            self.rebuild_pending = True
+            self.rebuild_timer.start(0)
+            return
+        old_count = new_count - (document.blockCount() - self.line_count)
+        self.rescan(first, old_count, new_count)
+        self.changed.emit()
+
+    def rebuild(self):
+        self.rebuild_pending = False
+        self.rebuild_timer.stop()
+        owner = self.document.parent() # Kept alive until the scan is done, as in DocumentSymbolIndex
+        lines = []
+        state = STATE_NORMAL
+        for text in self.block_texts(0, self.document.blockCount()):
+            line = analyze_line(text, state)
+            lines.append(line)
+            state = line[0]
+        self.chunks = [Chunk(lines[i:i + CHUNK_LINES]) for i in range(0, len(lines), CHUNK_LINES)]
+        self.line_count = len(lines)
+        self.hint = (0, 0, 0)
+        self.build_tree()
+        self.changed.emit()
+
+    def rescan(self, first, old_count, new_count):
+        """Replaces the analyses of old_count lines from line `first` with those of new_count blocks."""
+        state = self.line(first - 1)[0] if first > 0 else STATE_NORMAL
+        old_end_state = self.line(first + old_count - 1)[0] if old_count else None
+        lines = []
+        for text in self.block_texts(first, new_count):
+            line = analyze_line(text, state)
+            lines.append(line)
+            state = line[0]
+        self.replace_lines(first, old_count, lines)
+
+        # Opening or closing a block comment changes the lines after it too;
+        # carry on until the state matches what was there before.
+        start = first + new_count
+        if start < self.line_count and state != old_end_state:
+            block = self.document.findBlockByNumber(start)
+            lines = []
+            for old in self.iter_lines(start):
+                if state == old_end_state:
+                    break
+                old_end_state = old[0]
+                line = analyze_line(block.text(), state)
+                lines.append(line)
+                state = line[0]
+                block = block.next()
+            self.replace_lines(start, len(lines), lines)
+
+    def replace_lines(self, first, old_count, lines):
+        if not old_count and not lines:
+            return
+        chunks = self.chunks
+        index, offset, depth = self.locate(first)
+        # Chunks from this one on may change; the ones before and their summaries don't
+        self.hint = (index, first - offset, depth)
+        # The chunks holding the old lines are merged, edited and split again
+        end = index
+        covered = len(chunks[index].lines) if chunks else 0
+        while covered < offset + old_count or (covered < CHUNK_LINES // 4 and end + 1 < len(chunks)):
+            end += 1
+            covered += len(chunks[end].lines)
+        if index == end and len(lines) == old_count and all(
+            (old[1], old[2], bool(old[3])) == (new[1], new[2], bool(new[3]))
+            for old, new in zip(chunks[index].lines[offset:offset + old_count], lines)
+        ):
+            # Typing within a line rarely changes its nesting; the summary still holds
+            chunks[index].lines[offset:offset + old_count] = lines
+            return
+        merged = [line for chunk in chunks[index:end + 1] for line in chunk.lines]
+        merged[offset:offset + old_count] = lines
+        if len(merged) >= 2 * CHUNK_LINES:
+            replacement = [Chunk(merged[i:i + CHUNK_LINES]) for i in range(0, len(merged), CHUNK_LINES)]
+        else:
+            replacement = [Chunk(merged)] if merged else []
+        chunks[index:end + 1] = replacement
+        self.line_count += len(lines) - old_count
+        if len(replacement) == end + 1 - index:
+            for i in range(index, end + 1):
+                self.update_tree(i)
+        else:
+            # Chunks were split or merged away; this happens once per CHUNK_LINES lines or so
+            self.build_tree()
+
+    def build_tree(self):
+        size = 1
+        while size < len(self.chunks):
+            size *= 2
+        tree = [_EMPTY] * (2 * size)
+        for i, chunk in enumerate(self.chunks):
+            tree[size + i] = (len(chunk.lines), chunk.delta, chunk.low)
+        for node in range(size - 1, 0, -1):
+            tree[node] = _combine(tree[2 * node], tree[2 * node + 1])
+        self.tree = tree
+        self.tree_size = size
+
+    def update_tree(self, index):
+        """Updates the tree after the summary of chunk `index` changed."""
+        tree = self.tree
+        chunk = self.chunks[index]
+        node = self.tree_size + index
+        tree[node] = (len(chunk.lines), chunk.delta, chunk.low)
+        node //= 2
+        while node:
+            tree[node] = _combine(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    def block_texts(self, first, count):
+        document = self.document
+        cursor = QTextCursor(document)
+        cursor.setPosition(document.findBlockByNumber(first).position())
+        last = document.findBlockByNumber(first + count - 1)
+        cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+        return cursor.selectedText().split("\u2029")
+
+    # --- Lookups ---
+
+    def locate(self, number):
+        """
+        Returns (chunk index, line offset in it, nesting at the chunk's start)
+        for a line. Lines past the end are placed at the end of the last chunk.
+        """
+        chunks = self.chunks
+        if not chunks:
+            return 0, 0, 0
+        index, start, depth = self.hint
+        if index < len(chunks) and start <= number < start + len(chunks[index].lines):
+            return index, number - start, depth
+        tree = self.tree
+        if number >= self.line_count:
+            index = len(chunks) - 1
+            start = self.line_count - len(chunks[index].lines)
+            depth = tree[1][1] - chunks[index].delta
+        else:
+            node = 1
+            start = depth = 0
+            while node < self.tree_size:
+                left = tree[2 * node]
+                if number < start + left[0]:
+                    node = 2 * node
+                else:
+                    start += left[0]
+                    depth += left[1]
+                    node = 2 * node + 1
+            index = node - self.tree_size
+        self.hint = (index, start, depth)
+        return index, number - start, depth
+
+    def line(self, number):
+        index, offset, _ = self.locate(number)
+        return self.chunks[index].lines[offset]
+
+    def iter_lines(self, number):
+        """Yields the analyses of the lines from line `number` on."""
+        index, offset, _ = self.locate(number)
+        for chunk in self.chunks[index:]:
+            yield from chunk.lines[offset:]
+            offset = 0
+
+    def depth(self, number):
+        """Returns (nesting at the start of a line, its analysis)."""
+        index, offset, depth = self.locate(number)
+        lines = self.chunks[index].lines
+        for line in lines[:offset]:
+            depth += line[1]
+        return depth, lines[offset]
+
+    def first_reaching(self, number, depth, target):
+        """
+        The first line from line `number` (whose nesting at the start is
+        depth) where the nesting falls to target, as (line, nesting at its
+        start), or None.
+        """
+        if number >= self.line_count:
+            return None
+        index, offset, _ = self.locate(number)
+        while True:
+            for line in self.chunks[index].lines[offset:]:
+                if depth + line[2] <= target:
+                    return number, depth
+                depth += line[1]
+                number += 1
+            found = self.next_chunk_reaching(index + 1, number, depth, target)
+            if found is None:
+                return None
+            index, number, depth = found
+            offset = 0
+
+    def next_chunk_reaching(self, index, number, depth, target):
+        """
+        The first chunk from chunk `index` (which starts at line `number`
+        with nesting depth) in which the nesting falls to target, as (chunk
+        index, its first line, nesting at its start), or None.
+        """
+        tree = self.tree
+        size = self.tree_size
+        # The nodes covering chunks index.. in order: from the left edge up, then down the right
+        low, high = index + size, 2 * size
+        left, right = [], []
+        while low < high:
+            if low & 1:
+                left.append(low)
+                low += 1
+            if high & 1:
+                high -= 1
+                right.append(high)
+            low //= 2
+            high //= 2
+        for node in left + right[::-1]:
+            lines, delta, lowest = tree[node]
+            if depth + lowest > target:
+                depth += delta
+                number += lines
+                continue
+            while node < size:
+                first = tree[2 * node]
+                if depth + first[2] <= target:
+                    node = 2 * node
+                else:
+                    depth += first[1]
+                    number += first[0]
+                    node = 2 * node + 1
+            # Past the last chunk, the empty leaves "reach" any target at or above the final depth
+            return (node - size, number, depth) if node - size < len(self.chunks) else None
+        return None
+
+    def last_reaching(self, number, depth, target):
+        """
+        The last line before line `number` (whose nesting at the start is
+        depth) where the nesting falls to target, as (line, nesting at its
+        start), or None.
+        """
+        if not self.chunks:
+            return None
+        index, offset, _ = self.locate(number)
+        lines = self.chunks[index].lines[:offset]
+        while True:
+            for line in reversed(lines):
+                number -= 1
+                depth -= line[1]
+                if depth + line[2] <= target:
+                    return number, depth
+            found = self.previous_chunk_reaching(index, number, depth, target)
+            if found is None:
+                return None
+            index, number, depth = found
+            lines = self.chunks[index].lines
+
+    def previous_chunk_reaching(self, index, number, depth, target):
+        """
+        The last chunk before chunk `index` (which starts at line `number`
+        with nesting depth) in which the nesting falls to target, as (chunk
+        index, the line after it, nesting at its end), or None.
+        """
+        tree = self.tree
+        size = self.tree_size
+        # The nodes covering chunks ..index - 1, right to left
+        low, high = size, index + size
+        left, right = [], []
+        while low < high:
+            if low & 1:
+                left.append(low)
+                low += 1
+            if high & 1:
+                high -= 1
+                right.append(high)
+            low //= 2
+            high //= 2
+        for node in right + left[::-1]:
+            lines, delta, lowest = tree[node]
+            if depth - delta + lowest > target:
+                depth -= delta
+                number -= lines
+                continue
+            while node < size:
+                second = tree[2 * node + 1]
+                if depth - second[1] + second[2] <= target:
+                    node = 2 * node + 1
+                else:
+                    depth -= second[1]
+                    number -= second[0]
+                    node = 2 * node
+            return node - size, number, depth
+        return None
+
+    def code(self, number):
+        """A line's text with its strings and comments blanked out (see line_code)."""
+        state = self.line(number - 1)[0] if number > 0 else STATE_NORMAL
+        return line_code(self.document.findBlockByNumber(number).text(), state)[0]
+
+    def matching_bracket(self, number, column):
+        """
+        The (line, column) of the bracket matching the one at a line and
+        column (in code points), or None if it is unmatched. Only the two
+        lines are scanned; the lines between are skipped a chunk at a time.
+        """
+        code = self.code(number)
+        depth, _ = self.depth(number)
+        # Nesting just before the bracket
+        for bracket in _BRACKET_RE.findall(code, 0, column):
+            depth += 1 if bracket in OPENERS else -1
+        if code[column] in OPENERS:
+            target = depth
+            depth += 1
+            for match in _BRACKET_RE.finditer(code, column + 1):
+                depth += 1 if match.group() in OPENERS else -1
+                if depth == target:
+                    return number, match.start()
+            found = self.first_reaching(number + 1, depth, target)
+            if found is None:
+                return None
+            number, depth = found
+            for match in _BRACKET_RE.finditer(self.code(number)):
+                depth += 1 if match.group() in OPENERS else -1
+                if depth == target:
+                    return number, match.start()
+        else:
+            target = depth - 1
+            for match in reversed(list(_BRACKET_RE.finditer(code, 0, column))):
+                depth += -1 if match.group() in OPENERS else 1
+                if depth == target:
+                    return number, match.start()
+            found = self.last_reaching(number, depth, target)
+            if found is None:
+                return None
+            number, depth = found
+            partner = None
+            for match in _BRACKET_RE.finditer(self.code(number)):
+                if match.group() in OPENERS:
+                    if depth == target:
+                        partner = match.start()
+                    depth += 1
+                else:
+                    depth -= 1
+            if partner is not None:
+                return number, partner
+        return None
+
+    def region_end(self, number):
+        """
+        The line where the outermost bracket left open by a line is closed,
+        or None if the line leaves none open or it is never closed.
+        """
+        depth, line = self.depth(number)
+        if not opens_region(line):
+            return None
+        found = self.first_reaching(number + 1, depth + line[1], depth + line[2])
+        return found and found[0]
+
+    def region_start(self, number):
+        """The line that opened the innermost region a line is in, or None at the top level."""
+        depth, _ = self.depth(number)
+        found = self.last_reaching(number, depth, depth - 1)
+        return found and found[0]
+
+    def regions(self, keywords=("func", "class", "match")):
+        """
+        Returns (keyword, name, line, column, end line) for the headers with
+        the given keywords, in order; the end line of one whose region
+        doesn't span lines is its own line. One pass over the document,
+        skipping chunks with no headers and nothing to close.
+        """
+        regions = []
+        open_regions = [] # (nesting the region closes at, index in regions)
+        depth = number = 0
+        for chunk in self.chunks:
+            if not chunk.headers and (not open_regions or depth + chunk.low > open_regions[-1][0]):
+                depth += chunk.delta
+                number += len(chunk.lines)
+                continue
+            for line in chunk.lines:
+                while open_regions and depth + line[2] <= open_regions[-1][0]:
+                    regions[open_regions.pop()[1]][4] = number
+                for column, keyword, name in line[3]:
+                    if keyword in keywords:
+                        if opens_region(line):
+                            open_regions.append((depth + line[2], len(regions)))
+                        regions.append([keyword, name, number, column, number])
+                depth += line[1]
+                number += 1
+        return [tuple(region) for region in regions]
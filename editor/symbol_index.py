@@ -0,0 +1,162 @@
+import bisect
+
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtCore import QObject, QTimer
+
+from .declarations import declared_names, end_state
+
+# Changes that replace most of a document larger than this are indexed from the
+# event loop rather than inline.
+SYNC_RESCAN_BLOCKS = 5000
+
+
+class PrefixIndex:
+    """
+    A multiset of words kept sorted case-insensitively, so every word with a
+    given prefix is found with one binary search.
+    """
+    def __init__(self):
+        self.counts = {}
+        self.keys = [] # sorted (word.lower(), word)
+
+    def add(self, word):
+        count = self.counts.get(word, 0)
+        self.counts[word] = count + 1
+        if count == 0:
+            bisect.insort(self.keys, (word.lower(), word))
+
+    def add_many(self, words):
+        """Adds several words, re-sorting once instead of inserting each."""
+        counts = self.counts
+        fresh = []
+        for word in words:
+            count = counts.get(word, 0)
+            counts[word] = count + 1
+            if count == 0:
+                fresh.append((word.lower(), word))
+        if fresh:
+            self.keys.extend(fresh)
+            self.keys.sort()
+
+    def remove(self, word):
+        count = self.counts.get(word, 0)
+        if count <= 1:
+            self.counts.pop(word, None)
+            key = (word.lower(), word)
+            i = bisect.bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+        else:
+            self.counts[word] = count - 1
+
+    def with_prefix(self, prefix, limit=50):
+        prefix = prefix.lower()
+        i = bisect.bisect_left(self.keys, (prefix,))
+        words = []
+        while i < len(self.keys) and len(words) < limit and self.keys[i][0].startswith(prefix):
+            words.append(self.keys[i][1])
+            i += 1
+        return words
+
+
+class DocumentSymbolIndex(QObject):
+    """
+    Tracks the names declared in a QTextDocument. Only blocks touched by an
+    edit are re-scanned, using the document's contentsChange notifications.
+    """
+    def __init__(self, document):
+        super().__init__(document)
+        self.document = document
+        self.names = PrefixIndex()
+        self.block_names = [] # declared names per block, by block number
+        self.block_states = [] # comment state at the end of each block
+        self.rebuild_pending = False
+        # A child timer rather than QTimer.singleShot: it is deleted with the
+        # index (and so with the document) and can't fire after either is gone
+        self.rebuild_timer = QTimer(self)
+        self.rebuild_timer.setSingleShot(True)
+        self.rebuild_timer.timeout.connect(self.rebuild)
+        self.rebuild()
+        document.contentsChange.connect(self.handle_contents_change)
+
+    def handle_contents_change(self, position, removed, added):
+        if self.rebuild_pending:
+            return # The rebuild will see this change too
+        document = self.document
+        first = document.findBlock(position).blockNumber()
+        end_block = document.findBlock(position + added)
+        last = end_block.blockNumber() if end_block.isValid() else document.blockCount() - 1
+        new_count = last - first + 1
+        if new_count > SYNC_RESCAN_BLOCKS and new_count > document.blockCount() // 2:
+            # Most of a big document replaced (setPlainText): index it once the event loop is free
+            self.rebuild_pending = True
+            self.rebuild_timer.start(0)
+            return
+        old_count = new_count - (document.blockCount() - len(self.block_names))
+        self.rescan(first, old_count, new_count)
+
+    def rebuild(self):
+        self.rebuild_pending = False
+        self.rebuild_timer.stop()
+        # The object owning the document can be garbage collected as soon as
+        # nothing else refers to it, even halfway through this scan; hold it until done
+        owner = self.document.parent()
+        self.names = PrefixIndex()
+        self.block_names = []
+        self.block_states = []
+        self.rescan(0, 0, self.document.blockCount())
+
+    def rescan(self, first, old_count, new_count):
+        """Replaces the entries of old_count blocks from block `first` with a scan of new_count blocks."""
+        old_end_state = self.block_states[first + old_count - 1] if old_count else None
+        for names in self.block_names[first:first + old_count]:
+            for name in names:
+                self.names.remove(name)
+
+        state = self.block_states[first - 1] if first > 0 else 0
+        names_list = []
+        states = []
+        # One selection for the whole range is far cheaper than block.text() per block
+        for text in self.block_texts(first, new_count):
+            names_list.append(declared_names(text, state))
+            state = end_state(text, state)
+            states.append(state)
+        if new_count > 1:
+            self.names.add_many(name for names in names_list for name in names)
+        else:
+            for name in names_list[0]:
+                self.names.add(name)
+        block = self.document.findBlockByNumber(first + new_count)
+        self.block_names[first:first + old_count] = names_list
+        self.block_states[first:first + old_count] = states
+
+        # Opening or closing a block comment changes the blocks after it too;
+        # carry on until the state matches what was there before.
+        number = first + new_count
+        while number < len(self.block_states) and state != old_end_state:
+            old_end_state = self.block_states[number]
+            for name in self.block_names[number]:
+                self.names.remove(name)
+            self.block_names[number], state = self.scan_block(block, state)
+            self.block_states[number] = state
+            block = block.next()
+            number += 1
+
+    def block_texts(self, first, count):
+        document = self.document
+        cursor = QTextCursor(document)
+        cursor.setPosition(document.findBlockByNumber(first).position())
+        last = document.findBlockByNumber(first + count - 1)
+        cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+        return cursor.selectedText().split("\u2029")
+
+    def scan_block(self, block, state):
+        """Indexes one block; returns (declared names, state at its end)."""
+        text = block.text()
+        names = declared_names(text, state)
+        for name in names:
+            self.names.add(name)
+        return names, end_state(text, state)
+
+    def completions(self, prefix, limit=50):
+        return self.names.with_prefix(prefix, limit)
@@ -1,75 +1,294 @@
-from PyQt6.QtGui import QSyntaxHighlighter, QTextCharFormat, QFont
-from PyQt6.QtCore import QRegularExpression
+import time
+
+from PyQt6.QtGui import QSyntaxHighlighter, QTextCharFormat, QFont, QTextCursor
+from PyQt6.QtCore import QTimer, pyqtSignal
+
+from .themes import char_formats
+from .instrumentation import timed
+from .tokenizer import (
+    tokenize_line, KEYWORD, LITERAL, STRING, NUMBER, COMMENT, BLOCK_COMMENT, STATE_NORMAL
+)
+from .token_cache import cache_key, flatten, unflatten, TOKEN_CACHE_MIN_LINES
+from .declarations import end_state
+
+# Documents with at least this many blocks are highlighted lazily: the visible
+# blocks first, then the rest in time-sliced chunks while the event loop is idle.
+LAZY_HIGHLIGHT_BLOCKS = 2000
+# Time budget for one idle slice, in milliseconds (half a 60 Hz frame).
+LAZY_SLICE_BUDGET_MS = 8
+# Smallest number of blocks highlighted per idle slice.
+MIN_CHUNK_BLOCKS = 16
+# Block state of a block that has not been highlighted yet (Qt's default).
+STATE_PENDING = -1
+# Added to the state of a folded-away block whose formats were skipped.
+# Like pending blocks, such blocks are highlighted once they are reached.
+STATE_FOLDED = 2
+
+
+def needs_highlight(block):
+    state = block.userState()
+    return state == STATE_PENDING or (state >= STATE_FOLDED and block.isVisible())
 
 class Sn2SyntaxHighlighter(QSyntaxHighlighter):
     """
     A syntax highlighter for the Sn2 language.
     """
+    highlighting_finished = pyqtSignal()
+
     def __init__(self, parent):
         super().__init__(parent)
-        self.highlighting_rules = []
-
-        # Keywords
-        self.keyword_format = QTextCharFormat()
-        self.keyword_format.setFontWeight(QFont.Weight.Bold)
-        keywords = [
-            "let", "show", "if", "else", "loop", "in", "while", "func", "class",
-            "try", "catch", "return", "this", "super", "import", "as", "match", "case"
-        ]
-        self.highlighting_rules.extend([(QRegularExpression(f"\\b{keyword}\\b"), self.keyword_format) for keyword in keywords])
-
-        # Literals (true, false, null)
-        self.literal_format = QTextCharFormat()
-        literals = ["true", "false", "null"]
-        self.highlighting_rules.extend([(QRegularExpression(f"\\b{literal}\\b"), self.literal_format) for literal in literals])
-
-        # Strings (double-quoted)
-        self.string_format = QTextCharFormat()
-        self.highlighting_rules.append((QRegularExpression(r'"[^"\\]*(\\.[^"\\]*)*"'), self.string_format))
-
-        # Numbers
-        self.number_format = QTextCharFormat()
-        self.highlighting_rules.append((QRegularExpression(r'\b[0-9]+\.?[0-9]*\b'), self.number_format))
-
-        # Single-line comments
-        self.single_line_comment_format = QTextCharFormat()
-        self.highlighting_rules.append((QRegularExpression(r'//[^\n]*'), self.single_line_comment_format))
-
-        # Multi-line comments
-        self.multi_line_comment_format = QTextCharFormat()
-        self.comment_start_expression = QRegularExpression(r"/\*")
-        self.comment_end_expression = QRegularExpression(r"\*/")
-
-    def set_theme(self, theme):
-        self.keyword_format.setForeground(theme["keyword"])
-        self.literal_format.setForeground(theme["literal"])
-        self.string_format.setForeground(theme["string"])
-        self.number_format.setForeground(theme["number"])
-        self.single_line_comment_format.setForeground(theme["comment"])
-        self.multi_line_comment_format.setForeground(theme["comment"])
+
+        # Until a theme is set: bold keywords, everything else plain
+        keyword_format = QTextCharFormat()
+        keyword_format.setFontWeight(QFont.Weight.Bold)
+        self.formats = {
+            KEYWORD: keyword_format,
+            LITERAL: QTextCharFormat(),
+            STRING: QTextCharFormat(),
+            NUMBER: QTextCharFormat(),
+            COMMENT: QTextCharFormat(),
+            BLOCK_COMMENT: QTextCharFormat(),
+        }
+
+        # Theme changed while no view of the document was visible
+        self.stale = False
+
+        # --- Lazy highlighting ---
+        # Blocks before the frontier have been highlighted in order, so their
+        # states are exact. The cursor keeps the frontier in place across edits.
+        self.lazy = False
+        self.lazy_threshold = LAZY_HIGHLIGHT_BLOCKS
+        self.frontier = None
+        self.visible_blocks = (0, -1)
+        self.slice_budget_ms = LAZY_SLICE_BUDGET_MS
+        self.last_slice_ms = 0.0
+        self.chunk_blocks = 64
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setInterval(0)
+        self.idle_timer.timeout.connect(self._highlight_next_slice)
+
+        # --- Token cache ---
+        # Per-line entries (see token_cache.flatten) by block number while a
+        # TokenCache is in use; None for lines that need tokenizing.
+        self.token_cache = None
+        self.cache_text = None # The text line_tokens are to be stored for
+        self.cache_stale = False # Edited since cache_text was taken
+        self.line_tokens = None
+        self.cache_pending = False # Store once the lazy pass is done
+        # Edits must be tracked before Qt re-highlights the changed blocks, so
+        # connect ahead of the connection setDocument makes.
+        document = self.document()
+        if document is not None:
+            self.setDocument(None)
+            document.contentsChange.connect(self._track_edit)
+            self.setDocument(document)
+
+    def set_theme(self, theme, rehighlight=True):
+        """
+        Switches to the theme's (shared, precompiled) formats. Pass
+        rehighlight=False to leave existing text as is for now; it is then
+        marked stale. Calls from further views of the document are no-ops.
+        """
+        formats = char_formats(theme)
+        if formats is self.formats and not (rehighlight and self.stale):
+            return
+        self.formats = formats
+        if rehighlight:
+            self.refresh()
+        else:
+            self.stale = True
+
+    def refresh(self):
+        """Re-highlights the whole document, lazily if it is large."""
+        self.stale = False
+        if self.document() and self.document().blockCount() >= self.lazy_threshold:
+            self.begin_lazy()
         self.rehighlight()
 
+    def begin_lazy(self, block=None):
+        """
+        Switches to lazy highlighting until the whole document has been covered.
+        Call before a large change such as setPlainText or rehighlight. If a
+        block is given, everything before it is taken as already highlighted.
+        """
+        self.lazy = True
+        self.frontier = QTextCursor(self.document())
+        self.frontier.setKeepPositionOnInsert(True)
+        if block is not None:
+            self.frontier.setPosition(block.position())
+        self.idle_timer.start()
+
+    def set_visible_blocks(self, first, last):
+        """Highlights any not-yet-highlighted blocks in the viewport right away."""
+        self.visible_blocks = (first, last)
+        if not self.lazy:
+            return
+        block = self.document().findBlockByNumber(max(first, self.frontier.blockNumber()))
+        while block.isValid() and block.blockNumber() <= last:
+            if needs_highlight(block):
+                self.rehighlightBlock(block)
+            block = block.next()
+
+    def _highlight_next_slice(self):
+        """
+        Highlights the next chunk of blocks after the frontier. The chunk is
+        sized from the cost of previous slices so each one fits the budget.
+        """
+        start = time.perf_counter()
+        block = self.frontier.block()
+        end_number = block.blockNumber() + self.chunk_blocks
+        end_block = self.document().findBlockByNumber(end_number)
+        if end_block.isValid():
+            self.frontier.setPosition(end_block.position())
+        else:
+            self.frontier.movePosition(QTextCursor.MoveOperation.End)
+
+        # Each pending block changes state when highlighted, so Qt carries one
+        # rehighlightBlock call through the chunk until it reaches the frontier.
+        while block.isValid() and block.blockNumber() < end_number:
+            self.rehighlightBlock(block)
+            block = block.next()
+            while block.isValid() and block.blockNumber() < end_number and not needs_highlight(block):
+                block = block.next()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.last_slice_ms = elapsed_ms
+        # Rescale toward the budget, at most doubling or halving per slice.
+        scale = min(2.0, max(0.5, self.slice_budget_ms / max(elapsed_ms, 0.01)))
+        self.chunk_blocks = max(MIN_CHUNK_BLOCKS, int(self.chunk_blocks * scale))
+
+        if not end_block.isValid():
+            self.lazy = False
+            self.idle_timer.stop()
+            if self.cache_pending:
+                self.store_tokens()
+            self.highlighting_finished.emit()
+
+    # --- Token cache ---
+
+    def use_token_cache(self, cache, text):
+        """
+        Call right after text was set as the document's contents. Large
+        documents take their lines' tokens from the cache when it has them,
+        and store them there when the lazy pass is done (or on store_tokens).
+        """
+        document = self.document()
+        if document is None or document.blockCount() < TOKEN_CACHE_MIN_LINES:
+            return
+        self.token_cache = cache
+        self.cache_stale = False
+        entries = cache.load(cache_key(text))
+        if entries is not None and len(entries) == document.blockCount():
+            self.line_tokens = entries
+            self.cache_text = None
+            self.cache_pending = False
+        else:
+            self.line_tokens = [None] * document.blockCount()
+            self.cache_text = text
+            self.cache_pending = True
+
+    def store_tokens(self, text=None):
+        """
+        Stores every line's tokens, for text if given (the document's
+        contents as just saved). Waits for the lazy pass if one is running.
+        Only the entries are copied here; the cache keys them, and tokenizes
+        lines that have none, on its own thread.
+        """
+        if self.line_tokens is None:
+            return
+        if text is not None:
+            self.cache_text = text
+            self.cache_stale = False
+        if self.lazy:
+            self.cache_pending = True
+            return
+        self.cache_pending = False
+        if self.cache_stale or self.cache_text is None:
+            return # The tokens are no longer those of that text; the next save stores them
+        self.token_cache.store_text(self.cache_text, list(self.line_tokens))
+        self.cache_text = None
+
+    def _track_edit(self, position, removed, added):
+        """Keeps line_tokens in step with the blocks: edited lines lose their entries, later ones shift."""
+        document = self.document()
+        if self.line_tokens is None or document is None:
+            return
+        if removed or added:
+            self.cache_stale = True
+        blocks = document.blockCount()
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(position + added).blockNumber()
+        if last < first:
+            last = blocks - 1
+        old_last = last - (blocks - len(self.line_tokens))
+        self.line_tokens[first:old_last + 1] = [None] * (last - first + 1)
+
+    @timed("highlightBlock")
     def highlightBlock(self, text):
-        for pattern, format in self.highlighting_rules:
-            match_iterator = pattern.globalMatch(text)
-            while match_iterator.hasNext():
-                match = match_iterator.next()
-                self.setFormat(match.capturedStart(), match.capturedLength(), format)
-
-        # Multi-line comment highlighting
-        self.setCurrentBlockState(0)
-        start_index = 0
-        if self.previousBlockState() != 1:
-            start_index = self.comment_start_expression.match(text).capturedStart()
-
-        while start_index >= 0:
-            end_index = self.comment_end_expression.match(text, start_index).capturedStart()
-            comment_length = 0
-            if end_index == -1:
-                self.setCurrentBlockState(1)
-                comment_length = len(text) - start_index
-            else:
-                comment_length = end_index - start_index + 2
-
-            self.setFormat(start_index, comment_length, self.multi_line_comment_format)
-            start_index = self.comment_start_expression.match(text, start_index + comment_length).capturedStart()
\ No newline at end of file
+        if self.lazy:
+            number = self.currentBlock().blockNumber()
+            first, last = self.visible_blocks
+            if number > self.frontier.blockNumber() and not first <= number <= last:
+                # Not reached yet; the idle pass will come back for it.
+                if self.currentBlockState() < STATE_FOLDED:
+                    self.setCurrentBlockState(STATE_PENDING)
+                return
+        previous = self.previousBlockState()
+        if previous >= STATE_FOLDED:
+            previous -= STATE_FOLDED
+        if not self.currentBlock().isVisible():
+            # Folded away: only the state is needed until it is shown again
+            self.setCurrentBlockState(end_state(text, max(previous, STATE_NORMAL)) + STATE_FOLDED)
+            return
+        entries = self.line_tokens
+        if entries is not None:
+            number = self.currentBlock().blockNumber()
+            entry = entries[number] if number < len(entries) else None
+            # A pending previous state is a guess; the entry is exact
+            if entry is not None and (entry[0] == previous or previous == STATE_PENDING):
+                self.apply_tokens(text, unflatten(entry))
+                self.setCurrentBlockState(entry[1])
+                return
+        tokens, state = tokenize_line(text, previous)
+        if entries is not None and number < len(entries):
+            entries[number] = flatten(max(previous, STATE_NORMAL), tokens, state)
+        self.apply_tokens(text, tokens)
+        self.setCurrentBlockState(state)
+
+    def highlight_unfolded(self, first, last):
+        """
+        Highlights the blocks first to last (block numbers) whose formats were
+        skipped while folded; lazily, like a large document, if there are many.
+        """
+        block = self.document().findBlockByNumber(first)
+        if last - first + 1 >= self.lazy_threshold:
+            # Blocks on screen are highlighted as the view reports them (set_visible_blocks)
+            if not self.lazy or self.frontier.blockNumber() > first:
+                self.begin_lazy(block)
+            return
+        while block.isValid() and block.blockNumber() <= last:
+            if block.userState() >= STATE_FOLDED:
+                # Qt carries on through the following blocks while their states change
+                self.rehighlightBlock(block)
+            block = block.next()
+
+    def apply_tokens(self, text, tokens):
+        """Applies (start, length, kind) tokens to the current block."""
+        formats = self.formats
+        if not text.isascii():
+            tokens = _to_utf16(text, tokens)
+        for start, length, kind in tokens:
+            self.setFormat(start, length, formats[kind])
+
+
+def _to_utf16(text, tokens):
+    """
+    Converts code point offsets to the UTF-16 offsets Qt uses. Only characters
+    outside the BMP differ, so most non-ASCII lines come back unchanged.
+    """
+    if all(ord(ch) <= 0xFFFF for ch in text):
+        return tokens
+    offsets = [0]
+    for ch in text:
+        offsets.append(offsets[-1] + (2 if ord(ch) > 0xFFFF else 1))
+    return [(offsets[start], offsets[start + length] - offsets[start], kind) for start, length, kind in tokens]
@@ -1,182 +1,273 @@
-from PyQt6.QtGui import QColor
+from collections.abc import Mapping
 
-THEMES = {
+from PyQt6.QtGui import QColor, QPalette, QTextCharFormat, QFont
+from PyQt6.QtCore import Qt
+
+from .tokenizer import KEYWORD, LITERAL, STRING, NUMBER, COMMENT, BLOCK_COMMENT
+
+# Colours are hex strings or (r, g, b) tuples
+THEME_SPECS = {
     "Sn2 Dark": {
-        "base": QColor("#1e1e1e"), "text": QColor("#d4d4d4"),
-        "keyword": QColor("#c586c0"), "literal": QColor("#569cd6"),
-        "string": QColor("#ce9178"), "number": QColor("#b5cea8"),
-        "comment": QColor("#6a9955"),
-        "app_window": QColor(53, 53, 53), "app_base": QColor(25, 25, 25),
-        "app_highlight": QColor(42, 130, 218)
+        "base": "#1e1e1e", "text": "#d4d4d4",
+        "keyword": "#c586c0", "literal": "#569cd6",
+        "string": "#ce9178", "number": "#b5cea8",
+        "comment": "#6a9955",
+        "app_window": (53, 53, 53), "app_base": (25, 25, 25),
+        "app_highlight": (42, 130, 218)
     },
     "Mariana": {
-        "base": QColor("#263238"), "text": QColor("#EEFFFF"),
-        "keyword": QColor("#C792EA"), "literal": QColor("#82AAFF"),
-        "string": QColor("#C3E88D"), "number": QColor("#F78C6C"),
-        "comment": QColor("#546E7A"),
-        "app_window": QColor(38, 50, 56), "app_base": QColor(38, 50, 56),
-        "app_highlight": QColor(0, 122, 204)
+        "base": "#263238", "text": "#EEFFFF",
+        "keyword": "#C792EA", "literal": "#82AAFF",
+        "string": "#C3E88D", "number": "#F78C6C",
+        "comment": "#546E7A",
+        "app_window": (38, 50, 56), "app_base": (38, 50, 56),
+        "app_highlight": (0, 122, 204)
     },
     "Classic Light": {
-        "base": QColor("#ffffff"), "text": QColor("#000000"),
-        "keyword": QColor("#0000ff"), "literal": QColor("#00008b"),
-        "string": QColor("#a31515"), "number": QColor("#098658"),
-        "comment": QColor("#008000"),
-        "app_window": QColor(240, 240, 240), "app_base": QColor(255, 255, 255), "app_text": QColor("#000000"),
-        "app_highlight": QColor(0, 120, 215)
+        "base": "#ffffff", "text": "#000000",
+        "keyword": "#0000ff", "literal": "#00008b",
+        "string": "#a31515", "number": "#098658",
+        "comment": "#008000",
+        "app_window": (240, 240, 240), "app_base": (255, 255, 255), "app_text": "#000000",
+        "app_highlight": (0, 120, 215)
     },
     "Monokai": {
-        "base": QColor("#272822"), "text": QColor("#F8F8F2"),
-        "keyword": QColor("#F92672"), "literal": QColor("#66D9EF"),
-        "string": QColor("#E6DB74"), "number": QColor("#AE81FF"),
-        "comment": QColor("#75715E"),
-        "app_window": QColor(39, 40, 34), "app_base": QColor(39, 40, 34),
-        "app_highlight": QColor(253, 151, 31)
+        "base": "#272822", "text": "#F8F8F2",
+        "keyword": "#F92672", "literal": "#66D9EF",
+        "string": "#E6DB74", "number": "#AE81FF",
+        "comment": "#75715E",
+        "app_window": (39, 40, 34), "app_base": (39, 40, 34),
+        "app_highlight": (253, 151, 31)
     },
     "Solarized Dark": {
-        "base": QColor("#002b36"), "text": QColor("#839496"),
-        "keyword": QColor("#859900"), "literal": QColor("#268bd2"),
-        "string": QColor("#2aa198"), "number": QColor("#d33682"),
-        "comment": QColor("#586e75"),
-        "app_window": QColor(0, 43, 54), "app_base": QColor(7, 54, 66),
-        "app_highlight": QColor(38, 139, 210)
+        "base": "#002b36", "text": "#839496",
+        "keyword": "#859900", "literal": "#268bd2",
+        "string": "#2aa198", "number": "#d33682",
+        "comment": "#586e75",
+        "app_window": (0, 43, 54), "app_base": (7, 54, 66),
+        "app_highlight": (38, 139, 210)
     },
     "Solarized Light": {
-        "base": QColor("#fdf6e3"), "text": QColor("#657b83"),
-        "keyword": QColor("#859900"), "literal": QColor("#268bd2"),
-        "string": QColor("#2aa198"), "number": QColor("#d33682"),
-        "comment": QColor("#93a1a1"),
-        "app_window": QColor(238, 232, 213), "app_base": QColor(253, 246, 227), "app_text": QColor("#002b36"),
-        "app_highlight": QColor(38, 139, 210)
+        "base": "#fdf6e3", "text": "#657b83",
+        "keyword": "#859900", "literal": "#268bd2",
+        "string": "#2aa198", "number": "#d33682",
+        "comment": "#93a1a1",
+        "app_window": (238, 232, 213), "app_base": (253, 246, 227), "app_text": "#002b36",
+        "app_highlight": (38, 139, 210)
     },
     "Dracula": {
-        "base": QColor("#282a36"), "text": QColor("#f8f8f2"),
-        "keyword": QColor("#ff79c6"), "literal": QColor("#bd93f9"),
-        "string": QColor("#f1fa8c"), "number": QColor("#bd93f9"),
-        "comment": QColor("#6272a4"),
-        "app_window": QColor(40, 42, 54), "app_base": QColor(40, 42, 54),
-        "app_highlight": QColor(98, 114, 164)
+        "base": "#282a36", "text": "#f8f8f2",
+        "keyword": "#ff79c6", "literal": "#bd93f9",
+        "string": "#f1fa8c", "number": "#bd93f9",
+        "comment": "#6272a4",
+        "app_window": (40, 42, 54), "app_base": (40, 42, 54),
+        "app_highlight": (98, 114, 164)
     },
     "Nord": {
-        "base": QColor("#2E3440"), "text": QColor("#D8DEE9"),
-        "keyword": QColor("#81A1C1"), "literal": QColor("#81A1C1"),
-        "string": QColor("#A3BE8C"), "number": QColor("#B48EAD"),
-        "comment": QColor("#4C566A"),
-        "app_window": QColor(46, 52, 64), "app_base": QColor(46, 52, 64),
-        "app_highlight": QColor(129, 161, 193)
+        "base": "#2E3440", "text": "#D8DEE9",
+        "keyword": "#81A1C1", "literal": "#81A1C1",
+        "string": "#A3BE8C", "number": "#B48EAD",
+        "comment": "#4C566A",
+        "app_window": (46, 52, 64), "app_base": (46, 52, 64),
+        "app_highlight": (129, 161, 193)
     },
     "Gruvbox Dark": {
-        "base": QColor("#282828"), "text": QColor("#ebdbb2"),
-        "keyword": QColor("#fe8019"), "literal": QColor("#83a598"),
-        "string": QColor("#b8bb26"), "number": QColor("#d3869b"),
-        "comment": QColor("#928374"),
-        "app_window": QColor(40, 40, 40), "app_base": QColor(50, 48, 47),
-        "app_highlight": QColor(254, 128, 25)
+        "base": "#282828", "text": "#ebdbb2",
+        "keyword": "#fe8019", "literal": "#83a598",
+        "string": "#b8bb26", "number": "#d3869b",
+        "comment": "#928374",
+        "app_window": (40, 40, 40), "app_base": (50, 48, 47),
+        "app_highlight": (254, 128, 25)
     },
     "Gruvbox Light": {
-        "base": QColor("#fbf1c7"), "text": QColor("#3c3836"),
-        "keyword": QColor("#9d0006"), "literal": QColor("#427b58"),
-        "string": QColor("#79740e"), "number": QColor("#8f3f71"),
-        "comment": QColor("#928374"),
-        "app_window": QColor(249, 245, 215), "app_base": QColor(251, 241, 199), "app_text": QColor("#605c5a"),
-        "app_highlight": QColor(204, 36, 29)
+        "base": "#fbf1c7", "text": "#3c3836",
+        "keyword": "#9d0006", "literal": "#427b58",
+        "string": "#79740e", "number": "#8f3f71",
+        "comment": "#928374",
+        "app_window": (249, 245, 215), "app_base": (251, 241, 199), "app_text": "#605c5a",
+        "app_highlight": (204, 36, 29)
     },
     "One Dark Pro": {
-        "base": QColor("#282c34"), "text": QColor("#abb2bf"),
-        "keyword": QColor("#C678DD"), "literal": QColor("#56B6C2"),
-        "string": QColor("#98C379"), "number": QColor("#D19A66"),
-        "comment": QColor("#5c6370"),
-        "app_window": QColor(33, 37, 43), "app_base": QColor(40, 44, 52),
-        "app_highlight": QColor(97, 175, 239)
+        "base": "#282c34", "text": "#abb2bf",
+        "keyword": "#C678DD", "literal": "#56B6C2",
+        "string": "#98C379", "number": "#D19A66",
+        "comment": "#5c6370",
+        "app_window": (33, 37, 43), "app_base": (40, 44, 52),
+        "app_highlight": (97, 175, 239)
     },
     "Cobalt": {
-        "base": QColor("#002240"), "text": QColor("#FFFFFF"),
-        "keyword": QColor("#FF9D00"), "literal": QColor("#FF628C"),
-        "string": QColor("#3AD900"), "number": QColor("#FF628C"),
-        "comment": QColor("#0088FF"),
-        "app_window": QColor(0, 34, 64), "app_base": QColor(0, 34, 64),
-        "app_highlight": QColor(255, 157, 0)
+        "base": "#002240", "text": "#FFFFFF",
+        "keyword": "#FF9D00", "literal": "#FF628C",
+        "string": "#3AD900", "number": "#FF628C",
+        "comment": "#0088FF",
+        "app_window": (0, 34, 64), "app_base": (0, 34, 64),
+        "app_highlight": (255, 157, 0)
     },
     "Tomorrow Night": {
-        "base": QColor("#1d1f21"), "text": QColor("#c5c8c6"),
-        "keyword": QColor("#b294bb"), "literal": QColor("#81a2be"),
-        "string": QColor("#b5bd68"), "number": QColor("#de935f"),
-        "comment": QColor("#969896"),
-        "app_window": QColor(29, 31, 33), "app_base": QColor(29, 31, 33),
-        "app_highlight": QColor(129, 162, 190)
+        "base": "#1d1f21", "text": "#c5c8c6",
+        "keyword": "#b294bb", "literal": "#81a2be",
+        "string": "#b5bd68", "number": "#de935f",
+        "comment": "#969896",
+        "app_window": (29, 31, 33), "app_base": (29, 31, 33),
+        "app_highlight": (129, 162, 190)
     },
     "Tomorrow": {
-        "base": QColor("#ffffff"), "text": QColor("#4d4d4c"),
-        "keyword": QColor("#8e908c"), "literal": QColor("#3e999f"),
-        "string": QColor("#718c00"), "number": QColor("#f5871f"),
-        "comment": QColor("#8e908c"),
-        "app_window": QColor(240, 240, 240), "app_base": QColor(255, 255, 255), "app_text": QColor("#4d4d4c"),
-        "app_highlight": QColor(62, 153, 159)
+        "base": "#ffffff", "text": "#4d4d4c",
+        "keyword": "#8e908c", "literal": "#3e999f",
+        "string": "#718c00", "number": "#f5871f",
+        "comment": "#8e908c",
+        "app_window": (240, 240, 240), "app_base": (255, 255, 255), "app_text": "#4d4d4c",
+        "app_highlight": (62, 153, 159)
     },
     "GitHub Dark": {
-        "base": QColor("#0d1117"), "text": QColor("#c9d1d9"),
-        "keyword": QColor("#ff7b72"), "literal": QColor("#79c0ff"),
-        "string": QColor("#a5d6ff"), "number": QColor("#79c0ff"),
-        "comment": QColor("#8b949e"),
-        "app_window": QColor(13, 17, 23), "app_base": QColor(1, 4, 9),
-        "app_highlight": QColor(35, 134, 255)
+        "base": "#0d1117", "text": "#c9d1d9",
+        "keyword": "#ff7b72", "literal": "#79c0ff",
+        "string": "#a5d6ff", "number": "#79c0ff",
+        "comment": "#8b949e",
+        "app_window": (13, 17, 23), "app_base": (1, 4, 9),
+        "app_highlight": (35, 134, 255)
     },
     "GitHub Light": {
-        "base": QColor("#ffffff"), "text": QColor("#24292e"),
-        "keyword": QColor("#d73a49"), "literal": QColor("#005cc5"),
-        "string": QColor("#032f62"), "number": QColor("#005cc5"),
-        "comment": QColor("#6a737d"),
-        "app_window": QColor(246, 248, 250), "app_base": QColor(255, 255, 255), "app_text": QColor("#24292e"),
-        "app_highlight": QColor(3, 102, 214)
+        "base": "#ffffff", "text": "#24292e",
+        "keyword": "#d73a49", "literal": "#005cc5",
+        "string": "#032f62", "number": "#005cc5",
+        "comment": "#6a737d",
+        "app_window": (246, 248, 250), "app_base": (255, 255, 255), "app_text": "#24292e",
+        "app_highlight": (3, 102, 214)
     },
     "Material Darker": {
-        "base": QColor("#212121"), "text": QColor("#EEFFFF"),
-        "keyword": QColor("#C792EA"), "literal": QColor("#82AAFF"),
-        "string": QColor("#C3E88D"), "number": QColor("#F78C6C"),
-        "comment": QColor("#546E7A"),
-        "app_window": QColor(33, 33, 33), "app_base": QColor(33, 33, 33),
-        "app_highlight": QColor(130, 170, 255)
+        "base": "#212121", "text": "#EEFFFF",
+        "keyword": "#C792EA", "literal": "#82AAFF",
+        "string": "#C3E88D", "number": "#F78C6C",
+        "comment": "#546E7A",
+        "app_window": (33, 33, 33), "app_base": (33, 33, 33),
+        "app_highlight": (130, 170, 255)
     },
     "Material Lighter": {
-        "base": QColor("#FAFAFA"), "text": QColor("#808080"),
-        "keyword": QColor("#39ADB5"), "literal": QColor("#39ADB5"),
-        "string": QColor("#91B859"), "number": QColor("#F76D47"),
-        "comment": QColor("#90A4AE"),
-        "app_window": QColor(250, 250, 250), "app_base": QColor(250, 250, 250), "app_text": QColor("#808080"),
-        "app_highlight": QColor(57, 173, 181)
+        "base": "#FAFAFA", "text": "#808080",
+        "keyword": "#39ADB5", "literal": "#39ADB5",
+        "string": "#91B859", "number": "#F76D47",
+        "comment": "#90A4AE",
+        "app_window": (250, 250, 250), "app_base": (250, 250, 250), "app_text": "#808080",
+        "app_highlight": (57, 173, 181)
     },
     "Ayu Dark": {
-        "base": QColor("#0A0E14"), "text": QColor("#B3B1AD"),
-        "keyword": QColor("#FF7733"), "literal": QColor("#36A3D9"),
-        "string": QColor("#C2D94C"), "number": QColor("#F29E74"),
-        "comment": QColor("#5C6773"),
-        "app_window": QColor(10, 14, 20), "app_base": QColor(10, 14, 20),
-        "app_highlight": QColor(255, 119, 51)
+        "base": "#0A0E14", "text": "#B3B1AD",
+        "keyword": "#FF7733", "literal": "#36A3D9",
+        "string": "#C2D94C", "number": "#F29E74",
+        "comment": "#5C6773",
+        "app_window": (10, 14, 20), "app_base": (10, 14, 20),
+        "app_highlight": (255, 119, 51)
     },
     "Ayu Light": {
-        "base": QColor("#FAFAFA"), "text": QColor("#5C6773"),
-        "keyword": QColor("#FA8D3E"), "literal": QColor("#36A3D9"),
-        "string": QColor("#86B300"), "number": QColor("#F29E74"),
-        "comment": QColor("#ABB0B6"),
-        "app_window": QColor(250, 250, 250), "app_base": QColor(250, 250, 250), "app_text": QColor("#5C6773"),
-        "app_highlight": QColor(250, 141, 62)
+        "base": "#FAFAFA", "text": "#5C6773",
+        "keyword": "#FA8D3E", "literal": "#36A3D9",
+        "string": "#86B300", "number": "#F29E74",
+        "comment": "#ABB0B6",
+        "app_window": (250, 250, 250), "app_base": (250, 250, 250), "app_text": "#5C6773",
+        "app_highlight": (250, 141, 62)
     },
     "Oceanic Next": {
-        "base": QColor("#1B2B34"), "text": QColor("#CDD3DE"),
-        "keyword": QColor("#C594C5"), "literal": QColor("#6699CC"),
-        "string": QColor("#99C794"), "number": QColor("#F99157"),
-        "comment": QColor("#65737E"),
-        "app_window": QColor(27, 43, 52), "app_base": QColor(27, 43, 52),
-        "app_highlight": QColor(102, 153, 204)
+        "base": "#1B2B34", "text": "#CDD3DE",
+        "keyword": "#C594C5", "literal": "#6699CC",
+        "string": "#99C794", "number": "#F99157",
+        "comment": "#65737E",
+        "app_window": (27, 43, 52), "app_base": (27, 43, 52),
+        "app_highlight": (102, 153, 204)
     },
     "Zenburn": {
-        "base": QColor("#3f3f3f"), "text": QColor("#dcdccc"),
-        "keyword": QColor("#f0dfaf"), "literal": QColor("#efef8f"),
-        "string": QColor("#cc9393"), "number": QColor("#8cd0d3"),
-        "comment": QColor("#7f9f7f"),
-        "app_window": QColor(63, 63, 63), "app_base": QColor(63, 63, 63),
-        "app_highlight": QColor(240, 223, 175)
+        "base": "#3f3f3f", "text": "#dcdccc",
+        "keyword": "#f0dfaf", "literal": "#efef8f",
+        "string": "#cc9393", "number": "#8cd0d3",
+        "comment": "#7f9f7f",
+        "app_window": (63, 63, 63), "app_base": (63, 63, 63),
+        "app_highlight": (240, 223, 175)
     }
 }
 
-DEFAULT_THEME = "Sn2 Dark"
\ No newline at end of file
+DEFAULT_THEME = "Sn2 Dark"
+
+
+class ThemeTable(Mapping):
+    """
+    Theme name -> dict of QColors. A theme's colours are built the first
+    time it is looked up, so importing this module creates none of them.
+    """
+    def __init__(self, specs):
+        self.specs = specs
+        self.built = {}
+
+    def __getitem__(self, name):
+        theme = self.built.get(name)
+        if theme is None:
+            theme = {
+                role: QColor(*value) if isinstance(value, tuple) else QColor(value)
+                for role, value in self.specs[name].items()
+            }
+            self.built[name] = theme
+        return theme
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __len__(self):
+        return len(self.specs)
+
+
+THEMES = ThemeTable(THEME_SPECS)
+
+
+# --- Compiled themes ---
+# Palettes and char formats are built the first time a theme is used and
+# shared from then on, so switching themes doesn't rebuild them per call or per tab.
+_palettes = {}
+_char_formats = {}
+
+def app_palette(name):
+    """Returns the application-wide QPalette for the named theme."""
+    palette = _palettes.get(name)
+    if palette is None:
+        theme = THEMES[name]
+        palette = QPalette()
+        text_color = theme.get("app_text", theme["text"])
+        palette.setColor(QPalette.ColorRole.Window, theme["app_window"])
+        palette.setColor(QPalette.ColorRole.WindowText, text_color)
+        palette.setColor(QPalette.ColorRole.Base, theme["app_base"])
+        palette.setColor(QPalette.ColorRole.AlternateBase, theme["app_window"])
+        palette.setColor(QPalette.ColorRole.ToolTipBase, text_color)
+        palette.setColor(QPalette.ColorRole.ToolTipText, theme["app_window"])
+        palette.setColor(QPalette.ColorRole.Text, text_color)
+        palette.setColor(QPalette.ColorRole.Button, theme["app_window"])
+        palette.setColor(QPalette.ColorRole.ButtonText, text_color)
+        palette.setColor(QPalette.ColorRole.BrightText, Qt.GlobalColor.red)
+        palette.setColor(QPalette.ColorRole.Link, theme["app_highlight"])
+        palette.setColor(QPalette.ColorRole.Highlight, theme["app_highlight"])
+        palette.setColor(QPalette.ColorRole.HighlightedText, theme.get("app_highlighted_text", Qt.GlobalColor.white))
+        _palettes[name] = palette
+    return palette
+
+def char_formats(theme):
+    """
+    Returns the highlighter formats for a theme dict, keyed by token kind.
+    """
+    cached = _char_formats.get(id(theme))
+    if cached is not None and cached[0] is theme:
+        return cached[1]
+
+    def make(color_key, bold=False):
+        fmt = QTextCharFormat()
+        fmt.setForeground(theme[color_key])
+        if bold:
+            fmt.setFontWeight(QFont.Weight.Bold)
+        return fmt
+
+    formats = {
+        KEYWORD: make("keyword", bold=True),
+        LITERAL: make("literal"),
+        STRING: make("string"),
+        NUMBER: make("number"),
+        COMMENT: make("comment"),
+        BLOCK_COMMENT: make("comment"),
+    }
+    _char_formats[id(theme)] = (theme, formats)
+    return formats
@@ -0,0 +1,152 @@
+import hashlib
+import marshal
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QStandardPaths
+
+from .tokenizer import (
+    tokenize_line, STATE_NORMAL,
+    TOKENIZER_VERSION, KEYWORD, LITERAL, STRING, NUMBER, COMMENT, BLOCK_COMMENT
+)
+
+# Documents with fewer lines than this are quick to tokenize and aren't cached.
+TOKEN_CACHE_MIN_LINES = 2000
+# The cache is trimmed to this size, least recently used files first.
+TOKEN_CACHE_BYTES = 64 * 1024 * 1024
+# Files not used for this long are dropped whatever the size.
+TOKEN_CACHE_MAX_AGE_S = 30 * 24 * 3600
+
+# Bump when the file layout below changes.
+FORMAT_VERSION = 1
+_HEADER = b"SN2T" + bytes([FORMAT_VERSION, marshal.version])
+
+# Token kinds are stored as their index here
+KINDS = (KEYWORD, LITERAL, STRING, NUMBER, COMMENT, BLOCK_COMMENT)
+_KIND_INDEX = {kind: i for i, kind in enumerate(KINDS)}
+
+
+def default_cache_dir():
+    location = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation)
+    return os.path.join(location, "Sn2Editor", "tokens")
+
+
+def cache_key(text):
+    """The cache key of a document's text; it changes with the tokenizer version too."""
+    digest = hashlib.sha1(f"{TOKENIZER_VERSION}\n".encode('utf-8'))
+    digest.update(text.encode('utf-8', errors='surrogatepass'))
+    return digest.hexdigest()
+
+
+def flatten(state, tokens, end_state):
+    """
+    One line's entry: (state before, state after, start, length, kind, ...),
+    a flat tuple of small ints, which marshal loads back quickly.
+    """
+    return (state, end_state, *[value for start, length, kind in tokens for value in (start, length, _KIND_INDEX[kind])])
+
+
+def unflatten(entry):
+    """The (start, length, kind) tokens of a line entry."""
+    return zip(entry[2::3], entry[3::3], [KINDS[kind] for kind in entry[4::3]])
+
+
+def complete_entries(entries, lines):
+    """
+    Tokenizes the lines whose entry is missing, or stale because the state
+    before the line has changed, and returns the entries.
+    """
+    state = STATE_NORMAL
+    for number, entry in enumerate(entries):
+        if entry is None or entry[0] != state:
+            tokens, state_after = tokenize_line(lines[number], state)
+            entry = entries[number] = flatten(state, tokens, state_after)
+        state = entry[1]
+    return entries
+
+
+class TokenCache:
+    """
+    Per-line tokens and block states of large documents, in one compressed
+    file per document text. Reopening an unchanged file then skips the
+    tokenizer. Files are written on a background thread.
+    """
+    def __init__(self, directory=None, max_bytes=TOKEN_CACHE_BYTES, max_age=TOKEN_CACHE_MAX_AGE_S):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.last_write = None
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.tokens")
+
+    def load(self, key):
+        """Returns the line entries stored for key, or None."""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if not data.startswith(_HEADER):
+                return None
+            entries = marshal.loads(zlib.decompress(data[len(_HEADER):]))
+            os.utime(path) # Recently used; keep it over older files
+            return entries
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):
+            return None
+
+    def store(self, key, entries):
+        """Writes entries for key in the background."""
+        self.last_write = self.executor.submit(self.write, key, entries)
+
+    def store_text(self, text, entries):
+        """
+        Writes the entries of a document whose contents are text, which may
+        have gaps (None). Keying and filling them in is done in the background too.
+        """
+        self.last_write = self.executor.submit(self.write_text, text, entries)
+
+    def wait(self):
+        """Blocks until the last store has been written."""
+        if self.last_write:
+            self.last_write.result()
+
+    def write_text(self, text, entries):
+        lines = text.split("\n")
+        if len(lines) != len(entries):
+            return # Not the text the entries were taken from
+        self.write(cache_key(text), complete_entries(entries, lines))
+
+    def write(self, key, entries):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            data = _HEADER + zlib.compress(marshal.dumps(entries), 1)
+            tmp_path = self.path(key) + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(key))
+            self.prune()
+        except (OSError, ValueError) as e:
+            print(f"Writing the token cache failed: {e}")
+
+    def prune(self):
+        """Drops files older than max_age, then the least recently used until under max_bytes."""
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".tokens"):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        files.sort(reverse=True)
+        oldest = time.time() - self.max_age
+        total = 0
+        for mtime, size, path in files:
+            if mtime >= oldest and total + size <= self.max_bytes:
+                total += size
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,101 @@
+import re
+
+KEYWORDS = [
+    "let", "show", "if", "else", "loop", "in", "while", "func", "class",
+    "try", "catch", "return", "this", "super", "import", "as", "match", "case"
+]
+LITERALS = ["true", "false", "null"]
+BUILTINS = ["input", "len", "iter", "next", "toInt", "toFloat", "toString"]
+
+# Token kinds produced by tokenize_line
+KEYWORD = "keyword"
+LITERAL = "literal"
+STRING = "string"
+NUMBER = "number"
+COMMENT = "comment"
+BLOCK_COMMENT = "block_comment"
+
+# Block states, as stored with QSyntaxHighlighter.setCurrentBlockState
+STATE_NORMAL = 0
+STATE_IN_COMMENT = 1
+
+# Bump whenever the output of tokenize_line changes, so cached tokens are invalidated.
+TOKENIZER_VERSION = 1
+
+_KEYWORD_SET = frozenset(KEYWORDS)
+_LITERAL_SET = frozenset(LITERALS)
+
+# One alternation for the whole line. Order matters: comments and strings are
+# tried first so that keywords and numbers inside them are never reported, and
+# numbers come before words so "1." is still a number.
+_TOKEN_RE = re.compile(r'''
+      (?P<comment>//.*)
+    | (?P<block>/\*)
+    | (?P<string>"[^"\\]*(?:\\.[^"\\]*)*")
+    | (?P<number>\b[0-9]+\.?[0-9]*\b)
+    | (?P<word>\w+)
+''', re.VERBOSE)
+
+
+def tokenize_line(text, state=STATE_NORMAL):
+    """
+    Tokenizes a single line of Sn2 in one pass.
+
+    `state` is the block state at the end of the previous line. Returns a list
+    of (start, length, kind) tuples and the block state at the end of this line.
+    """
+    tokens = []
+    pos = 0
+    length = len(text)
+
+    if state == STATE_IN_COMMENT:
+        end = text.find("*/")
+        if end == -1:
+            if length:
+                tokens.append((0, length, BLOCK_COMMENT))
+            return tokens, STATE_IN_COMMENT
+        pos = end + 2
+        tokens.append((0, pos, BLOCK_COMMENT))
+
+    search = _TOKEN_RE.search
+    while True:
+        match = search(text, pos)
+        if match is None:
+            break
+        kind = match.lastgroup
+        start, pos = match.span()
+        if kind == "word":
+            word = match.group()
+            if word in _KEYWORD_SET:
+                tokens.append((start, pos - start, KEYWORD))
+            elif word in _LITERAL_SET:
+                tokens.append((start, pos - start, LITERAL))
+        elif kind == "block":
+            end = text.find("*/", pos)
+            if end == -1:
+                tokens.append((start, length - start, BLOCK_COMMENT))
+                return tokens, STATE_IN_COMMENT
+            pos = end + 2
+            tokens.append((start, pos - start, BLOCK_COMMENT))
+        else:
+            tokens.append((start, pos - start, kind))
+
+    return tokens, STATE_NORMAL
+
+
+def mask_code(text, tokens):
+    """
+    Blanks out the strings and comments among a line's tokens, keeping the
+    columns of what is left, so brackets and words in them aren't seen.
+    """
+    masked = [(start, length) for start, length, kind in tokens if kind in (STRING, COMMENT, BLOCK_COMMENT)]
+    if not masked:
+        return text
+    parts = []
+    pos = 0
+    for start, length in masked:
+        parts.append(text[pos:start])
+        parts.append(" " * length)
+        pos = start + length
+    parts.append(text[pos:])
+    return "".join(parts)
@@ -1,30 +1,84 @@
-import urllib.request
+import time
+
 from PyQt6.QtCore import QObject, pyqtSignal
 
 from .version import __version__
 
 VERSION_URL = "https://raw.githubusercontent.com/sn-2-0/sn2/main/editor_version.txt"
+DEFAULT_DOWNLOAD_URL = "https://github.com/sn-2-0/sn2"
+# A successful check is good for this long; launches in between make no request.
+UPDATE_CHECK_INTERVAL_S = 24 * 3600
+# After a failed check (e.g. offline), wait this long before trying again.
+UPDATE_RETRY_INTERVAL_S = 3600
+# Seconds to wait for the server.
+UPDATE_TIMEOUT_S = 5
+
+
+def is_newer(latest_version, current_version=__version__):
+    """Simple version comparison of dotted numbers, e.g. "1.10.0" > "1.9.2"."""
+    try:
+        return [int(p) for p in latest_version.split('.')] > [int(p) for p in current_version.split('.')]
+    except ValueError:
+        return False
+
+
+def update_check_due(cache, now=None):
+    """
+    Whether a request is due, given the cache of the last check (see
+    UpdateWorker.checked): not within the check interval of the last
+    success, nor within the retry interval of the last attempt.
+    """
+    now = time.time() if now is None else now
+    return (now - cache.get("last_checked", 0) >= UPDATE_CHECK_INTERVAL_S
+            and now - cache.get("last_attempt", 0) >= UPDATE_RETRY_INTERVAL_S)
+
 
 class UpdateWorker(QObject):
-    """A worker to check for updates in a separate thread."""
+    """
+    A worker to check for updates in a separate thread. The request is
+    conditional on the ETag / Last-Modified of the last check, so an
+    unchanged version file costs a 304 and no download.
+    """
     update_found = pyqtSignal(str, str) # Signal to emit when an update is found (new_version, download_url)
+    checked = pyqtSignal(dict) # The cache to keep for the next check
     finished = pyqtSignal() # Signal to emit when the worker is done
 
+    def __init__(self, cache=None, url=None):
+        super().__init__()
+        self.cache = dict(cache or {}) # etag, last_modified, latest_version, download_url, last_checked, last_attempt
+        self.url = url or VERSION_URL
+
     def run(self):
+        # Imported here, in the worker thread, to keep it off the startup path
+        import urllib.error
+        import urllib.request
+        cache = self.cache
+        cache["last_attempt"] = time.time()
         try:
-            with urllib.request.urlopen(VERSION_URL, timeout=5) as response:
-                data = response.read().decode('utf-8').strip().splitlines()
-                latest_version = data[0]
-                # The second line of the version file can be the download URL
-                download_url = data[1] if len(data) > 1 else "https://github.com/sn-2-0/sn2"
-
-            # Simple version comparison
-            local_parts = [int(p) for p in __version__.split('.')]
-            latest_parts = [int(p) for p in latest_version.split('.')]
-
-            if latest_parts > local_parts:
-                self.update_found.emit(latest_version, download_url)
+            request = urllib.request.Request(self.url)
+            # Only conditional if the body it would validate was kept too
+            if cache.get("latest_version"):
+                if cache.get("etag"):
+                    request.add_header("If-None-Match", cache["etag"])
+                if cache.get("last_modified"):
+                    request.add_header("If-Modified-Since", cache["last_modified"])
+            try:
+                with urllib.request.urlopen(request, timeout=UPDATE_TIMEOUT_S) as response:
+                    data = response.read().decode('utf-8').strip().splitlines()
+                    cache["latest_version"] = data[0].strip()
+                    # The second line of the version file can be the download URL
+                    cache["download_url"] = data[1].strip() if len(data) > 1 else DEFAULT_DOWNLOAD_URL
+                    cache["etag"] = response.headers.get("ETag", "")
+                    cache["last_modified"] = response.headers.get("Last-Modified", "")
+            except urllib.error.HTTPError as e:
+                if e.code != 304: # Not Modified: the cached version still stands
+                    raise
+            cache["last_checked"] = cache["last_attempt"]
+
+            if is_newer(cache["latest_version"]):
+                self.update_found.emit(cache["latest_version"], cache.get("download_url") or DEFAULT_DOWNLOAD_URL)
         except Exception as e:
             print(f"Update check failed: {e}")
         finally:
-            self.finished.emit() # Always emit finished signal
\ No newline at end of file
+            self.checked.emit(cache)
+            self.finished.emit() # Always emit finished signal
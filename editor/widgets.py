@@ -1,16 +1,71 @@
-from PyQt6.QtWidgets import QTextEdit, QCompleter
-from PyQt6.QtGui import QFont, QTextCursor
-from PyQt6.QtCore import Qt, QStringListModel
+import codecs
+import os
 
-from .syntax_highlighter import Sn2SyntaxHighlighter
+from PyQt6.QtWidgets import (
+    QPlainTextEdit, QCompleter, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QCheckBox, QSpinBox, QTableWidget, QTableWidgetItem, QHeaderView, QDialog, QLineEdit,
+    QListWidget, QTreeWidget, QTreeWidgetItem, QTextEdit, QToolTip, QStyle
+)
+from PyQt6.QtGui import QFont, QFontMetricsF, QTextCursor, QTextCharFormat, QColor, QPainter, QPolygonF
+from PyQt6.QtCore import Qt, QEvent, QPoint, QPointF, QSize, QStringListModel, QTimer, pyqtSignal
 
-class CodeEditor(QTextEdit):
+from .diagnostics import ERROR
+from .documents import Document
+from .instrumentation import timed
+from .structure import opens_region, OPENERS, CLOSERS
+from .tokenizer import KEYWORDS, LITERALS, BUILTINS
+
+# Lines of output the terminal keeps; older lines are dropped from the top.
+SCROLLBACK_LINES = 10000
+# How often buffered process output is drawn, in milliseconds (about one frame).
+OUTPUT_FLUSH_MS = 16
+# Language words always offered by the completer, next to the document's own names.
+COMPLETION_WORDS = KEYWORDS + LITERALS + BUILTINS
+# Matches listed by the quick-open palette.
+QUICK_OPEN_RESULTS = 50
+# Pause in typing before find in files searches again, in milliseconds.
+FIND_DELAY_MS = 300
+# Pause in typing before the outline is refreshed, in milliseconds.
+OUTLINE_DELAY_MS = 300
+# Squiggle colors by diagnostic severity; anything not an error is a warning.
+ERROR_COLOR = QColor("#e51400")
+WARNING_COLOR = QColor("#bf8803")
+# Columns per indent level; indent guides are drawn at multiples of it.
+INDENT_WIDTH = 4
+
+def utf16_length(text, end):
+    """The length in UTF-16 code units of text[:end]."""
+    prefix = text[:end]
+    return len(prefix) + sum(1 for char in prefix if ord(char) > 0xFFFF)
+
+
+def code_point_index(text, offset):
+    """The index in text of the character at a UTF-16 offset."""
+    if text.isascii():
+        return offset
+    index = 0
+    for char in text:
+        if offset <= 0:
+            break
+        offset -= 2 if ord(char) > 0xFFFF else 1
+        index += 1
+    return index
+
+
+class CodeEditor(QPlainTextEdit):
     """
-    Custom QTextEdit with syntax highlighting and code completion.
+    Custom QPlainTextEdit with syntax highlighting and code completion.
+
+    QPlainTextEdit lays text out block by block, so scrolling and editing
+    stay cheap in large documents where QTextEdit's rich-text layout does not.
     """
-    def __init__(self, parent=None):
+    def __init__(self, document=None, parent=None):
         super().__init__(parent)
-        self.highlighter = Sn2SyntaxHighlighter(self.document())
+        # The text, highlighter and symbol index are shared with other views of the document
+        self.doc = document or Document()
+        self.doc.views.append(self)
+        self.setDocument(self.doc.text)
+        self.highlighter = self.doc.highlighter
 
         # Basic styling
         font = QFont("Courier New", 11)
@@ -22,27 +77,420 @@ class CodeEditor(QTextEdit):
         self.completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
         self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
         
-        keywords = [
-            "let", "show", "if", "else", "loop", "in", "while", "func", "class",
-            "try", "catch", "return", "this", "super", "import", "as", "match", "case",
-            "true", "false", "null", "input", "len", "iter", "next", "toInt", "toFloat", "toString"
-        ]
-        model = QStringListModel(keywords, self.completer)
-        self.completer.setModel(model)
+        # The model holds the ranked candidates for the word being typed
+        self.symbols = self.doc.symbols
+        self.project_index = None # Set by MainWindow for cross-file completion
+        self.completion_model = QStringListModel(COMPLETION_WORDS, self.completer)
+        self.completer.setModel(self.completion_model)
         self.completer.activated.connect(self.insert_completion)
 
+        # Keep the highlighter told which blocks are on screen
+        self.loading = False
+        self.verticalScrollBar().valueChanged.connect(self.update_visible_blocks)
+
+        # Squiggles under the document's diagnostics
+        self.diagnostics = []
+        self.diagnostic_selections = []
+
+        # Fold markers, in a strip left of the text
+        self.structure = self.doc.structure
+        self.fold_area = FoldArea(self)
+        self.setViewportMargins(self.fold_area_width(), 0, 0, 0)
+        # Straight to the C++ slot: updateRequest comes once per re-highlighted block
+        self.updateRequest.connect(self.fold_area.update)
+        self.cursorPositionChanged.connect(self.reveal_cursor)
+
+        # The bracket at the cursor and its partner, looked up in the structure index
+        self.bracket_selections = []
+        self.cursorPositionChanged.connect(self.match_brackets)
+
+    def setPlainText(self, text):
+        """
+        Replaces the text, highlighting large documents lazily so the first
+        screen is ready without waiting for the whole file.
+        """
+        if text.count("\n") + 1 < self.highlighter.lazy_threshold:
+            super().setPlainText(text)
+            return
+
+        self.highlighter.begin_lazy()
+        line_height = self.fontMetrics().lineSpacing()
+        self.highlighter.visible_blocks = (0, self.viewport().height() // line_height + 1)
+        # The layout is in flux until the text is in; don't report the viewport yet.
+        self.loading = True
+        super().setPlainText(text)
+        self.loading = False
+
+    def append_text(self, text):
+        """
+        Appends text at the end of the document without moving the cursor or
+        the view. New blocks are highlighted lazily.
+        """
+        document = self.document()
+        if self.highlighter.document() and not self.highlighter.lazy:
+            self.highlighter.begin_lazy(document.lastBlock())
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+
+    def update_visible_blocks(self):
+        if self.loading:
+            return
+        first = self.firstVisibleBlock().blockNumber()
+        # One hit test, in C++, rather than walking the blocks on screen on every scroll
+        last = self.cursorForPosition(QPoint(0, self.viewport().height())).blockNumber()
+        self.highlighter.set_visible_blocks(first, max(first, last))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        rect = self.contentsRect()
+        self.fold_area.setGeometry(rect.left(), rect.top(), self.fold_area_width(), rect.height())
+        self.update_visible_blocks()
+
     def set_theme(self, theme):
+        """
+        Applies a theme. Re-highlighting is deferred until the document is next
+        shown if no view of it is visible (e.g. background tabs) and it has text.
+        """
         palette = self.palette()
         palette.setColor(palette.ColorRole.Base, theme["base"])
         palette.setColor(palette.ColorRole.Text, theme["text"])
         self.setPalette(palette)
-        self.highlighter.set_theme(theme)
+        defer = not any(view.isVisible() for view in self.doc.views) and not self.document().isEmpty()
+        self.highlighter.set_theme(theme, rehighlight=not defer)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.highlighter.stale:
+            self.highlighter.refresh()
+
+    # --- Folding ---
+    # Folded lines are hidden blocks of the shared document, so every view
+    # of it shows the same folds. Hidden blocks aren't laid out, and the
+    # highlighter leaves their formats until they are shown again.
+
+    def fold_area_width(self):
+        return self.fontMetrics().height()
+
+    def paint_fold_area(self, event):
+        painter = QPainter(self.fold_area)
+        painter.fillRect(event.rect(), self.palette().color(self.palette().ColorRole.Base))
+        color = QColor(self.palette().color(self.palette().ColorRole.Text))
+        color.setAlpha(140)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(color)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        size = self.fold_area.width() / 3
+        line_height = self.fontMetrics().lineSpacing()
+        block = self.firstVisibleBlock()
+        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+        bottom = event.rect().bottom()
+        lines = self.structure.iter_lines(block.blockNumber())
+        while block.isValid() and top <= bottom:
+            line = next(lines, None)
+            following = block.next()
+            folded = following.isValid() and not following.isVisible()
+            if folded or (line and opens_region(line)):
+                x = self.fold_area.width() / 2
+                y = top + line_height / 2
+                if folded:
+                    points = [QPointF(x - size / 2, y - size), QPointF(x + size / 2, y), QPointF(x - size / 2, y + size)]
+                else:
+                    points = [QPointF(x - size, y - size / 2), QPointF(x + size, y - size / 2), QPointF(x, y + size / 2)]
+                painter.drawPolygon(QPolygonF(points))
+            top += self.blockBoundingRect(block).height()
+            if folded:
+                following = self.next_visible_block(block)
+                if following.isValid():
+                    lines = self.structure.iter_lines(following.blockNumber())
+            block = following
+
+    def next_visible_block(self, block):
+        """The block shown after block, past any folded lines."""
+        following = block.next()
+        if following.isValid() and not following.isVisible():
+            # Hidden blocks take no lines in the layout, so this steps over all of them at once
+            following = self.document().findBlockByLineNumber(block.firstLineNumber() + block.lineCount())
+        return following
+
+    def fold_area_clicked(self, y):
+        # The strip and the viewport share their top edge
+        block = self.cursorForPosition(QPoint(0, int(y))).block()
+        if y <= self.blockBoundingGeometry(block).translated(self.contentOffset()).bottom():
+            self.toggle_fold(block.blockNumber())
+
+    def is_folded(self, number):
+        following = self.document().findBlockByNumber(number + 1)
+        return following.isValid() and not following.isVisible()
+
+    def toggle_fold(self, number):
+        if self.is_folded(number):
+            self.unfold(number)
+        else:
+            self.fold(number)
+
+    def fold(self, number):
+        """
+        Hides the lines of the region opened on a line, up to the one that
+        closes it. Returns False if the line opens no region that spans lines.
+        """
+        end = self.structure.region_end(number)
+        if end is None or end <= number + 1:
+            return False
+        cursor_line = self.textCursor().blockNumber()
+        self.set_blocks_visible(number + 1, end - 1, False)
+        if number < cursor_line < end:
+            cursor = self.textCursor()
+            block = self.document().findBlockByNumber(number)
+            cursor.setPosition(block.position() + block.length() - 1)
+            self.setTextCursor(cursor)
+        return True
+
+    def unfold(self, number):
+        """Shows the folded lines after a line."""
+        block = self.document().findBlockByNumber(number + 1)
+        last = number
+        while block.isValid() and not block.isVisible():
+            last += 1
+            block = block.next()
+        if last > number:
+            self.set_blocks_visible(number + 1, last, True)
+            self.highlighter.highlight_unfolded(number + 1, last)
+            # Highlights what is on screen now, if that was left to the idle pass
+            self.update_visible_blocks()
+
+    def fold_at_cursor(self):
+        """Folds the region opened on the cursor's line, or else the innermost region it is in."""
+        number = self.textCursor().blockNumber()
+        if not self.fold(number):
+            start = self.structure.region_start(number)
+            if start is not None:
+                self.fold(start)
+
+    def unfold_at_cursor(self):
+        self.unfold(self.textCursor().blockNumber())
+
+    def set_blocks_visible(self, first, last, visible):
+        document = self.document()
+        block = first_block = document.findBlockByNumber(first)
+        while block.isValid() and block.blockNumber() <= last:
+            block.setVisible(visible)
+            last_block = block
+            block = block.next()
+        start = first_block.position()
+        # Lays the blocks out again (or drops their layout), in every view
+        document.markContentsDirty(start, last_block.position() + last_block.length() - start)
+        for view in self.doc.views:
+            view.viewport().update()
+            view.fold_area.update()
+
+    def reveal_cursor(self):
+        """Unfolds the lines the cursor moved into, e.g. by going to a line or a match."""
+        block = self.textCursor().block()
+        if block.isVisible():
+            return
+        header = block.previous()
+        while header.isValid() and not header.isVisible():
+            header = header.previous()
+        self.unfold(header.blockNumber())
+        self.ensureCursorVisible()
+
+    # --- Brackets and indent guides ---
+    # Both come from the structure index, which already holds every line's
+    # nesting: a lookup scans the cursor's line and its partner's, and skips
+    # the lines between a chunk at a time.
+
+    def structure_ready(self):
+        """Whether the structure index is up to date with the text (not waiting to rebuild)."""
+        return not self.structure.rebuild_pending and self.structure.line_count == self.document().blockCount()
+
+    @timed("match_brackets")
+    def match_brackets(self):
+        """Highlights the bracket next to the cursor and the one matching it, or marks it unmatched."""
+        selections = []
+        cursor = self.textCursor()
+        if not cursor.hasSelection() and self.structure_ready():
+            block = cursor.block()
+            number = block.blockNumber()
+            code = self.structure.code(number)
+            column = code_point_index(block.text(), cursor.positionInBlock())
+            # The bracket after the cursor, else the one before it
+            for at in (column, column - 1):
+                if 0 <= at < len(code) and (code[at] in OPENERS or code[at] in CLOSERS):
+                    partner = self.structure.matching_bracket(number, at)
+                    brackets = [(number, at)]
+                    matched = False
+                    if partner:
+                        brackets.append(partner)
+                        partner_code = code if partner[0] == number else self.structure.code(partner[0])
+                        pair = sorted([(brackets[0], code[at]), (partner, partner_code[partner[1]])])
+                        # "(" closed by "]" is a pair, but not a matching one
+                        matched = OPENERS.index(pair[0][1]) == CLOSERS.index(pair[1][1])
+                    selections = [self.bracket_selection(line, column, matched) for line, column in brackets]
+                    break
+        if selections or self.bracket_selections:
+            self.bracket_selections = selections
+            self.update_extra_selections()
+
+    def bracket_selection(self, number, column, matched):
+        block = self.document().findBlockByNumber(number)
+        start = block.position() + utf16_length(block.text(), column)
+        selection = QTextEdit.ExtraSelection()
+        selection.format = QTextCharFormat()
+        if matched:
+            color = QColor(self.palette().color(self.palette().ColorRole.Text))
+            color.setAlpha(60)
+            selection.format.setBackground(color)
+        else:
+            selection.format.setForeground(ERROR_COLOR)
+        selection.cursor = QTextCursor(block)
+        selection.cursor.setPosition(start)
+        selection.cursor.setPosition(start + 1, QTextCursor.MoveMode.KeepAnchor)
+        return selection
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.structure_ready():
+            self.paint_indent_guides(event)
+
+    def paint_indent_guides(self, event):
+        """Draws a line at each indent level a line is nested to, left of its text."""
+        painter = QPainter(self.viewport())
+        color = QColor(self.palette().color(self.palette().ColorRole.Text))
+        color.setAlpha(40)
+        painter.setPen(color)
+
+        # Fractional, like the text layout, so guides don't drift off the columns
+        space = QFontMetricsF(self.font()).horizontalAdvance(" ")
+        step = space * INDENT_WIDTH
+        left = self.contentOffset().x() + self.document().documentMargin()
+        block = self.firstVisibleBlock()
+        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+        bottom = event.rect().bottom()
+        expected = None
+        while block.isValid() and top <= bottom:
+            number = block.blockNumber()
+            if number == expected:
+                depth += line[1]
+                line = next(lines)
+            else:
+                # The first line, or the first after folded lines
+                depth, line = self.structure.depth(number)
+                lines = self.structure.iter_lines(number + 1)
+            expected = number + 1
+            height = self.blockBoundingRect(block).height()
+            text = block.text()
+            indent = len(text) - len(text.lstrip())
+            # Closing brackets at the start of a line put it at the level they close
+            levels = depth + line[2]
+            # Guides stop at the text; blank lines show them all
+            if indent == len(text) or not levels:
+                limit = None
+            elif text[:indent] == " " * indent:
+                limit = indent * space # Asking the layout (cursorToX) was most of a scroll's cost
+            else:
+                layout_line = block.layout().lineAt(0)
+                limit = layout_line.cursorToX(indent)[0] - layout_line.x() # Less the margin, already in left
+            for level in range(levels):
+                x = left + level * step
+                if limit is not None and x >= left + limit:
+                    break
+                painter.drawLine(QPointF(x, top), QPointF(x, top + height))
+            top += height
+            block = self.next_visible_block(block)
+
+    # --- Diagnostics ---
+
+    def set_diagnostics(self, diagnostics):
+        """Underlines (line, column, length, severity, message) diagnostics."""
+        self.diagnostics = diagnostics
+        document = self.document()
+        self.diagnostic_selections = []
+        for line, column, length, severity, message in diagnostics:
+            block = document.findBlockByNumber(line)
+            if not block.isValid():
+                continue
+            # Columns count code points; the document counts UTF-16 units
+            text = block.text()
+            start = utf16_length(text, column)
+            end = max(start + 1, utf16_length(text, column + length))
+            selection = QTextEdit.ExtraSelection()
+            selection.format = QTextCharFormat()
+            selection.format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.SpellCheckUnderline)
+            selection.format.setUnderlineColor(ERROR_COLOR if severity == ERROR else WARNING_COLOR)
+            selection.format.setToolTip(message)
+            selection.cursor = QTextCursor(block)
+            selection.cursor.setPosition(block.position() + min(start, block.length() - 1))
+            selection.cursor.setPosition(block.position() + min(end, block.length() - 1), QTextCursor.MoveMode.KeepAnchor)
+            self.diagnostic_selections.append(selection)
+        self.update_extra_selections()
+
+    def update_extra_selections(self):
+        self.setExtraSelections(self.diagnostic_selections + self.bracket_selections)
+
+    def diagnostics_at(self, position):
+        """The messages of the diagnostics covering a document position."""
+        return [
+            selection.format.toolTip() for selection in self.diagnostic_selections
+            if selection.cursor.selectionStart() <= position <= selection.cursor.selectionEnd()
+        ]
+
+    def event(self, event):
+        if event.type() == QEvent.Type.ToolTip:
+            position = self.cursorForPosition(self.viewport().mapFrom(self, event.pos())).position()
+            messages = self.diagnostics_at(position) if self.diagnostic_selections else []
+            if messages:
+                QToolTip.showText(event.globalPos(), "\n".join(messages), self)
+            else:
+                QToolTip.hideText()
+            return True
+        return super().event(event)
 
     def text_under_cursor(self):
         tc = self.textCursor()
         tc.select(QTextCursor.SelectionType.WordUnderCursor)
         return tc.selectedText()
 
+    def completion_candidates(self, prefix):
+        """
+        Returns names declared in the document or project and language words starting
+        with prefix, best first: exact-case matches, then shorter words.
+        """
+        lower = prefix.lower()
+        # Skip the word being typed itself, which the index already holds
+        words = {word for word in self.symbols.completions(prefix) if word != prefix}
+        if self.project_index:
+            words.update(self.project_index.completions(prefix))
+        words.update(word for word in COMPLETION_WORDS if word.lower().startswith(lower))
+        return sorted(words, key=lambda word: (not word.startswith(prefix), len(word), word.lower()))
+
+    def view_state(self):
+        """Returns (cursor position, first visible line), as kept in the saved session."""
+        return self.textCursor().position(), self.verticalScrollBar().value()
+
+    def restore_view_state(self, cursor_position, scroll_position):
+        cursor = self.textCursor()
+        cursor.setPosition(min(cursor_position, self.document().characterCount() - 1))
+        self.setTextCursor(cursor)
+        self.verticalScrollBar().setValue(scroll_position)
+
+    def go_to_line(self, line, column=0, length=0):
+        """
+        Moves the cursor to a 0-based line and column, selecting length
+        characters from there, and centers it.
+        """
+        block = self.document().findBlockByNumber(line)
+        if block.isValid():
+            # Columns count code points; the document counts UTF-16 units
+            text = block.text()
+            end = block.position() + block.length() - 1
+            cursor = self.textCursor()
+            cursor.setPosition(min(block.position() + utf16_length(text, column), end))
+            cursor.setPosition(min(block.position() + utf16_length(text, column + length), end), QTextCursor.MoveMode.KeepAnchor)
+            self.setTextCursor(cursor)
+            self.centerCursor()
+
     def insert_completion(self, completion):
         tc = self.textCursor()
         extra = len(completion) - len(self.completer.completionPrefix())
@@ -51,6 +499,7 @@ class CodeEditor(QTextEdit):
         tc.insertText(completion[-extra:])
         self.setTextCursor(tc)
 
+    @timed("keyPressEvent")
     def keyPressEvent(self, event):
         """
         Overrides the key press event to handle auto-completion.
@@ -75,18 +524,54 @@ class CodeEditor(QTextEdit):
             self.completer.popup().hide()
             return
 
-        if completion_prefix != self.completer.completionPrefix():
-            self.completer.setCompletionPrefix(completion_prefix)
-            self.completer.popup().setCurrentIndex(self.completer.completionModel().index(0, 0))
+        candidates = self.completion_candidates(completion_prefix)
+        if not candidates:
+            self.completer.popup().hide()
+            return
+
+        self.completion_model.setStringList(candidates)
+        self.completer.setCompletionPrefix(completion_prefix)
+        self.completer.popup().setCurrentIndex(self.completer.completionModel().index(0, 0))
 
         cursor_rect = self.cursorRect()
         cursor_rect.setWidth(self.completer.popup().sizeHintForColumn(0) + self.completer.popup().verticalScrollBar().sizeHint().width())
         self.completer.complete(cursor_rect)
 
-class TerminalWidget(QTextEdit):
+class FoldArea(QWidget):
+    """The strip left of a CodeEditor's text that shows its fold markers."""
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+
+    def sizeHint(self):
+        return QSize(self.editor.fold_area_width(), 0)
+
+    def paintEvent(self, event):
+        self.editor.paint_fold_area(event)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.editor.fold_area_clicked(event.position().y())
+
+class TabPlaceholder(QWidget):
+    """
+    Stands in for a tab restored from the last session. The file is only read
+    into a CodeEditor when the tab is first shown (see MainWindow.tab_activated).
+    """
+    def __init__(self, path, cursor_position=0, scroll_position=0, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.cursor_position = cursor_position
+        self.scroll_position = scroll_position # first visible line
+
+
+class TerminalWidget(QPlainTextEdit):
     """
-    A custom QTextEdit that acts as a writable terminal, sending input
+    A custom QPlainTextEdit that acts as a writable terminal, sending input
     to a running QProcess.
+
+    Process output is decoded incrementally, buffered, and drawn at most once
+    per frame into a bounded scrollback, so a chatty script can't flood the UI.
     """
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -94,6 +579,16 @@ class TerminalWidget(QTextEdit):
         self.prompt_pos = 0
 
         self.setFont(QFont("Consolas", 10))
+        self.setMaximumBlockCount(SCROLLBACK_LINES)
+
+        # --- Output buffering ---
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.pending = []
+        self.pending_lines = 0
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(OUTPUT_FLUSH_MS)
+        self.flush_timer.timeout.connect(self.flush_output)
 
     def set_theme(self, theme):
         palette = self.palette()
@@ -103,6 +598,7 @@ class TerminalWidget(QTextEdit):
 
     def set_process(self, process):
         self.process = process
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
 
     def keyPressEvent(self, event):
         cursor = self.textCursor()
@@ -114,18 +610,471 @@ class TerminalWidget(QTextEdit):
         if event.key() == Qt.Key.Key_Return or event.key() == Qt.Key.Key_Enter:
             cursor.movePosition(QTextCursor.MoveOperation.End)
             self.setTextCursor(cursor)
-            text = self.toPlainText()[self.prompt_pos:]
-            
+            text = self.current_input()
+
             if self.process:
                 self.process.write(f"{text}\n".encode())
 
-            self.append("")
+            self.appendPlainText("")
             self.prompt_pos = self.textCursor().position()
             return
 
         super().keyPressEvent(event)
 
+    def current_input(self):
+        """Returns what the user has typed after the prompt, without copying the whole terminal."""
+        cursor = QTextCursor(self.document())
+        cursor.setPosition(min(self.prompt_pos, self.document().characterCount() - 1))
+        cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+        # selectedText() uses the Unicode paragraph separator between blocks
+        return cursor.selectedText().replace("\u2029", "\n")
+
+    def feed_output(self, data):
+        """Queues raw process output, keeping multi-byte characters split across reads intact."""
+        self.append_output(self.decoder.decode(data))
+
+    def finish_output(self):
+        """Flushes whatever is still buffered once the process is done."""
+        self.append_output(self.decoder.decode(b"", final=True))
+        self.flush_output()
+
     def append_output(self, text):
-        self.insertPlainText(text)
+        if not text:
+            return
+        self.pending.append(text)
+        self.pending_lines += text.count("\n")
+        if self.pending_lines > 2 * SCROLLBACK_LINES:
+            # Everything but the last screenful of scrollback would be dropped anyway
+            tail = "".join(self.pending).rsplit("\n", SCROLLBACK_LINES)[1:]
+            self.pending = ["\n".join(tail)]
+            self.pending_lines = SCROLLBACK_LINES - 1
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush_output(self):
+        self.flush_timer.stop()
+        if not self.pending:
+            return
+        text = "".join(self.pending)
+        self.pending = []
+        self.pending_lines = 0
+
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
         self.moveCursor(QTextCursor.MoveOperation.End)
-        self.prompt_pos = self.textCursor().position()
\ No newline at end of file
+        self.prompt_pos = self.textCursor().position()
+
+class RunPane(QWidget):
+    """
+    The output of one run: a status line with a Kill button above its own
+    TerminalWidget.
+    """
+    kill_requested = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.run = None # Set by MainWindow once the run is submitted
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(2)
+
+        header = QHBoxLayout()
+        header.setContentsMargins(4, 2, 4, 0)
+        self.status_label = QLabel("Queued")
+        self.kill_button = QPushButton("Kill")
+        self.kill_button.clicked.connect(self.kill_requested)
+        header.addWidget(self.status_label)
+        header.addStretch()
+        header.addWidget(self.kill_button)
+        layout.addLayout(header)
+
+        self.terminal = TerminalWidget()
+        layout.addWidget(self.terminal)
+
+    def set_status(self, text, active):
+        self.status_label.setText(text)
+        self.kill_button.setEnabled(active)
+
+
+def format_size(size):
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class RunAllPanel(QWidget):
+    """
+    Options for running every script in the open folder, and a table of the
+    results: outcome, duration and output size, linking to the full output.
+    """
+    run_requested = pyqtSignal()
+    stop_requested = pyqtSignal()
+    output_requested = pyqtSignal(str) # path of a script's output log
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self.results = {} # script path -> (row, BatchResult)
+        self.finished_count = self.passed_count = self.skipped_count = 0
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        controls = QHBoxLayout()
+        self.fail_fast_box = QCheckBox("Stop at first failure")
+        self.timeout_box = QSpinBox()
+        self.timeout_box.setRange(0, 24 * 3600)
+        self.timeout_box.setPrefix("Timeout: ")
+        self.timeout_box.setSuffix(" s")
+        self.timeout_box.setSpecialValueText("No timeout")
+        self.run_button = QPushButton("Run All")
+        self.run_button.clicked.connect(self.run_requested)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_requested)
+        self.summary_label = QLabel()
+        controls.addWidget(self.fail_fast_box)
+        controls.addWidget(self.timeout_box)
+        controls.addWidget(self.run_button)
+        controls.addWidget(self.stop_button)
+        controls.addStretch()
+        controls.addWidget(self.summary_label)
+        layout.addLayout(controls)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["File", "Result", "Duration", "Output"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        # Output sizes of running scripts grow as they print
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh_running)
+
+    def start(self, root):
+        self.root = root
+        self.results = {}
+        self.finished_count = self.passed_count = self.skipped_count = 0
+        self.table.setRowCount(0)
+        self.summary_label.setText(f"Running scripts in {root}...")
+        self.run_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.refresh_timer.start()
+
+    def file_started(self, result):
+        self.update_row(result, "running")
+
+    def file_finished(self, result):
+        self.update_row(result, result.describe())
+        self.finished_count += 1
+        self.passed_count += result.passed
+        self.skipped_count += result.skipped
+        failed = self.finished_count - self.passed_count - self.skipped_count
+        skipped = f", {self.skipped_count} skipped" if self.skipped_count else ""
+        self.summary_label.setText(f"{self.passed_count} passed, {failed} failed{skipped}")
+
+    def finish(self):
+        self.refresh_timer.stop()
+        self.refresh_running()
+        self.run_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+    def update_row(self, result, outcome):
+        if result.path in self.results:
+            row = self.results[result.path][0]
+        else:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.table.setItem(row, 0, QTableWidgetItem(os.path.relpath(result.path, self.root)))
+            link = QLabel()
+            link.linkActivated.connect(self.output_requested)
+            self.table.setCellWidget(row, 3, link)
+        self.results[result.path] = (row, result)
+        self.table.setItem(row, 1, QTableWidgetItem(outcome))
+        self.table.setItem(row, 2, QTableWidgetItem(f"{result.duration:.2f} s" if result.duration else ""))
+        self.set_output_link(row, result)
+
+    def set_output_link(self, row, result):
+        if not result.started:
+            return # No output to link to
+        self.table.cellWidget(row, 3).setText(f'<a href="{result.output_path}">{format_size(result.output_bytes)}</a>')
+
+    def refresh_running(self):
+        for row, result in self.results.values():
+            self.set_output_link(row, result)
+
+
+class QuickOpenDialog(QDialog):
+    """
+    The Ctrl+P palette: type part of a file's path, then Enter opens the
+    highlighted match. Searches the PathIndex on every keystroke.
+    """
+    file_chosen = pyqtSignal(str) # path relative to the index's root
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Quick Open")
+        self.resize(600, 400)
+        self.index = None # PathIndex, or None while the folder is being indexed
+
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Type part of a file name...")
+        self.query_edit.textChanged.connect(self.update_results)
+        self.query_edit.returnPressed.connect(self.choose_current)
+        layout.addWidget(self.query_edit)
+        self.results = QListWidget()
+        self.results.itemActivated.connect(self.choose_current)
+        layout.addWidget(self.results)
+
+    def set_index(self, index):
+        self.index = index
+        self.update_results()
+
+    def popup(self):
+        self.query_edit.selectAll()
+        self.query_edit.setFocus()
+        self.update_results()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def update_results(self):
+        self.results.clear()
+        if self.index is None:
+            self.results.addItem("Indexing folder...")
+            self.results.item(0).setFlags(Qt.ItemFlag.NoItemFlags)
+            return
+        self.results.addItems(self.index.search(self.query_edit.text(), QUICK_OPEN_RESULTS))
+        self.results.setCurrentRow(0)
+
+    def choose_current(self):
+        item = self.results.currentItem()
+        if self.index is not None and item is not None:
+            self.accept()
+            self.file_chosen.emit(item.text())
+
+    def keyPressEvent(self, event):
+        # The query keeps focus; Up, Down, Page Up and Page Down move through the results
+        if event.key() in (Qt.Key.Key_Up, Qt.Key.Key_Down, Qt.Key.Key_PageUp, Qt.Key.Key_PageDown):
+            self.results.keyPressEvent(event)
+        else:
+            super().keyPressEvent(event)
+
+
+class FindInFilesPanel(QWidget):
+    """
+    A query box with Regex and Match case options above the matches, grouped
+    by file. Editing the query searches again after a short pause.
+    """
+    search_requested = pyqtSignal()
+    stop_requested = pyqtSignal()
+    match_activated = pyqtSignal(str, int, int, int) # (path, line, column, length)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self.match_count = self.file_count = 0
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        controls = QHBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Find in files")
+        self.query_edit.setClearButtonEnabled(True)
+        self.regex_box = QCheckBox("Regex")
+        self.case_box = QCheckBox("Match case")
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_requested)
+        self.status_label = QLabel()
+        controls.addWidget(self.query_edit, 1)
+        controls.addWidget(self.regex_box)
+        controls.addWidget(self.case_box)
+        controls.addWidget(self.stop_button)
+        controls.addWidget(self.status_label)
+        layout.addLayout(controls)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.itemActivated.connect(self.item_activated)
+        layout.addWidget(self.tree)
+
+        # Search again once typing pauses; Enter searches at once
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(FIND_DELAY_MS)
+        self.search_timer.timeout.connect(self.search_requested)
+        self.query_edit.textChanged.connect(self.search_timer.start)
+        self.regex_box.toggled.connect(self.search_timer.start)
+        self.case_box.toggled.connect(self.search_timer.start)
+        self.query_edit.returnPressed.connect(self.search_now)
+
+    def search_now(self):
+        self.search_timer.stop()
+        self.search_requested.emit()
+
+    def clear(self, status=""):
+        self.tree.clear()
+        self.match_count = self.file_count = 0
+        self.status_label.setText(status)
+
+    def start(self, root):
+        self.root = root
+        self.clear("Searching...")
+        self.stop_button.setEnabled(True)
+
+    def add_matches(self, path, matches):
+        self.match_count += len(matches)
+        self.file_count += 1
+        file_item = QTreeWidgetItem(self.tree, [f"{os.path.relpath(path, self.root)} ({len(matches)})"])
+        file_item.setToolTip(0, path)
+        file_item.setData(0, Qt.ItemDataRole.UserRole, (path, 0, 0, 0))
+        for line, column, length, preview in matches:
+            item = QTreeWidgetItem(file_item, [f"{line + 1}: {preview}"])
+            item.setData(0, Qt.ItemDataRole.UserRole, (path, line, column, length))
+        file_item.setExpanded(True)
+
+    def describe(self):
+        return f"{self.match_count} matches in {self.file_count} files"
+
+    def set_progress(self, searched):
+        self.status_label.setText(f"{self.describe()} ({searched} files searched)")
+
+    def finish(self, truncated=False, cancelled=False):
+        self.stop_button.setEnabled(False)
+        if truncated:
+            self.status_label.setText(f"{self.describe()} (stopped at the match limit)")
+        elif cancelled:
+            self.status_label.setText(f"{self.describe()} (stopped)")
+        else:
+            self.status_label.setText(self.describe())
+
+    def item_activated(self, item):
+        self.match_activated.emit(*item.data(0, Qt.ItemDataRole.UserRole))
+
+class ProblemsPanel(QWidget):
+    """
+    The diagnostics of every open document, grouped by document, with a
+    count of errors and warnings.
+    """
+    problem_activated = pyqtSignal(object, int, int, int) # (Document, line, column, length)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = {} # Document -> its top-level item
+        self.counts = {} # Document -> (errors, warnings)
+        self.error_icon = self.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxCritical)
+        self.warning_icon = self.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxWarning)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.itemActivated.connect(self.item_activated)
+        layout.addWidget(self.tree)
+        self.update_status()
+
+    def set_problems(self, document, diagnostics):
+        document_item = self.items.get(document)
+        if not diagnostics:
+            self.remove_document(document)
+            return
+        if document_item is None:
+            document_item = self.items[document] = QTreeWidgetItem(self.tree)
+            document_item.setData(0, Qt.ItemDataRole.UserRole, (document, 0, 0, 0))
+        else:
+            document_item.takeChildren()
+        errors = 0
+        for line, column, length, severity, message in diagnostics:
+            item = QTreeWidgetItem(document_item, [f"{message} [{line + 1}:{column + 1}]"])
+            item.setIcon(0, self.error_icon if severity == ERROR else self.warning_icon)
+            item.setData(0, Qt.ItemDataRole.UserRole, (document, line, column, length))
+            errors += severity == ERROR
+        self.counts[document] = (errors, len(diagnostics) - errors)
+        document_item.setText(0, f"{document.name} ({len(diagnostics)})")
+        document_item.setToolTip(0, document.path or document.name)
+        document_item.setExpanded(True)
+        self.update_status()
+
+    def remove_document(self, document):
+        document_item = self.items.pop(document, None)
+        if document_item is not None:
+            self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(document_item))
+            del self.counts[document]
+            self.update_status()
+
+    def update_status(self):
+        errors = sum(counts[0] for counts in self.counts.values())
+        warnings = sum(counts[1] for counts in self.counts.values())
+        self.status_label.setText(f"{errors} errors, {warnings} warnings")
+
+    def item_activated(self, item):
+        self.problem_activated.emit(*item.data(0, Qt.ItemDataRole.UserRole))
+
+class OutlinePanel(QWidget):
+    """
+    The functions and classes of a document, nested as in the code. It is
+    refreshed once edits to the document pause.
+    """
+    symbol_activated = pyqtSignal(object, int, int, int) # (Document, line, column, length)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.document = None
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.setUniformRowHeights(True)
+        self.tree.itemActivated.connect(self.item_activated)
+        layout.addWidget(self.tree)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(OUTLINE_DELAY_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def set_document(self, document):
+        """Outlines document (None for nothing), following its edits."""
+        if document is self.document:
+            return
+        if self.document is not None:
+            self.document.structure.changed.disconnect(self.refresh_timer.start)
+        self.document = document
+        if document is not None:
+            document.structure.changed.connect(self.refresh_timer.start)
+        self.refresh()
+
+    def refresh(self):
+        self.refresh_timer.stop()
+        scroll = self.tree.verticalScrollBar().value()
+        self.tree.clear()
+        if self.document is None:
+            return
+        parents = [] # (end line, item) of the classes and functions the next one may be inside
+        for keyword, name, line, column, end in self.document.structure.regions(("func", "class")):
+            while parents and line > parents[-1][0]:
+                parents.pop()
+            item = QTreeWidgetItem(parents[-1][1] if parents else self.tree, [f"{keyword} {name or ''}".rstrip()])
+            item.setToolTip(0, f"Line {line + 1}")
+            # Selects the name, or the keyword of an anonymous function
+            item.setData(0, Qt.ItemDataRole.UserRole, (line, column, len(name or keyword)))
+            parents.append((end, item))
+        self.tree.expandAll()
+        self.tree.verticalScrollBar().setValue(scroll)
+
+    def item_activated(self, item):
+        self.symbol_activated.emit(self.document, *item.data(0, Qt.ItemDataRole.UserRole))
@@ -1,5 +1,10 @@
+import time
+START_TIME = time.perf_counter() # Before the imports, for --startup-profile
+
+import argparse
 import sys
 import os
+import tempfile
 from PyQt6.QtWidgets import QApplication
 
 # Add project root to sys.path to allow finding the sn2_interpreter
@@ -8,14 +13,43 @@ project_root = script_dir # The editor script is at the root of the project
 sys.path.insert(0, project_root) # Add project root to the path
 
 from editor.main_window import MainWindow
+from editor.startup_profile import StartupProfile
+from editor.batch_runner import run_all_headless
+
+def parse_args(argv):
+    """Returns (editor options, remaining arguments for Qt)."""
+    parser = argparse.ArgumentParser(description="Sn2 Code Editor")
+    parser.add_argument("--startup-profile", action="store_true", help="print how long each phase of startup takes")
+
+    # --- Headless Run All, e.g. for CI ---
+    parser.add_argument("--run-all", metavar="FOLDER", help="run every .sn2 file under FOLDER without opening the editor; exits 1 if any fails, 2 if FOLDER can't be read")
+    parser.add_argument("--jobs", type=int, help="scripts to run at once (default: one per core)")
+    parser.add_argument("--timeout", type=float, help="seconds before a script is killed")
+    parser.add_argument("--fail-fast", action="store_true", help="stop at the first failing script")
+    parser.add_argument("--output-dir", help="where to write each script's output (default: a new temporary directory)")
+    parser.add_argument("--interpreter", default=os.path.join(project_root, "bin", "sn2_interpreter.py"), help="path to sn2_interpreter.py")
+    return parser.parse_known_args(argv)
 
 if __name__ == '__main__':
+    args, qt_args = parse_args(sys.argv[1:])
+    if args.run_all:
+        output_dir = args.output_dir or tempfile.mkdtemp(prefix="sn2-run-all-")
+        sys.exit(run_all_headless(args.interpreter, args.run_all, output_dir, args.jobs, args.timeout, args.fail_fast))
+
+    profile = StartupProfile(START_TIME) if args.startup_profile else None
+    if profile:
+        profile.mark("imports")
+
     # Ensure you have PyQt6 installed: pip install PyQt6
-    app = QApplication(sys.argv)
-    
+    app = QApplication(sys.argv[:1] + qt_args)
+
     # Set a modern style
     app.setStyle("Fusion")
+    if profile:
+        profile.mark("QApplication")
 
-    main_win = MainWindow()
+    main_win = MainWindow(startup_profile=profile)
     main_win.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    if profile:
+        profile.mark("show")
+    sys.exit(app.exec())